@@ -0,0 +1,305 @@
+"""
+Load and latency benchmark for the word graph backend.
+
+Drives the Flask app through its test client and/or a real threaded HTTP
+server, with Gemini replaced by the fake (or a replay of recorded real
+responses) and Aryn replaced by a canned partition result. Reports
+p50/p95/p99 latency, requests/sec, peak RSS and per-stage time (from the
+Server-Timing header) for each graph size, as JSON.
+
+Run from the backend directory:
+
+    uv run python -m benchmarks.bench --sizes 5,50,500 --output bench.json
+    uv run python -m benchmarks.bench --baseline bench.json   # exits 1 on regression
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Keep benchmark runs away from the real caches; set before the app is imported
+os.environ.setdefault('FLOWLEARN_CACHE_DIR', tempfile.mkdtemp(prefix='flowlearn-bench-'))
+os.environ.setdefault('LLM_PROVIDER', 'fake')
+os.environ.setdefault('ARYN_API_KEY', 'benchmark')
+# Benchmark topics differ only by a counter, which the semantic cache could match
+os.environ.setdefault('SEMANTIC_CACHE', '0')
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from src.backend import ingestion  # noqa: E402
+from src.backend.app import app  # noqa: E402
+from src.backend.providers import FakeProvider, ReplayProvider, set_provider  # noqa: E402
+from src.backend.timing import parse_server_timing  # noqa: E402
+
+ENDPOINTS = ('generate', 'upload')
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def stub_aryn(response_path=None, num_elements=40):
+    """
+    Replace Aryn's partition_file with a canned result.
+
+    Args:
+        response_path: JSON file holding a captured partition_file() result to replay
+        num_elements: Number of synthetic text elements when no capture is given
+    """
+    if response_path:
+        with open(response_path, encoding='utf-8') as f:
+            captured = json.load(f)
+    else:
+        captured = {'elements': [
+            {'type': 'Text', 'text_representation': f"Paragraph {i} of the benchmark document. " * 8}
+            for i in range(num_elements)
+        ]}
+
+    def partition_file(file, **kwargs):
+        return captured
+
+    ingestion.partition_file = partition_file
+
+
+class TestClientDriver:
+    """Sends requests through Flask's in-process test client"""
+
+    name = 'testclient'
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _client(self):
+        if not hasattr(self._local, 'client'):
+            self._local.client = app.test_client()
+        return self._local.client
+
+    def post_json(self, path, body):
+        response = self._client().post(path, json=body)
+        return response.status_code, response.headers.get('Server-Timing', ''), len(response.data)
+
+    def post_file(self, path, filename, content):
+        response = self._client().post(
+            path, data={'file': (io.BytesIO(content), filename)}, content_type='multipart/form-data'
+        )
+        return response.status_code, response.headers.get('Server-Timing', ''), len(response.data)
+
+    def close(self):
+        pass
+
+
+class ServerDriver:
+    """Sends real HTTP requests to a threaded werkzeug server on a free port"""
+
+    name = 'server'
+
+    def __init__(self):
+        # Per-request access logs would swamp the report
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def _send(self, request):
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                body = response.read()
+                return response.status, response.headers.get('Server-Timing', ''), len(body)
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('Server-Timing', ''), len(e.read())
+
+    def post_json(self, path, body):
+        request = urllib.request.Request(
+            self.base_url + path, data=json.dumps(body).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        return self._send(request)
+
+    def post_file(self, path, filename, content):
+        boundary = uuid.uuid4().hex
+        payload = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode('utf-8') + content + f"\r\n--{boundary}--\r\n".encode('utf-8')
+        request = urllib.request.Request(
+            self.base_url + path, data=payload,
+            headers={'Content-Type': f'multipart/form-data; boundary={boundary}'}, method='POST'
+        )
+        return self._send(request)
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run_scenario(driver, endpoint, size, args):
+    """Fire ``args.requests`` requests at ``args.concurrency`` and summarize them"""
+    run_id = uuid.uuid4().hex[:8]
+
+    def one_request(i):
+        # Unique topics and file contents so every request misses the caches
+        # and exercises the whole pipeline
+        start = time.perf_counter()
+        if endpoint == 'generate':
+            status, server_timing, size_bytes = driver.post_json(
+                '/api/word-graph/generate', {'topic': f"bench {run_id} {size} {i}", 'num_words': size}
+            )
+        else:
+            content = f"%PDF-1.4 benchmark {run_id} {size} {i}".encode('utf-8')
+            status, server_timing, size_bytes = driver.post_file('/api/word-graph/upload', 'bench.pdf', content)
+        return time.perf_counter() - start, status, parse_server_timing(server_timing), size_bytes
+
+    # One untimed request to warm imports and lazily created state
+    one_request(-1)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(one_request, range(args.requests)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    errors = sum(1 for r in results if r[1] >= 400)
+    stages = {}
+    for _, _, timings, _ in results:
+        for name, duration in timings.items():
+            stages.setdefault(name, []).append(duration)
+
+    return {
+        'driver': driver.name,
+        'endpoint': endpoint,
+        'nodes': size,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'errors': errors,
+        'requests_per_sec': round(args.requests / wall, 2),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'max': round(latencies[-1], 2),
+        },
+        'stages_ms': {
+            name: {
+                'mean': round(sum(values) / len(values), 3),
+                'p95': round(percentile(sorted(values), 95), 3),
+            }
+            for name, values in sorted(stages.items())
+        },
+        'response_bytes_mean': round(sum(r[3] for r in results) / len(results)),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Return a description of every scenario whose p95 regressed beyond ``tolerance``"""
+    def key(r):
+        return r['driver'], r['endpoint'], r['nodes'], r['concurrency']
+
+    previous = {key(r): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        old, new = before['latency_ms']['p95'], result['latency_ms']['p95']
+        if old and new > old * (1 + tolerance):
+            regressions.append(f"{key(result)}: p95 {old}ms -> {new}ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='5,25,100,250,500', help='comma-separated graph sizes (nodes)')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='generate and/or upload')
+    parser.add_argument('--drivers', default='testclient,server', help='testclient and/or server')
+    parser.add_argument('--requests', type=int, default=50, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent requests')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='simulated model latency in seconds')
+    parser.add_argument('--replay', help='JSONL of responses recorded with LLM_RECORD_PATH to replay instead of the fake')
+    parser.add_argument('--aryn-response', help='JSON file with a captured partition_file() result')
+    parser.add_argument('--output', help='write results JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='previous results JSON to compare p95 latency against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 regression vs baseline (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    endpoints = [endpoint for endpoint in args.endpoints.split(',') if endpoint]
+    drivers = {'testclient': TestClientDriver, 'server': ServerDriver}
+
+    stub_aryn(args.aryn_response)
+    results = []
+    for driver_name in args.drivers.split(','):
+        driver = drivers[driver_name]()
+        try:
+            for size in sizes:
+                if args.replay:
+                    set_provider(ReplayProvider(args.replay, latency=args.llm_latency, strict=False))
+                else:
+                    set_provider(FakeProvider(latency=args.llm_latency, num_words=size))
+                for endpoint in endpoints:
+                    result = run_scenario(driver, endpoint, size, args)
+                    results.append(result)
+                    print(f"{driver_name:10} {endpoint:8} {size:4} nodes  "
+                          f"p50={result['latency_ms']['p50']}ms p95={result['latency_ms']['p95']}ms "
+                          f"{result['requests_per_sec']} req/s", file=sys.stderr)
+        finally:
+            driver.close()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'llm': 'replay' if args.replay else 'fake',
+            'llm_latency_s': args.llm_latency,
+        },
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
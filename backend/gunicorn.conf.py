@@ -0,0 +1,52 @@
+# gunicorn -c gunicorn.conf.py
+#
+# The app is loaded once in the master and forked into the workers. Only
+# module imports happen before the fork (they're shared copy-on-write);
+# every worker then builds its own Gemini client, thread pools and SQLite
+# connections, so none of them is shared across processes.
+import multiprocessing
+import os
+import tempfile
+
+# Workers write their metrics here, so /api/metrics reports the whole server
+# whichever worker answers; set before the app (and its metrics) is imported
+if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='flowlearn-metrics-')
+
+wsgi_app = 'src.backend.app:create_app(warm_up=False)'
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Requests mostly wait on Gemini and Aryn, so each worker serves several at once
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+preload_app = True
+
+
+def on_starting(server):
+    # Counters from a previous run in the same directory would be added in
+    from src.backend.metrics import registry
+    registry.clear()
+
+
+def when_ready(server):
+    # Import the SDKs in the master, before the workers are forked
+    from src.backend.word_graph import warm_up
+    warm_up(clients=False)
+
+
+def post_worker_init(worker):
+    # Per-worker clients, ready before the first request is accepted
+    if os.getenv('WARM_UP', '1') != '0':
+        from src.backend.word_graph import warm_up
+        warm_up()
+
+
+def worker_exit(server, worker):
+    from src.backend.metrics import registry
+    registry.flush()
+
+
+def child_exit(server, worker):
+    # Keep an exited worker's counts without keeping a file per worker ever started
+    from src.backend.metrics import registry
+    registry.mark_process_dead(worker.pid)
@@ -1,5 +1,6 @@
-from src.backend.app import app
+from src.backend.app import create_app
+
+app = create_app()
 
 if __name__ == "__main__":
     app.run(debug=True, host='0.0.0.0', port=8000)
-
@@ -0,0 +1,114 @@
+from collections import deque
+from typing import Sequence, Tuple
+
+
+def graph_analytics(node_ids: Sequence[str], edges: Sequence[Tuple[str, str]]) -> dict:
+    """
+    Compute the learning paths through a concept graph in one topological pass.
+
+    An edge (source, target) means source should be learned before target.
+    Everything but the prerequisite sets is O(V + E); those are bitsets,
+    merged along each edge, so they cost O(E * V / 64) word operations.
+
+    A graph with a cycle (which repair_words normally prevents) is handled
+    by ignoring the edges that close it; ``acyclic`` is then False.
+
+    Args:
+        node_ids: Node IDs, in a stable order
+        edges: (source, target) pairs; edges to unknown nodes are ignored
+
+    Returns:
+        Dict with
+        - ``order``: node IDs in a topological order, prerequisites first
+        - ``levels``: node ID to the length of the longest chain of
+          prerequisites before it (0 for sources)
+        - ``sources``: nodes with no prerequisites, where a learner can start
+        - ``goal``: the deepest node nothing else depends on
+        - ``criticalPath``: the longest chain of concepts ending at the goal
+        - ``prerequisites``: node ID to a hex bitmask of every concept that
+          comes before it, where bit i stands for ``node_ids[i]``
+        - ``acyclic``: whether the graph had no cycles
+    """
+    n = len(node_ids)
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    targets = [[] for _ in range(n)]
+    indegree = [0] * n
+    for source, target in edges:
+        s, t = index.get(source), index.get(target)
+        if s is None or t is None or s == t:
+            continue
+        targets[s].append(t)
+        indegree[t] += 1
+
+    sources = [i for i in range(n) if not indegree[i]]
+    remaining = list(indegree)
+    level = [0] * n
+    parent = [-1] * n
+    prerequisites = [0] * n
+    placed = [False] * n
+    order = []
+    queue = deque(sources)
+    next_unplaced = 0
+    acyclic = True
+
+    # Kahn's algorithm, also relaxing longest paths and prerequisite sets
+    while len(order) < n:
+        if not queue:
+            # Only nodes on (or behind) a cycle are left; break it at the first one
+            while placed[next_unplaced]:
+                next_unplaced += 1
+            queue.append(next_unplaced)
+            acyclic = False
+        v = queue.popleft()
+        if placed[v]:
+            continue
+        placed[v] = True
+        order.append(v)
+        for t in targets[v]:
+            if placed[t]:
+                continue
+            if level[v] + 1 > level[t]:
+                level[t] = level[v] + 1
+                parent[t] = v
+            prerequisites[t] |= prerequisites[v] | (1 << v)
+            remaining[t] -= 1
+            if remaining[t] == 0:
+                queue.append(t)
+
+    critical_path = []
+    goal = None
+    if n:
+        sinks = [i for i in range(n) if not targets[i]] or [order[-1]]
+        goal = max(sinks, key=lambda i: level[i])
+        v = goal
+        while v != -1:
+            critical_path.append(node_ids[v])
+            v = parent[v]
+        critical_path.reverse()
+
+    return {
+        'order': [node_ids[i] for i in order],
+        'levels': {node_ids[i]: level[i] for i in range(n)},
+        'sources': [node_ids[i] for i in sources],
+        'goal': None if goal is None else node_ids[goal],
+        'criticalPath': critical_path,
+        'prerequisites': {node_ids[i]: format(prerequisites[i], 'x') for i in range(n)},
+        'acyclic': acyclic,
+    }
+
+
+def apply_analytics(graph: dict) -> dict:
+    """
+    Attach graph_analytics for a React Flow payload as its ``analytics`` key.
+
+    Args:
+        graph: Dict with 'nodes' and 'edges' lists, updated in place
+
+    Returns:
+        The same graph
+    """
+    graph['analytics'] = graph_analytics(
+        [node['id'] for node in graph['nodes']],
+        [(edge['source'], edge['target']) for edge in graph['edges']],
+    )
+    return graph
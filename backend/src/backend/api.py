@@ -0,0 +1,394 @@
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+from werkzeug.utils import secure_filename
+
+from .analytics import apply_analytics
+from .cache import make_cache_key, normalize_topic
+from .details import DETAIL_LEVELS, DETAILS_PROMPT_VERSION
+from .expansion import EXPAND_MAX_WORDS, EXPAND_NUM_WORDS
+from .graph_builder import normalize_term
+from .jobs import job_payload
+from .merge import MERGE_MAX_GRAPHS, MERGE_SIMILARITY
+from .timing import stage
+
+# Request parsing, cache keys and response bodies of the word graph API,
+# shared by the Flask (word_graph) and Quart (async_word_graph) blueprints
+# so the two differ only in how they call them. Nothing here does I/O
+# except through a store passed in, which the async blueprint calls off
+# the event loop.
+
+# Bump whenever the generation prompt changes so graphs produced by an older
+# prompt are never served from the cache.
+PROMPT_VERSION = 1
+
+# Largest num_words a generation or upload may ask for
+GENERATE_MAX_WORDS = int(os.getenv('GENERATE_MAX_WORDS', 500))
+
+# Limits for /api/word-graph/batch
+BATCH_MAX_TOPICS = int(os.getenv('BATCH_MAX_TOPICS', 100))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', 8))
+
+UPLOAD_MODES = ('single', 'mapreduce')
+UPLOAD_EXTENSIONS = ('pdf', 'png', 'jpg', 'jpeg')
+
+# How long browsers may reuse a stored graph before revalidating it; graphs
+# never change, so this only bounds how long a deleted graph stays visible
+GRAPH_MAX_AGE = int(os.getenv('GRAPH_MAX_AGE', 24 * 3600))
+
+# Seconds a client turned away by a full job queue is told to wait
+JOB_RETRY_AFTER = 5
+
+
+def parse_num_words(value, maximum: int = GENERATE_MAX_WORDS) -> int:
+    """
+    Check a requested ``num_words``, given as a number or a numeric string.
+
+    Raises:
+        ValueError: It isn't an integer from 1 to ``maximum``
+    """
+    message = f"'num_words' must be an integer from 1 to {maximum}"
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(message)
+    try:
+        num_words = int(value)
+    except ValueError:
+        raise ValueError(message)
+    if not 1 <= num_words <= maximum:
+        raise ValueError(message)
+    return num_words
+
+
+def parse_generate_request(data) -> Tuple[str, int]:
+    """
+    Validate the body of a generation request, before any cache or model is touched.
+
+    Returns:
+        (topic, num_words)
+    """
+    data = data or {}
+    topic = data.get('topic', 'Technology')
+    if not isinstance(topic, str) or not topic.strip():
+        raise ValueError("'topic' must be a non-empty string")
+    return topic, parse_num_words(data.get('num_words', 5))
+
+
+def parse_detail_level(data) -> str:
+    """The requested ``detail`` level of a generation request"""
+    detail = (data or {}).get('detail', 'full')
+    if detail not in DETAIL_LEVELS:
+        raise ValueError(f"'detail' must be one of: {', '.join(DETAIL_LEVELS)}")
+    return detail
+
+
+def parse_batch_request(data) -> Tuple[List[str], int, int]:
+    """
+    Validate the body of a batch generation request.
+
+    Returns:
+        (topics, num_words, concurrency)
+    """
+    topics = (data or {}).get('topics')
+    if not isinstance(topics, list) or not topics:
+        raise ValueError("'topics' must be a non-empty list")
+    if len(topics) > BATCH_MAX_TOPICS:
+        raise ValueError(f"At most {BATCH_MAX_TOPICS} topics can be generated in one batch")
+    if not all(isinstance(topic, str) and topic.strip() for topic in topics):
+        raise ValueError("Every topic must be a non-empty string")
+
+    num_words = parse_num_words(data.get('num_words', 5))
+    # Clients may ask for less parallelism than the server allows, never more
+    concurrency = max(1, min(int(data.get('concurrency', BATCH_CONCURRENCY)), BATCH_CONCURRENCY))
+    return topics, num_words, concurrency
+
+
+def parse_upload_file(files):
+    """
+    Find the uploaded file of an upload request.
+
+    Raises:
+        ValueError: There is no file, or it isn't a supported type
+
+    Returns:
+        (file, file_ext)
+    """
+    # Check if the post request has the file part
+    if 'file' not in files:
+        raise ValueError('No file part')
+    file = files['file']
+
+    # If user does not select file, browser submits an empty part without filename
+    if file.filename == '':
+        raise ValueError('No selected file')
+
+    # Make sure the filename is safe
+    filename = secure_filename(file.filename)
+    file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    if file_ext not in UPLOAD_EXTENSIONS:
+        raise ValueError('File type not supported. Please upload PDF or image files.')
+    return file, file_ext
+
+
+def parse_upload_options(form) -> Tuple[str, int]:
+    """
+    Read the optional ``mode`` and ``num_words`` fields of an upload.
+
+    Returns:
+        (mode, num_words)
+    """
+    mode = form.get('mode', 'single')
+    if mode not in UPLOAD_MODES:
+        raise ValueError(f"'mode' must be one of: {', '.join(UPLOAD_MODES)}")
+    try:
+        num_words = int(form.get('num_words', 5 if mode == 'single' else 8))
+    except ValueError:
+        raise ValueError("'num_words' must be an integer")
+    if not 1 <= num_words <= GENERATE_MAX_WORDS:
+        raise ValueError(f"'num_words' must be from 1 to {GENERATE_MAX_WORDS}")
+    return mode, num_words
+
+
+def parse_job_flag(args) -> bool:
+    """Whether the request asked to run as a background job (``?job=1``)"""
+    value = args.get('job', '0').lower()
+    if value not in ('0', '1', 'false', 'true'):
+        raise ValueError("'job' must be 0 or 1")
+    return value in ('1', 'true')
+
+
+def parse_expand_request(store, graph_id: str, data) -> Tuple[dict, str, int]:
+    """
+    Validate an expansion request.
+
+    Raises:
+        LookupError: The graph or node doesn't exist in ``store``
+        ValueError: The body is invalid
+
+    Returns:
+        (record, node_id, num_words)
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    node_id = data.get('node_id')
+    if not isinstance(node_id, str) or not node_id:
+        raise ValueError("'node_id' must be a non-empty string")
+    num_words = parse_num_words(data.get('num_words', EXPAND_NUM_WORDS), EXPAND_MAX_WORDS)
+
+    with stage('store'):
+        record = store.get(graph_id)
+    if record is None:
+        raise LookupError('Graph not found')
+    if not any(node['id'] == node_id for node in record['graph']['nodes']):
+        raise LookupError('Node not found')
+    return record, node_id, num_words
+
+
+def parse_details_request(store, graph_id: str, node_id: str) -> Tuple[dict, dict]:
+    """
+    Find the node whose details are requested.
+
+    Raises:
+        LookupError: The graph or node doesn't exist in ``store``
+
+    Returns:
+        (record, node)
+    """
+    with stage('store'):
+        record = store.get(graph_id)
+    if record is None:
+        raise LookupError('Graph not found')
+    node = next((node for node in record['graph']['nodes'] if node['id'] == node_id), None)
+    if node is None:
+        raise LookupError('Node not found')
+    return record, node
+
+
+def parse_merge_request(store, data) -> Tuple[List[dict], float]:
+    """
+    Validate a merge request.
+
+    Raises:
+        LookupError: A graph doesn't exist in ``store``
+        ValueError: The body is invalid
+
+    Returns:
+        (records, similarity) with the stored records in request order
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    graph_ids = data.get('graph_ids')
+    if not isinstance(graph_ids, list) or not all(isinstance(graph_id, str) and graph_id for graph_id in graph_ids):
+        raise ValueError("'graph_ids' must be a list of graph IDs")
+    graph_ids = list(dict.fromkeys(graph_ids))
+    if not 2 <= len(graph_ids) <= MERGE_MAX_GRAPHS:
+        raise ValueError(f"'graph_ids' must name from 2 to {MERGE_MAX_GRAPHS} different graphs")
+    similarity = data.get('similarity', MERGE_SIMILARITY)
+    if isinstance(similarity, bool) or not isinstance(similarity, (int, float)) or not 0 < similarity <= 1:
+        raise ValueError("'similarity' must be a number greater than 0 and at most 1")
+
+    with stage('store'):
+        records = [store.get(graph_id) for graph_id in graph_ids]
+    missing = [graph_id for graph_id, record in zip(graph_ids, records) if record is None]
+    if missing:
+        raise LookupError(f"Graph not found: {', '.join(missing)}")
+    return records, similarity
+
+
+def generation_cache_keys(topic: str, num_words: int, detail: str = 'full') -> List[str]:
+    """
+    Cache keys whose responses can answer a generation request, in order
+    of preference; the first is the one this request's answer is cached under.
+
+    A full response has everything a skeleton needs, so skeleton requests
+    also reuse the full response of the same topic.
+    """
+    full_key = make_cache_key(normalize_topic(topic), num_words, PROMPT_VERSION)
+    if detail == 'skeleton':
+        return [make_cache_key(normalize_topic(topic), num_words, PROMPT_VERSION, 'skeleton'), full_key]
+    return [full_key]
+
+
+def get_text_mode(file_ext: str) -> str:
+    """Pick the Aryn text mode for a file type"""
+    return "standard_ocr" if file_ext in ['png', 'jpg', 'jpeg'] else "vision_ocr"
+
+
+def upload_cache_key(digest: str, file_ext: str, topic: str, mode: str, num_words: int) -> str:
+    """Key shared by concurrent uploads of the same document with the same options"""
+    return make_cache_key(digest, get_text_mode(file_ext), normalize_topic(topic), mode, num_words, PROMPT_VERSION)
+
+
+def expansion_cache_key(graph_id: str, node_id: str, num_words: int) -> str:
+    return make_cache_key('expand', graph_id, node_id, num_words, PROMPT_VERSION)
+
+
+def details_cache_key(record: dict, node: dict) -> str:
+    return make_cache_key('details', normalize_topic(record.get('topic', '')),
+                          normalize_term(node['data'].get('label', '')), DETAILS_PROMPT_VERSION)
+
+
+def merge_cache_key(records: List[dict], similarity: float) -> str:
+    return make_cache_key('merge', [record['id'] for record in records], similarity)
+
+
+def cache_status(cache_tier: Optional[str]) -> str:
+    """``X-Cache`` value for a result that came from ``cache_tier`` (None if generated now)"""
+    return 'MISS' if cache_tier is None else 'HIT'
+
+
+def upstream_error_response(error) -> Tuple[dict, int, Dict[str, str]]:
+    """
+    The body, status and headers of the response to an UpstreamError.
+
+    Returns:
+        (payload, status, headers)
+    """
+    headers = {}
+    if error.retry_after:
+        headers['Retry-After'] = str(math.ceil(error.retry_after))
+    return {'error': str(error)}, error.status, headers
+
+
+def stream_done_event(graph: dict, graph_id: str, cache_tier: Optional[str]) -> dict:
+    """
+    Payload of the ``done`` event that ends a graph stream.
+
+    ``repairs`` is only present if the repair changed the streamed nodes
+    or edges; the client can then fetch the stored graph by ``graphId``.
+    """
+    payload = {
+        'graphId': graph_id,
+        'nodes': len(graph['nodes']),
+        'edges': len(graph['edges']),
+        'cache': cache_status(cache_tier),
+        'analytics': graph['analytics'],
+    }
+    if 'repairs' in graph:
+        payload['repairs'] = graph['repairs']
+    return payload
+
+
+def batch_result_event(index: int, topic: str, graph: dict, cache_tier: Optional[str]) -> dict:
+    """Payload of the ``result`` event for one topic of a batch"""
+    return {
+        'index': index,
+        'topic': topic,
+        'cache': cache_status(cache_tier),
+        'graph': graph
+    }
+
+
+def job_accepted(job: dict, events: bool = False) -> Tuple[dict, Dict[str, str]]:
+    """
+    Body and headers of the 202 response for a new job.
+
+    Args:
+        job: The new job record
+        events: Whether this app serves the job's progress events; only the
+            ASGI app does, since a stream would hold a WSGI thread for the
+            whole job
+
+    Returns:
+        (payload, headers) where payload is the job with the URL to poll
+        for its status, and the URL of its progress events if there are any
+    """
+    payload = job_payload(job)
+    payload['statusUrl'] = f"/api/jobs/{job['id']}"
+    if events:
+        payload['eventsUrl'] = f"/api/jobs/{job['id']}/events"
+    return payload, {'Location': payload['statusUrl']}
+
+
+def stored_graph_etag(graph_id: str, wire_format: str = 'full', fields=None) -> str:
+    """ETag of one representation of a stored graph"""
+    if wire_format == 'full' and fields is None:
+        return graph_id
+    return f"{graph_id}-{wire_format}-{'.'.join(fields or ('all',))}"
+
+
+def stored_graph_payload(record: dict) -> dict:
+    """The response body for a stored graph record"""
+    graph = dict(record['graph'], layout='layered', graphId=record['id'])
+    if 'analytics' not in graph:
+        # Stored before analytics were computed
+        apply_analytics(graph)
+    if record.get('topic'):
+        graph['topic'] = record['topic']
+    if record.get('parent'):
+        graph['parentId'] = record['parent']
+    if record.get('merged_from'):
+        graph['mergedFrom'] = record['merged_from']
+    return graph
+
+
+def set_stored_graph_headers(response, etag: str):
+    """Let browsers cache a stored graph and revalidate it by ETag"""
+    # A compressed body isn't byte-identical to the uncompressed one
+    response.set_etag(etag, weak='Content-Encoding' in response.headers)
+    response.headers['Cache-Control'] = f'private, max-age={GRAPH_MAX_AGE}'
+    return response
+
+
+def details_payload(record: dict, node: dict, details: dict) -> dict:
+    return {
+        'graphId': record['id'],
+        'nodeId': node['id'],
+        'label': node['data'].get('label', ''),
+        **details,
+        'detailsLoaded': True,
+    }
+
+
+def cache_stats_payload(sources: dict, flights: dict) -> dict:
+    """
+    Body of /api/word-graph/cache/stats.
+
+    Args:
+        sources: Name -> cache, store, index or provider with ``stats()``,
+            or None if it is turned off
+        flights: Name -> SingleFlight (or AsyncSingleFlight) of each route
+    """
+    payload = {name: source.stats() if source is not None else None for name, source in sources.items()}
+    payload['coalescing'] = {name: flight.stats() for name, flight in flights.items()}
+    return payload
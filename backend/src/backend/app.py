@@ -1,12 +1,56 @@
+import logging
+import os
+
+from dotenv import load_dotenv
 from flask import Flask
 from flask_cors import CORS
-from .word_graph import word_graph_bp
 
-app = Flask(__name__)
-CORS(app)
 
-# Register blueprints
-app.register_blueprint(word_graph_bp)
+def create_app(warm_up=None):
+    """
+    Build the Flask app.
+
+    Importing this module is cheap: the routes (and through them the
+    caches, the Gemini SDK and the Aryn SDK) are only imported here, and
+    model and SDK clients are created per process on first use. Under a
+    preforking server, load the app in the master (gunicorn ``--preload``,
+    see gunicorn.conf.py) and let each worker build its own clients.
+
+    Args:
+        warm_up: Import the SDKs and build this process's clients now
+            instead of on the first request; defaults to the WARM_UP env var
+
+    Returns:
+        The configured app
+    """
+    load_dotenv()
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    from . import word_graph
+
+    app = Flask(__name__)
+    CORS(app, expose_headers=['X-Cache', 'X-Cache-Tier', 'X-Extraction-Cache', 'X-Coalesced', 'X-Degraded',
+                              'ETag', 'Retry-After', 'Server-Timing'])
+
+    # Register blueprints
+    app.register_blueprint(word_graph.word_graph_bp)
+
+    if warm_up is None:
+        warm_up = os.getenv('WARM_UP', '0') != '0'
+    if warm_up:
+        word_graph.warm_up()
+    return app
+
+
+def __getattr__(name):
+    # `backend.app:app` (flask run, existing scripts) builds the app on first access
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=8000) 
\ No newline at end of file
+    create_app().run(debug=True, host='0.0.0.0', port=8000)
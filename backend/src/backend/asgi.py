@@ -0,0 +1,52 @@
+import logging
+import os
+
+from dotenv import load_dotenv
+from quart import Quart
+from quart_cors import cors
+
+
+def create_app(warm_up=None):
+    """
+    Build the Quart app: the same routes as app.py as async handlers, so
+    one process can hold many graph generations while they wait on Gemini.
+
+    Args:
+        warm_up: Import the SDKs and build this process's clients now
+            instead of on the first request; defaults to the WARM_UP env var
+
+    Returns:
+        The configured app
+    """
+    load_dotenv()
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    from . import word_graph
+    from .async_word_graph import async_word_graph_bp
+
+    app = Quart(__name__)
+    app = cors(app, expose_headers=['X-Cache', 'X-Cache-Tier', 'X-Extraction-Cache', 'X-Coalesced', 'X-Degraded',
+                                    'ETag', 'Retry-After', 'Server-Timing'])
+
+    # Register blueprints
+    app.register_blueprint(async_word_graph_bp)
+
+    if warm_up is None:
+        warm_up = os.getenv('WARM_UP', '0') != '0'
+    if warm_up:
+        word_graph.warm_up()
+    return app
+
+
+def __getattr__(name):
+    # `hypercorn src.backend.asgi:app` builds the app on first access
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == '__main__':
+    create_app().run(debug=True, host='0.0.0.0', port=8000)
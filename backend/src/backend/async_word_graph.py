@@ -0,0 +1,718 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from quart import Blueprint, Response, request, jsonify
+
+from .api import (
+    GRAPH_MAX_AGE,
+    JOB_RETRY_AFTER,
+    batch_result_event,
+    cache_stats_payload,
+    cache_status,
+    details_cache_key,
+    details_payload,
+    expansion_cache_key,
+    generation_cache_keys,
+    job_accepted,
+    merge_cache_key,
+    parse_batch_request,
+    parse_detail_level,
+    parse_details_request,
+    parse_expand_request,
+    parse_generate_request,
+    parse_job_flag,
+    parse_merge_request,
+    parse_upload_file,
+    parse_upload_options,
+    set_stored_graph_headers,
+    stored_graph_etag,
+    stored_graph_payload,
+    stream_done_event,
+    upload_cache_key,
+    upstream_error_response,
+)
+from .concepts import MAP_CONCURRENCY, build_map_prompt, merge_concepts, split_into_chunks
+from .details import mark_details_loaded, parse_details_response
+from .graph_builder import IncrementalEdgeBuilder, format_edge, format_node
+from .ingestion import UploadTooLargeError, read_upload
+from .jobs import FINISHED, JOB_POLL_INTERVAL, QueueFullError, job_payload
+from .lazy import PerProcess
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, record_request, registry
+from .providers import get_provider
+from .resilience import CircuitOpenError, UpstreamError
+from .singleflight import AsyncSingleFlight
+from .streaming import WordStreamParser, sse_event
+from .timing import record_stage, request_elapsed, server_timing_header, stage, start_request_timing
+from .validation import DETAILS_SCHEMA, SKELETON_SCHEMA, UPLOAD_SCHEMA, WORDS_SCHEMA
+from .wire import encode_body, encode_graph, parse_wire_options
+from .word_graph import (
+    DEGRADED_GRAPHS,
+    build_generate_prompt,
+    build_graph,
+    build_skeleton_prompt,
+    build_upload_prompt,
+    cache_stats_sources,
+    degraded_graph,
+    details_prompt,
+    expansion_prompt,
+    extract_chunks,
+    graph_cache,
+    graph_store,
+    job_queue,
+    merge_stored_graphs,
+    parse_upload_response,
+    parse_words_response,
+    run_upload_job,
+    semantic_index,
+    semantic_lookup,
+    store_expansion,
+)
+
+logger = logging.getLogger(__name__)
+
+# Blocking calls (Aryn, upload reads, SQLite caches and stores, layout) run
+# here so they never stall the event loop; the bound keeps a burst of
+# requests from spawning unbounded threads
+blocking_executor = PerProcess(lambda: ThreadPoolExecutor(
+    max_workers=int(os.getenv('BLOCKING_EXECUTOR_WORKERS', 8)),
+    thread_name_prefix='blocking-io',
+))
+
+# Concurrent duplicates of a generation share one model call
+generation_flight = AsyncSingleFlight('generate')
+upload_flight = AsyncSingleFlight('upload')
+expansion_flight = AsyncSingleFlight('expand')
+details_flight = AsyncSingleFlight('details')
+merge_flight = AsyncSingleFlight('merge')
+FLIGHTS = {
+    'generate': generation_flight,
+    'upload': upload_flight,
+    'expand': expansion_flight,
+    'details': details_flight,
+    'merge': merge_flight,
+}
+
+# Map calls of every map-reduce upload share a limit, one per event loop:
+# before Python 3.10 a semaphore made at import binds to whichever loop
+# is current then, not the one the server runs
+_map_semaphores = weakref.WeakKeyDictionary()
+
+async_word_graph_bp = Blueprint('async_word_graph', __name__)
+
+
+@async_word_graph_bp.before_request
+async def begin_timing():
+    start_request_timing()
+
+
+@async_word_graph_bp.after_request
+async def add_server_timing(response):
+    header = server_timing_header()
+    if header:
+        response.headers['Server-Timing'] = header
+    elapsed = request_elapsed()
+    if elapsed is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        record_request(route, request.method, response.status_code, elapsed)
+    return response
+
+
+def map_semaphore():
+    """The map call limit of the running event loop"""
+    loop = asyncio.get_running_loop()
+    semaphore = _map_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _map_semaphores[loop] = asyncio.Semaphore(MAP_CONCURRENCY)
+    return semaphore
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking call on the bounded executor and await its result.
+
+    The call runs in a copy of the caller's context, like asyncio.to_thread,
+    so its stages are timed as part of the request.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(blocking_executor.get(), partial(context.run, func, *args, **kwargs))
+
+
+async def generate_words_async(topic, num_words, cache_key, detail='full'):
+    """Async counterpart of word_graph.generate_words"""
+    # Generate content without holding a thread
+    with stage('prompt'):
+        if detail == 'skeleton':
+            prompt, schema = build_skeleton_prompt(topic, num_words), SKELETON_SCHEMA
+        else:
+            prompt, schema = build_generate_prompt(topic, num_words), WORDS_SCHEMA
+    with stage('llm'):
+        response_text = await get_provider().generate_async(prompt, schema)
+    if not response_text:
+        raise ValueError("Empty response from the model")
+
+    with stage('parse'):
+        words = parse_words_response(response_text)
+
+    # Only cache responses that parsed, so a bad generation is retried next time
+    with stage('cache'):
+        await run_blocking(graph_cache.set, cache_key, response_text)
+        if semantic_index is not None:
+            await run_blocking(semantic_index.add, topic, num_words, cache_key, detail)
+    return words
+
+
+async def generate_graph_async(topic, num_words, detail='full'):
+    """Async counterpart of word_graph.generate_graph"""
+    # Reuse a previous Gemini response for the same request if we have one
+    cache_key, *fallback_keys = generation_cache_keys(topic, num_words, detail)
+    with stage('cache'):
+        for key in (cache_key, *fallback_keys):
+            response_text, cache_tier = await run_blocking(graph_cache.lookup, key)
+            if cache_tier is not None:
+                break
+
+    if cache_tier is None:
+        response_text, match = await run_blocking(semantic_lookup, topic, num_words, detail)
+        if match is not None:
+            cache_tier = 'semantic'
+
+    if cache_tier is None:
+        # Identical requests that arrive while this one is generating await its answer
+        start = time.perf_counter()
+        words, shared = await generation_flight.do(
+            cache_key, generate_words_async, topic, num_words, cache_key, detail
+        )
+        if shared:
+            cache_tier = 'inflight'
+            record_stage('coalesce', (time.perf_counter() - start) * 1000)
+    else:
+        with stage('parse'):
+            words = parse_words_response(response_text)
+
+    graph = await run_blocking(build_graph, words)
+    if detail == 'skeleton':
+        mark_details_loaded(graph)
+    with stage('store'):
+        graph['graphId'] = await run_blocking(graph_store.save, graph, topic=topic)
+    return graph, cache_tier
+
+
+def json_response(payload, status=200):
+    """Async counterpart of word_graph.json_response"""
+    body, headers = encode_body(payload, request.headers.get('Accept-Encoding', ''))
+    return Response(body, status=status, headers=headers)
+
+
+@async_word_graph_bp.route('/api/word-graph/generate', methods=['POST'])
+async def generate_word_graph():
+    try:
+        wire_format, fields = parse_wire_options(request.args)
+        data = await request.get_json(silent=True)
+        detail = parse_detail_level(data)
+        topic, num_words = parse_generate_request(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        degraded = False
+        try:
+            graph, cache_tier = await generate_graph_async(topic, num_words, detail)
+        except CircuitOpenError as e:
+            if not DEGRADED_GRAPHS:
+                raise
+            logger.warning("Serving a degraded graph for %r: %s", topic, e)
+            graph, cache_tier, degraded = await run_blocking(degraded_graph, topic, detail), None, True
+
+        with stage('serialize'):
+            result = json_response(encode_graph(graph, wire_format, fields))
+        result.headers['X-Cache'] = cache_status(cache_tier)
+        if cache_tier is not None:
+            result.headers['X-Cache-Tier'] = cache_tier
+        if degraded:
+            result.headers['X-Degraded'] = 'true'
+            result.headers['Cache-Control'] = 'no-store'
+        return result
+
+    except UpstreamError as e:
+        payload, status, headers = upstream_error_response(e)
+        return jsonify(payload), status, headers
+    except Exception as e:
+        logger.exception("Error in generate_word_graph: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+@async_word_graph_bp.route('/api/word-graph/generate/stream', methods=['POST'])
+async def stream_word_graph():
+    """Async counterpart of word_graph.stream_word_graph, with the same events"""
+    try:
+        topic, num_words = parse_generate_request(await request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    cache_key, = generation_cache_keys(topic, num_words)
+    with stage('cache'):
+        response_text, cache_tier = await run_blocking(graph_cache.lookup, cache_key)
+    if cache_tier is None:
+        response_text, match = await run_blocking(semantic_lookup, topic, num_words)
+        if match is not None:
+            cache_tier = 'semantic'
+
+    async def model_pieces():
+        if cache_tier is not None:
+            yield response_text
+            return
+        with stage('prompt'):
+            prompt = build_generate_prompt(topic, num_words)
+        async for piece in get_provider().stream_async(prompt, WORDS_SCHEMA):
+            yield piece
+
+    async def generate_events():
+        parser = WordStreamParser()
+        edge_builder = IncrementalEdgeBuilder()
+        edges_sent = 0
+
+        try:
+            async for piece in model_pieces():
+                for word in parser.feed(piece):
+                    i = len(edge_builder.words)
+                    correlations = edge_builder.add_word(word)
+                    yield sse_event('node', format_node(i, word))
+                    for corr in correlations:
+                        yield sse_event('edge', format_edge(edges_sent, corr))
+                        edges_sent += 1
+
+            if parser.words_found == 0:
+                raise ValueError("Could not find any words in response")
+
+            # Only cache responses that parsed, so a bad generation is retried next time
+            if cache_tier is None:
+                await run_blocking(graph_cache.set, cache_key, parser.buffer)
+                if semantic_index is not None:
+                    await run_blocking(semantic_index.add, topic, num_words, cache_key)
+
+            # Final positions and learning paths once the whole graph is known
+            graph = await run_blocking(build_graph, edge_builder.words)
+            with stage('store'):
+                graph_id = await run_blocking(graph_store.save, graph, topic=topic)
+            yield sse_event('layout', {node['id']: node['position'] for node in graph['nodes']})
+            yield sse_event('done', stream_done_event(graph, graph_id, cache_tier))
+
+        except Exception as e:
+            logger.exception("Error in stream_word_graph: %s", e)
+            yield sse_event('error', {'error': str(e)})
+
+    result = Response(generate_events(), mimetype='text/event-stream')
+    result.headers['Cache-Control'] = 'no-cache'
+    result.headers['X-Accel-Buffering'] = 'no'
+    result.headers['X-Cache'] = cache_status(cache_tier)
+    result.timeout = None
+    return result
+
+
+@async_word_graph_bp.route('/api/word-graph/batch', methods=['POST'])
+async def batch_word_graphs():
+    """Async counterpart of word_graph.batch_word_graphs, with the same events"""
+    try:
+        topics, num_words, concurrency = parse_batch_request(await request.get_json())
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_topic(i, topic):
+        async with semaphore:
+            try:
+                graph, cache_tier = await generate_graph_async(topic, num_words)
+            except Exception as e:
+                logger.error("Error in batch_word_graphs for %r: %s", topic, e)
+                return sse_event('error', {'index': i, 'topic': topic, 'error': str(e)}), False
+        return sse_event('result', batch_result_event(i, topic, graph, cache_tier)), True
+
+    async def generate_events():
+        succeeded = 0
+        tasks = [asyncio.ensure_future(run_topic(i, topic)) for i, topic in enumerate(topics)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                event, ok = await next_done
+                succeeded += ok
+                yield event
+        finally:
+            # Client went away: don't keep calling Gemini for nobody
+            for task in tasks:
+                task.cancel()
+
+        yield sse_event('done', {'succeeded': succeeded, 'failed': len(topics) - succeeded})
+
+    result = Response(generate_events(), mimetype='text/event-stream')
+    result.headers['Cache-Control'] = 'no-cache'
+    result.headers['X-Accel-Buffering'] = 'no'
+    result.timeout = None
+    return result
+
+
+@async_word_graph_bp.route('/api/word-graph/upload', methods=['POST'])
+async def upload_file_for_graph():
+    try:
+        files = await request.files
+        form = await request.form
+        topic = form.get('topic', '')
+        try:
+            file, file_ext = parse_upload_file(files)
+            mode, num_words = parse_upload_options(form)
+            wire_format, fields = parse_wire_options(request.args)
+            job_mode = parse_job_flag(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Read the upload into memory, hashing it as it streams in; Aryn is
+        # handed the bytes directly, so nothing is written to disk
+        with stage('upload'):
+            data, digest = await run_blocking(read_upload, file.stream)
+
+        # Concurrent uploads of the same document with the same options share
+        # one extraction and one round of model calls
+        upload_key = upload_cache_key(digest, file_ext, topic, mode, num_words)
+
+        if job_mode:
+            # Same worker pool (and job records) as the WSGI app
+            try:
+                job = await run_blocking(job_queue.submit, 'upload', run_upload_job, upload_key,
+                                         file_ext, digest, topic, mode, num_words, spool=data)
+            except QueueFullError as e:
+                return jsonify({'error': str(e)}), 503, {'Retry-After': str(JOB_RETRY_AFTER)}
+            payload, headers = job_accepted(job, events=True)
+            return jsonify(payload), 202, headers
+
+        start = time.perf_counter()
+        (graph, extraction_tier), shared = await upload_flight.do(
+            upload_key, generate_upload_graph_async, data, file_ext, digest, topic, mode, num_words
+        )
+        if shared:
+            record_stage('coalesce', (time.perf_counter() - start) * 1000)
+
+        if graph is None:
+            return jsonify({'error': 'Could not extract content from file'}), 400
+
+        with stage('serialize'):
+            result = json_response(encode_graph(graph, wire_format, fields))
+        result.headers['X-Extraction-Cache'] = cache_status(extraction_tier)
+        if shared:
+            result.headers['X-Coalesced'] = 'true'
+        return result
+
+    except UploadTooLargeError as e:
+        return jsonify({'error': str(e)}), 413
+    except UpstreamError as e:
+        payload, status, headers = upstream_error_response(e)
+        return jsonify(payload), status, headers
+    except Exception as e:
+        logger.exception("Error in upload_file_for_graph: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+async def generate_upload_graph_async(data, file_ext, digest, topic, mode='single', num_words=5):
+    """Async counterpart of word_graph.generate_upload_graph"""
+    with stage('extract'):
+        chunks, extraction_tier = await run_blocking(extract_chunks, data, file_ext, digest)
+
+    content_text = "\n".join(chunks)
+
+    # Extract content from the file
+    if not content_text:
+        return None, extraction_tier
+
+    if mode == 'mapreduce':
+        words = await map_reduce_words_async(chunks, topic, num_words)
+    else:
+        # With no topic the same call names one, so this is the only model round trip
+        with stage('prompt'):
+            prompt = build_upload_prompt(topic, content_text, num_words)
+        with stage('llm'):
+            response_text = await get_provider().generate_async(
+                prompt, WORDS_SCHEMA if topic else UPLOAD_SCHEMA
+            )
+        if not response_text:
+            raise ValueError("Empty response from the model")
+
+        with stage('parse'):
+            topic, words = parse_upload_response(response_text, topic)
+
+    graph = await run_blocking(build_graph, words, single_goal=False, node_type='wordNode', edge_type=None)
+    with stage('store'):
+        graph['graphId'] = await run_blocking(graph_store.save, graph, topic=topic,
+                                              node_type='wordNode', edge_type=None)
+    if topic:
+        graph['topic'] = topic
+    return graph, extraction_tier
+
+
+async def map_reduce_words_async(chunks, topic, num_words):
+    """Async counterpart of word_graph.map_reduce_words"""
+    chunk_texts = split_into_chunks(chunks)
+    provider = get_provider()
+
+    async def map_chunk(i, chunk_text):
+        async with map_semaphore():
+            response_text = await provider.generate_async(
+                build_map_prompt(chunk_text, i, len(chunk_texts), topic or None), WORDS_SCHEMA
+            )
+        if not response_text:
+            raise ValueError("Empty response from the model")
+        return parse_words_response(response_text)
+
+    with stage('llm'):
+        results = await asyncio.gather(
+            *(map_chunk(i, chunk_text) for i, chunk_text in enumerate(chunk_texts)),
+            return_exceptions=True
+        )
+    chunk_words = []
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            logger.warning("Error in map_reduce_words for chunk %d/%d: %s", i + 1, len(chunk_texts), result)
+        else:
+            chunk_words.append(result)
+    if not chunk_words:
+        raise ValueError("Could not extract concepts from any part of the document")
+
+    with stage('merge'):
+        return merge_concepts(chunk_words, num_words)
+
+
+@async_word_graph_bp.route('/api/word-graph/<graph_id>', methods=['GET'])
+async def get_word_graph(graph_id):
+    """Async counterpart of word_graph.get_word_graph"""
+    try:
+        wire_format, fields = parse_wire_options(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    etag = stored_graph_etag(graph_id, wire_format, fields)
+    if request.if_none_match.contains_weak(etag):
+        return set_stored_graph_headers(Response(b'', status=304), etag)
+
+    with stage('store'):
+        record = await run_blocking(graph_store.get, graph_id)
+    if record is None:
+        return jsonify({'error': 'Graph not found'}), 404
+
+    with stage('serialize'):
+        result = json_response(encode_graph(stored_graph_payload(record), wire_format, fields))
+    return set_stored_graph_headers(result, etag)
+
+
+@async_word_graph_bp.route('/api/word-graph/<graph_id>/expand', methods=['POST'])
+async def expand_word_graph(graph_id):
+    """Async counterpart of word_graph.expand_word_graph"""
+    try:
+        wire_format, fields = parse_wire_options(request.args)
+        data = await request.get_json(silent=True)
+        record, node_id, num_words = await run_blocking(parse_expand_request, graph_store, graph_id, data)
+    except LookupError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        cache_key = expansion_cache_key(graph_id, node_id, num_words)
+        start = time.perf_counter()
+        (delta, cache_tier), shared = await expansion_flight.do(
+            cache_key, expand_graph_async, record, node_id, num_words, cache_key
+        )
+        if shared:
+            record_stage('coalesce', (time.perf_counter() - start) * 1000)
+
+        with stage('serialize'):
+            result = json_response(encode_graph(delta, wire_format, fields))
+        result.headers['X-Cache'] = cache_status(cache_tier)
+        if shared:
+            result.headers['X-Coalesced'] = 'true'
+        return result
+
+    except UpstreamError as e:
+        payload, status, headers = upstream_error_response(e)
+        return jsonify(payload), status, headers
+    except Exception as e:
+        logger.exception("Error in expand_word_graph: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+async def expand_graph_async(record, node_id, num_words, cache_key):
+    """Async counterpart of word_graph.expand_graph"""
+    with stage('cache'):
+        response_text, cache_tier = await run_blocking(graph_cache.lookup, cache_key)
+
+    if cache_tier is None:
+        with stage('prompt'):
+            prompt = expansion_prompt(record, node_id, num_words)
+        with stage('llm'):
+            response_text = await get_provider().generate_async(prompt, WORDS_SCHEMA)
+        if not response_text:
+            raise ValueError("Empty response from the model")
+        with stage('parse'):
+            words = parse_words_response(response_text)
+        with stage('cache'):
+            await run_blocking(graph_cache.set, cache_key, response_text)
+    else:
+        with stage('parse'):
+            words = parse_words_response(response_text)
+
+    return await run_blocking(store_expansion, record, node_id, words), cache_tier
+
+
+@async_word_graph_bp.route('/api/word-graph/<graph_id>/nodes/<node_id>/details', methods=['GET'])
+async def get_node_details(graph_id, node_id):
+    """Async counterpart of word_graph.get_node_details"""
+    try:
+        record, node = await run_blocking(parse_details_request, graph_store, graph_id, node_id)
+    except LookupError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+
+    try:
+        cache_key = details_cache_key(record, node)
+        start = time.perf_counter()
+        (details, cache_tier), shared = await details_flight.do(
+            cache_key, node_details_async, record, node, cache_key
+        )
+        if shared:
+            record_stage('coalesce', (time.perf_counter() - start) * 1000)
+
+        with stage('serialize'):
+            result = json_response(details_payload(record, node, details))
+        result.headers['X-Cache'] = cache_status(cache_tier)
+        if shared:
+            result.headers['X-Coalesced'] = 'true'
+        result.headers['Cache-Control'] = f'private, max-age={GRAPH_MAX_AGE}'
+        return result
+
+    except UpstreamError as e:
+        payload, status, headers = upstream_error_response(e)
+        return jsonify(payload), status, headers
+    except Exception as e:
+        logger.exception("Error in get_node_details: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+async def node_details_async(record, node, cache_key):
+    """Async counterpart of word_graph.node_details"""
+    if node['data'].get('detailsLoaded', True):
+        return {key: node['data'].get(key) for key in ('summary', 'description', 'examples')}, 'graph'
+
+    with stage('cache'):
+        response_text, cache_tier = await run_blocking(graph_cache.lookup, cache_key)
+
+    if cache_tier is None:
+        with stage('prompt'):
+            prompt = details_prompt(record, node)
+        with stage('llm'):
+            response_text = await get_provider().generate_async(prompt, DETAILS_SCHEMA)
+        if not response_text:
+            raise ValueError("Empty response from the model")
+        with stage('parse'):
+            details = parse_details_response(response_text)
+        with stage('cache'):
+            await run_blocking(graph_cache.set, cache_key, response_text)
+    else:
+        with stage('parse'):
+            details = parse_details_response(response_text)
+    return details, cache_tier
+
+
+@async_word_graph_bp.route('/api/word-graph/merge', methods=['POST'])
+async def merge_word_graphs():
+    """Async counterpart of word_graph.merge_word_graphs"""
+    try:
+        wire_format, fields = parse_wire_options(request.args)
+        data = await request.get_json(silent=True)
+        records, similarity = await run_blocking(parse_merge_request, graph_store, data)
+    except LookupError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        cache_key = merge_cache_key(records, similarity)
+        start = time.perf_counter()
+        # Merging thousands of nodes is CPU work; keep it off the event loop
+        (graph, cache_tier), shared = await merge_flight.do(
+            cache_key, run_blocking, merge_stored_graphs, records, similarity, cache_key
+        )
+        if shared:
+            record_stage('coalesce', (time.perf_counter() - start) * 1000)
+
+        with stage('serialize'):
+            result = json_response(encode_graph(graph, wire_format, fields))
+        result.headers['X-Cache'] = cache_status(cache_tier)
+        if shared:
+            result.headers['X-Coalesced'] = 'true'
+        return result
+
+    except Exception as e:
+        logger.exception("Error in merge_word_graphs: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+@async_word_graph_bp.route('/api/jobs/<job_id>', methods=['GET'])
+async def get_job(job_id):
+    """Async counterpart of word_graph.get_job"""
+    job = await run_blocking(job_queue.get, job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_payload(job)), 200, {'Cache-Control': 'no-store'}
+
+
+@async_word_graph_bp.route('/api/jobs/<job_id>/events', methods=['GET'])
+async def stream_job(job_id):
+    """
+    Progress of a background job as Server-Sent Events, for the ASGI app only.
+
+    Sends a ``status`` event with the job's payload when it connects and
+    whenever the status or stage changes, then a final ``done`` (with the
+    result) or ``error`` event. The job record is polled, since the job may
+    run in another process; a client that reconnects gets the current status.
+    """
+    job = await run_blocking(job_queue.get, job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    async def generate_events():
+        current = job
+        yield sse_event('status', job_payload(current))
+        while current['status'] not in FINISHED:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            latest = await run_blocking(job_queue.get, job_id)
+            if latest is None:
+                yield sse_event('error', {'error': 'Job expired'})
+                return
+            if latest['version'] > current['version']:
+                current = latest
+                yield sse_event('status', job_payload(current))
+        if current['status'] == 'done':
+            yield sse_event('done', current.get('result'))
+        else:
+            yield sse_event('error', {'error': current.get('error', 'Job failed')})
+
+    result = Response(generate_events(), mimetype='text/event-stream')
+    result.headers['Cache-Control'] = 'no-cache'
+    result.headers['X-Accel-Buffering'] = 'no'
+    return result
+
+
+@async_word_graph_bp.route('/api/metrics', methods=['GET'])
+async def metrics():
+    """Async counterpart of word_graph.metrics"""
+    # Rendering reads every worker's metrics file in multiprocess mode
+    return Response(await run_blocking(registry.render), content_type=METRICS_CONTENT_TYPE)
+
+
+@async_word_graph_bp.route('/api/word-graph/cache/stats', methods=['GET'])
+async def cache_stats():
+    """Async counterpart of word_graph.cache_stats"""
+    # The cache and store stats query SQLite
+    return jsonify(await run_blocking(cache_stats_payload, cache_stats_sources(), FLIGHTS))
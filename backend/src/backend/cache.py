@@ -0,0 +1,292 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from .metrics import cache_lookups_total
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv('FLOWLEARN_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'flowlearn'))
+# Disk hits only rewrite accessed_at when the stored value is older than this
+CACHE_TOUCH_INTERVAL = float(os.getenv('CACHE_TOUCH_INTERVAL', '60'))
+
+
+def normalize_topic(topic: str) -> str:
+    """Normalize a topic so trivially different spellings share a cache entry."""
+    return ' '.join(str(topic).casefold().split())
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Build a stable cache key from JSON-serializable parts."""
+    raw = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU with a per-entry expiry time.
+
+    Args:
+        max_entries: Number of entries kept before the least recently used is dropped
+        ttl: Seconds an entry stays valid (None keeps it until evicted)
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value) and mark the entry as recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any, expires_at: Optional[float] = None):
+        if self.max_entries <= 0:
+            return
+        if expires_at is None and self.ttl is not None:
+            expires_at = time.time() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TieredCache:
+    """
+    Two-tier cache: an in-process LRU in front of a SQLite file.
+
+    The SQLite tier survives restarts and is shared by every worker process
+    on the host. Entries expire after ``ttl`` seconds, and the table is
+    trimmed back to ``max_entries`` rows / ``max_bytes`` of payload by
+    dropping the least recently used entries first. Row and byte totals are
+    kept in a side table by triggers, so checking the limits on each write
+    does not scan the table, and recency is only rewritten on a disk hit
+    once it is ``touch_interval`` seconds stale.
+
+    Args:
+        path: SQLite database file
+        table: Table name, so several caches can share one database file
+        ttl: Seconds an entry stays valid
+        max_entries: Maximum number of rows kept on disk
+        max_bytes: Maximum total payload size kept on disk
+        memory_entries: Size of the in-process LRU tier
+        touch_interval: Seconds before a disk hit updates the entry's recency
+    """
+
+    def __init__(self, path: str, table: str = 'cache', ttl: float = 7 * 24 * 3600,
+                 max_entries: int = 10000, max_bytes: int = 256 * 1024 * 1024,
+                 memory_entries: int = 256, touch_interval: float = CACHE_TOUCH_INTERVAL):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self.memory = LRUCache(memory_entries, ttl)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = {'memory': 0, 'disk': 0}
+        self._misses = 0
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and per process, so forked workers
+        # never share a handle inherited from the parent.
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        if not self._initialized:
+            self._create_tables(conn)
+            self._initialized = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _create_tables(self, conn: sqlite3.Connection):
+        table = self.table
+        # One transaction, so the totals are seeded from exactly the rows
+        # that exist before the triggers start keeping them up to date.
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+                'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_accessed_idx ON {table} (accessed_at)')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_expires_idx ON {table} (expires_at)')
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {table}_totals ('
+                'id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL)'
+            )
+            conn.execute(
+                f'INSERT OR IGNORE INTO {table}_totals (id, entries, bytes) '
+                f'SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM {table}'
+            )
+            conn.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {table}_totals_insert AFTER INSERT ON {table} BEGIN '
+                f'UPDATE {table}_totals SET entries = entries + 1, bytes = bytes + NEW.size; END'
+            )
+            conn.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {table}_totals_delete AFTER DELETE ON {table} BEGIN '
+                f'UPDATE {table}_totals SET entries = entries - 1, bytes = bytes - OLD.size; END'
+            )
+            conn.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {table}_totals_update AFTER UPDATE OF size ON {table} BEGIN '
+                f'UPDATE {table}_totals SET bytes = bytes + NEW.size - OLD.size; END'
+            )
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+
+    def lookup(self, key: str) -> Tuple[Any, Optional[str]]:
+        """
+        Look up a key in both tiers.
+
+        Returns:
+            (value, tier) where tier is 'memory' or 'disk' on a hit and None on a miss
+        """
+        found, value = self.memory.get(key)
+        if found:
+            self._record('memory')
+            return value, 'memory'
+
+        try:
+            conn = self._connect()
+            now = time.time()
+            row = conn.execute(
+                f'SELECT value, expires_at, accessed_at FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and row[1] > now:
+                # Eviction only needs rough recency, so skip the write on hot keys
+                if now - row[2] >= self.touch_interval:
+                    conn.execute(
+                        f'UPDATE {self.table} SET accessed_at = ? WHERE key = ?', (now, key)
+                    )
+                value = json.loads(row[0])
+                self.memory.set(key, value, expires_at=row[1])
+                self._record('disk')
+                return value, 'disk'
+            if row is not None:
+                conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            logger.warning("Cache lookup failed for %s: %s", self.table, e)
+
+        self._record(None)
+        return None, None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value, tier = self.lookup(key)
+        return default if tier is None else value
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        expires_at = now + self.ttl
+        self.memory.set(key, value, expires_at=expires_at)
+
+        payload = json.dumps(value, separators=(',', ':'))
+        try:
+            conn = self._connect()
+            # An upsert rather than INSERT OR REPLACE: replaced rows don't fire
+            # delete triggers, which would leave the totals counting them twice
+            conn.execute(
+                f'INSERT INTO {self.table} '
+                '(key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, '
+                'expires_at = excluded.expires_at, accessed_at = excluded.accessed_at',
+                (key, payload, len(payload), expires_at, now)
+            )
+            self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning("Cache write failed for %s: %s", self.table, e)
+
+    def delete(self, key: str):
+        self.memory.pop(key)
+        try:
+            self._connect().execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            logger.warning("Cache delete failed for %s: %s", self.table, e)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute(f'DELETE FROM {self.table} WHERE expires_at <= ?', (now,))
+        count, total = self._totals(conn)
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        # Walk rows from least to most recently used until both limits hold
+        excess_rows = max(0, count - self.max_entries)
+        excess_bytes = max(0, total - self.max_bytes)
+        doomed = []
+        for key, size in conn.execute(
+            f'SELECT key, size FROM {self.table} ORDER BY accessed_at ASC'
+        ):
+            if excess_rows <= 0 and excess_bytes <= 0:
+                break
+            doomed.append((key,))
+            excess_rows -= 1
+            excess_bytes -= size
+        conn.executemany(f'DELETE FROM {self.table} WHERE key = ?', doomed)
+        for (key,) in doomed:
+            self.memory.pop(key)
+
+    def _totals(self, conn: sqlite3.Connection) -> Tuple[int, int]:
+        """(rows, bytes) on disk, as kept by the triggers."""
+        return conn.execute(f'SELECT entries, bytes FROM {self.table}_totals').fetchone()
+
+    def _record(self, tier: Optional[str]):
+        cache_lookups_total.inc(self.table, tier or 'miss')
+        with self._lock:
+            if tier is None:
+                self._misses += 1
+            else:
+                self._hits[tier] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._hits['memory'] + self._hits['disk']
+            lookups = hits + self._misses
+            return {
+                'hits': hits,
+                'memory_hits': self._hits['memory'],
+                'disk_hits': self._hits['disk'],
+                'misses': self._misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory),
+            }
@@ -0,0 +1,158 @@
+import os
+from typing import List, Optional
+
+from .graph_builder import normalize_term
+
+# Rough size of a token for English prose; good enough to keep each map
+# prompt well inside the model's context without calling a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Limits for the map-reduce upload mode
+MAP_CHUNK_TOKENS = int(os.getenv('MAP_CHUNK_TOKENS', 3000))
+MAP_MAX_CHUNKS = int(os.getenv('MAP_MAX_CHUNKS', 16))
+MAP_CONCURRENCY = int(os.getenv('MAP_CONCURRENCY', 16))
+MAP_CONCEPTS_PER_CHUNK = int(os.getenv('MAP_CONCEPTS_PER_CHUNK', 8))
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_into_chunks(texts: List[str], max_tokens: int = MAP_CHUNK_TOKENS,
+                      max_chunks: int = MAP_MAX_CHUNKS) -> List[str]:
+    """
+    Split extracted text into chunks of at most ``max_tokens``.
+
+    Cuts prefer an element boundary near the end of each chunk, then a
+    space, so paragraphs are rarely split mid-sentence. If the document
+    needs more than ``max_chunks`` chunks, the chunk size grows so the whole
+    document is still covered by about ``max_chunks`` map calls, rather
+    than dropping the end.
+
+    Args:
+        texts: Text of each extracted element, in document order
+        max_tokens: Token budget per chunk
+        max_chunks: Target number of chunks (and so map calls) for one document
+
+    Returns:
+        List of chunk texts
+    """
+    text = "\n".join(texts).strip()
+    # The extra quarter covers chunks that end early at an element boundary
+    max_chars = max(max_tokens * CHARS_PER_TOKEN, -(-len(text) * 5 // (max_chunks * 4)))
+
+    chunks = []
+    start = 0
+    while len(text) - start > max_chars:
+        end = start + max_chars
+        cut = text.rfind("\n", end - max_chars // 5, end)
+        if cut <= start:
+            cut = text.rfind(" ", start, end)
+        if cut <= start:
+            cut = end
+        chunks.append(text[start:cut].strip())
+        start = cut
+    if text[start:].strip():
+        chunks.append(text[start:].strip())
+    return chunks
+
+
+def build_map_prompt(chunk_text: str, index: int, total: int, topic: Optional[str] = None,
+                     max_concepts: int = MAP_CONCEPTS_PER_CHUNK) -> str:
+    """Build the prompt that extracts candidate concepts from one chunk of a document"""
+    about = f" about {topic}" if topic else ""
+    return f"""The following is part {index + 1} of {total} of a document{about}.
+        Identify up to {max_concepts} key concepts or terms that this part teaches.
+
+        Content: {chunk_text}
+
+        For each term, provide:
+        1. A brief summary (1-2 sentences)
+        2. A detailed description (2-3 paragraphs)
+        3. Related concepts that a student can learn after this one (use the exact names of other terms you list)
+        4. 2-3 practical examples or use cases
+
+        Format the response as a JSON object with the following structure:
+        {{
+            "words": [
+                {{
+                    "term": "term name",
+                    "summary": "brief summary",
+                    "description": "detailed description",
+                    "related_concepts": ["concept1", "concept2"],
+                    "examples": ["example1", "example2"]
+                }}
+            ]
+        }}"""
+
+
+def merge_concepts(chunk_words: List[List[dict]], num_words: int) -> List[dict]:
+    """
+    Reduce step: merge the concepts found in each chunk into one ``words`` list.
+
+    Terms that normalize to the same string are merged (longest description,
+    union of related concepts and examples). Concepts are ranked by how many
+    chunks mention them, then by how often other concepts point at them,
+    and the top ``num_words`` are kept in order of first appearance so the
+    graph still follows the document. Related concepts that were dropped are
+    removed so no edge points at a missing node.
+
+    Args:
+        chunk_words: Parsed ``words`` arrays, one per chunk, in document order
+        num_words: Number of concepts to keep
+
+    Returns:
+        Merged list of word dicts
+    """
+    merged = {}
+    related_keys = {}
+    mentions = {}
+    references = {}
+    for words in chunk_words:
+        seen_in_chunk = set()
+        for word in words:
+            term = str(word.get('term', '')).strip()
+            key = normalize_term(term)
+            if not key:
+                continue
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = {
+                    'term': term,
+                    'summary': word.get('summary', ''),
+                    'description': word.get('description', ''),
+                    'related_concepts': [],
+                    'examples': [],
+                }
+                related_keys[key] = set()
+            elif len(word.get('description', '')) > len(entry['description']):
+                entry['description'] = word['description']
+            if not entry['summary']:
+                entry['summary'] = word.get('summary', '')
+            for related in word.get('related_concepts', []) or []:
+                related_key = normalize_term(related)
+                if related_key not in related_keys[key]:
+                    related_keys[key].add(related_key)
+                    entry['related_concepts'].append(related)
+                    references[related_key] = references.get(related_key, 0) + 1
+            for example in word.get('examples', []) or []:
+                if example not in entry['examples'] and len(entry['examples']) < 3:
+                    entry['examples'].append(example)
+            if key not in seen_in_chunk:
+                seen_in_chunk.add(key)
+                mentions[key] = mentions.get(key, 0) + 1
+
+    order = {key: i for i, key in enumerate(merged)}
+    ranked = sorted(merged, key=lambda key: (-mentions[key], -references.get(key, 0), order[key]))
+    kept = sorted(ranked[:num_words], key=order.get)
+
+    kept_keys = set(kept)
+    words = []
+    for key in kept:
+        entry = merged[key]
+        entry['related_concepts'] = [
+            related for related in entry['related_concepts']
+            if normalize_term(related) in kept_keys and normalize_term(related) != key
+        ]
+        words.append(entry)
+    return words
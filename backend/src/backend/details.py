@@ -0,0 +1,68 @@
+from typing import List
+
+from .validation import as_string_list, decode_json_objects
+
+# Bump whenever the details prompt changes, like PROMPT_VERSION for graphs
+DETAILS_PROMPT_VERSION = 1
+
+DETAIL_LEVELS = ('full', 'skeleton')
+
+# Neighbouring concepts named in the prompt, for context
+DETAILS_MAX_NEIGHBORS = 8
+
+
+def build_details_prompt(topic: str, term: str, neighbors: List[str]) -> str:
+    """
+    Build the prompt that writes the panel text of one node of a skeleton graph.
+
+    The node's neighbours are named so the description fits where the
+    concept sits in the learning plan.
+    """
+    context = f" as part of learning about {topic}" if topic else ""
+    related = (f"\n        In the student's learning plan it is connected to: "
+               f"{', '.join(neighbors[:DETAILS_MAX_NEIGHBORS])}." if neighbors else "")
+    return f"""
+        Pretend you are a teacher. A student is about to learn the concept below{context}.{related}
+
+        Explain the concept to the student. Format the response as a JSON object with the following structure:
+
+        {{
+            "summary": "brief summary (1-2 sentences)",
+            "description": "detailed description (2-3 paragraphs)",
+            "examples": ["example1", "example2"]
+        }}
+
+        Here is the concept to describe:
+        {term}
+        """
+
+
+def parse_details_response(response_text: str) -> dict:
+    """
+    Extract the ``summary``, ``description`` and ``examples`` of a node
+    from the model's answer to build_details_prompt.
+
+    Raises:
+        ValueError: The response has no usable description
+    """
+    for data in decode_json_objects(response_text):
+        if data.get('description') or data.get('summary'):
+            return {
+                'summary': str(data.get('summary') or ''),
+                'description': str(data.get('description') or ''),
+                'examples': as_string_list(data.get('examples')),
+            }
+    raise ValueError("Could not find node details in response")
+
+
+def mark_details_loaded(graph: dict) -> dict:
+    """
+    Flag the nodes of a skeleton graph with ``detailsLoaded``.
+
+    A node generated in skeleton mode has no description yet; one that
+    does (e.g. reused from a full graph of the same topic) is marked as
+    loaded so the client doesn't ask for it.
+    """
+    for node in graph['nodes']:
+        node['data']['detailsLoaded'] = bool(node['data'].get('description'))
+    return graph
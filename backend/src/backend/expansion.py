@@ -0,0 +1,217 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .analytics import apply_analytics, graph_analytics
+from .graph_builder import format_edge, format_node, normalize_term
+from .layout import apply_layout
+from .validation import repair_words
+
+EXPAND_NUM_WORDS = int(os.getenv('EXPAND_NUM_WORDS', 4))
+EXPAND_MAX_WORDS = int(os.getenv('EXPAND_MAX_WORDS', 10))
+
+# Neighbouring concepts named in the prompt, so the model doesn't repeat them
+EXPAND_MAX_NEIGHBORS = 12
+
+ID_NUMBER_RE = re.compile(r'^(?:node|edge)-(\d+)$')
+
+
+def build_expand_prompt(topic: str, term: str, summary: str, neighbors: List[str],
+                        num_words: int = EXPAND_NUM_WORDS) -> str:
+    """
+    Build the prompt that breaks one node of an existing graph into prerequisites.
+
+    Only the node and the names of its immediate neighbours are sent, so
+    the prompt (and the answer) grow with the expansion, not with the graph.
+    """
+    context = f" as part of learning about {topic}" if topic else ""
+    covered = (f"\n        These neighbouring concepts are already in the graph; do not repeat them: "
+               f"{', '.join(neighbors[:EXPAND_MAX_NEIGHBORS])}." if neighbors else "")
+    return f"""
+        Pretend you are a teacher. A student is about to learn the concept below{context}
+        and needs it broken down further.
+        Create {num_words} smaller concepts the student should learn first, forming a dependency graph
+        that ends at the concept being broken down.
+
+        Concept summary: {summary}{covered}
+
+        Format the response as a JSON object with the following structure:
+
+        {{
+            "words": [
+                {{
+                    "term": "conceptName",
+                    "summary": "brief summary",
+                    "description": "description of the concept",
+                    "related_concepts": ["concept1", "concept2"],
+                    "examples": ["example1", "example2"]
+                }}
+            ]
+        }}
+
+        "related_concepts" lists the concepts the student can learn after this one (a directed edge).
+        Each value must EXACTLY match another term in the list, or the concept being broken down.
+        Make sure it's a valid DAG (no cycles) and that every concept eventually leads to the concept being broken down.
+        Do not include the concept being broken down itself in the list.
+
+        Here is the concept to break down:
+        {term}
+        """
+
+
+def neighbor_labels(graph: dict, node_id: str) -> List[str]:
+    """Labels of the nodes directly connected to ``node_id``"""
+    labels = {node['id']: node['data'].get('label', '') for node in graph['nodes']}
+    neighbors = []
+    for edge in graph['edges']:
+        if edge['target'] == node_id:
+            neighbors.append(labels.get(edge['source'], ''))
+        elif edge['source'] == node_id:
+            neighbors.append(labels.get(edge['target'], ''))
+    return [label for label in dict.fromkeys(neighbors) if label]
+
+
+def _reaches(successors: Dict[str, List[str]], start: str, goal: str) -> bool:
+    """Whether a path leads from ``start`` to ``goal``"""
+    seen = {start}
+    stack = [start]
+    while stack:
+        v = stack.pop()
+        if v == goal:
+            return True
+        for w in successors.get(v, ()):
+            if w not in seen:
+                seen.add(w)
+                stack.append(w)
+    return False
+
+
+def _next_number(items: List[dict]) -> int:
+    numbers = [int(match.group(1)) for match in (ID_NUMBER_RE.match(item['id']) for item in items) if match]
+    return max(numbers, default=len(items) - 1) + 1
+
+
+def splice_expansion(graph: dict, node_id: str, words: List[dict], node_type: Optional[str] = None,
+                     edge_type: Optional[str] = 'smoothstep') -> Tuple[dict, dict]:
+    """
+    Splice the sub-graph generated for one node into a graph.
+
+    The new concepts are repaired into a DAG that ends at the expanded node.
+    Concepts that already exist in the graph (by normalized label) reuse
+    that node instead of duplicating it, keeping their edges to the other
+    concepts of the expansion. An edge that would close a cycle through
+    the existing graph is dropped, and a new concept left without a path
+    to the expanded node is linked to it directly. Existing node and
+    edge IDs never change; new ones continue the ``node-N``/``edge-N``
+    numbering. The combined graph is laid out again.
+
+    Args:
+        graph: Stored React Flow payload; left unchanged
+        node_id: ID of the node being expanded
+        words: Parsed ``words`` array for the expansion
+        node_type: React Flow node type of the graph's nodes
+        edge_type: React Flow edge type of the graph's edges
+
+    Returns:
+        (graph, delta) where graph is the expanded payload and delta has
+        only the new ``nodes`` and ``edges``, the new ``positions`` of
+        existing nodes the layout moved, ``analytics`` with the ``levels``
+        of new nodes and of existing nodes whose level changed (plus
+        ``goal`` and ``acyclic``), and any ``repairs``; the whole graph's
+        analytics come with the stored graph
+    """
+    existing = {node['id']: node for node in graph['nodes']}
+    target = existing[node_id]
+    target_term = target['data'].get('label', '')
+
+    # The expanded node joins the list so the repair can make it the goal
+    words, repairs = repair_words(
+        list(words) + [{'term': target_term, 'related_concepts': []}], goal=target_term
+    )
+
+    ids = {normalize_term(node['data'].get('label', '')): node['id'] for node in graph['nodes']}
+    ids[normalize_term(target_term)] = node_id
+
+    next_node = _next_number(graph['nodes'])
+    new_nodes = []
+    for word in words:
+        key = normalize_term(word['term'])
+        if key in ids:
+            continue
+        node = format_node(next_node, word, node_type)
+        new_nodes.append(node)
+        ids[key] = node['id']
+        next_node += 1
+
+    next_edge = _next_number(graph['edges'])
+    pairs = {(edge['source'], edge['target']) for edge in graph['edges']}
+    successors = {}
+    for source, target_id in pairs:
+        successors.setdefault(source, []).append(target_id)
+    new_edges = []
+
+    def add_edge(pair, explanation) -> bool:
+        nonlocal next_edge
+        if pair in pairs:
+            return False
+        # The expansion itself is acyclic, but a reused node may already
+        # come after one of its new prerequisites in the graph
+        if _reaches(successors, pair[1], pair[0]):
+            repairs['removed_cycle_edges'] = repairs.get('removed_cycle_edges', 0) + 1
+            return False
+        pairs.add(pair)
+        successors.setdefault(pair[0], []).append(pair[1])
+        new_edges.append(format_edge(next_edge, {
+            'source': pair[0],
+            'target': pair[1],
+            'explanation': explanation,
+        }, edge_type))
+        next_edge += 1
+        return True
+
+    # Edges out of new concepts first, so a reused node can't cut them off
+    sources = [(ids[normalize_term(word['term'])], word) for word in words]
+    for source, word in sorted(sources, key=lambda item: item[0] in existing):
+        if source == node_id:
+            continue
+        for related in word['related_concepts']:
+            add_edge((source, ids[normalize_term(related)]),
+                     f"{word['term']} includes {related} as a related concept")
+
+    # Every new concept must still lead to the node it was generated for;
+    # later concepts first, since linking them often connects earlier ones
+    for node in reversed(new_nodes):
+        if (not _reaches(successors, node['id'], node_id)
+                and add_edge((node['id'], node_id), f"{node['data'].get('label', '')} leads to {target_term}")):
+            repairs['linked_to_goal'] = repairs.get('linked_to_goal', 0) + 1
+
+    # Copies, so laying out the expanded graph doesn't move the stored one
+    expanded = {
+        'nodes': [dict(node) for node in graph['nodes']] + new_nodes,
+        'edges': graph['edges'] + new_edges,
+    }
+    apply_layout(expanded)
+    apply_analytics(expanded)
+    old_levels = (graph.get('analytics') or graph_analytics(
+        [node['id'] for node in graph['nodes']],
+        [(edge['source'], edge['target']) for edge in graph['edges']],
+    ))['levels']
+    levels = expanded['analytics']['levels']
+
+    delta = {
+        'nodes': new_nodes,
+        'edges': new_edges,
+        'positions': {
+            node['id']: node['position'] for node in expanded['nodes']
+            if node['id'] in existing and node['position'] != existing[node['id']]['position']
+        },
+        # Only what changed, so the response grows with the expansion, not the graph
+        'analytics': {
+            'levels': {node_id: level for node_id, level in levels.items() if old_levels.get(node_id) != level},
+            'goal': expanded['analytics']['goal'],
+            'acyclic': expanded['analytics']['acyclic'],
+        },
+    }
+    if repairs:
+        delta['repairs'] = repairs
+    return expanded, delta
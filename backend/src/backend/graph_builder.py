@@ -0,0 +1,155 @@
+from typing import Dict, List, Optional, Tuple
+
+EDGE_STYLE = {'stroke': '#3b82f6', 'strokeWidth': 2}
+
+
+def normalize_term(term) -> str:
+    """Normalize a term so related_concepts match node terms regardless of case or spacing."""
+    return ' '.join(str(term).lower().split())
+
+
+def build_term_index(words: List[dict]) -> Dict[str, int]:
+    """Map each normalized term to the index of the first node that uses it."""
+    term_to_index = {}
+    for i, word in enumerate(words):
+        term_to_index.setdefault(normalize_term(word.get('term', '')), i)
+    return term_to_index
+
+
+def build_correlations(words: List[dict]) -> List[dict]:
+    """
+    Build directed edges from each node to the nodes named in its related_concepts.
+
+    The term index is built once, so this is O(n + total related concepts).
+    Each directed edge is produced exactly once and self-loops are skipped.
+
+    Args:
+        words: Entries of the model's ``words`` array
+
+    Returns:
+        Correlations with 'source', 'target' and 'explanation' keys
+    """
+    term_to_index = build_term_index(words)
+    seen = set()
+    correlations = []
+    for i, word in enumerate(words):
+        for related_concept in word.get('related_concepts', []) or []:
+            j = term_to_index.get(normalize_term(related_concept))
+            if j is None or j == i or (i, j) in seen:
+                continue
+            seen.add((i, j))
+            correlations.append({
+                'source': f"node-{i}",
+                'target': f"node-{j}",
+                'explanation': f"{word['term']} includes {related_concept} as a related concept"
+            })
+    return correlations
+
+
+class IncrementalEdgeBuilder:
+    """
+    Streaming counterpart of build_correlations.
+
+    Emits edges as soon as both endpoints exist. A related concept that names
+    a node we have not seen yet is parked until that node arrives. Each
+    directed edge is produced at most once.
+    """
+
+    def __init__(self):
+        self.term_to_index: Dict[str, int] = {}
+        self.words: List[dict] = []
+        self._pending: Dict[str, List[Tuple[int, str]]] = {}
+        self._seen = set()
+
+    def add_word(self, word: dict) -> List[dict]:
+        """
+        Register the next node and return the correlations it completes.
+
+        Args:
+            word: Entry from the ``words`` array; its index is the order it was added
+
+        Returns:
+            Correlations with 'source', 'target' and 'explanation' keys
+        """
+        i = len(self.words)
+        self.words.append(word)
+        term_key = normalize_term(word.get('term', ''))
+        self.term_to_index.setdefault(term_key, i)
+
+        correlations = []
+        for related_concept in word.get('related_concepts', []) or []:
+            related_key = normalize_term(related_concept)
+            j = self.term_to_index.get(related_key)
+            if j is None:
+                self._pending.setdefault(related_key, []).append((i, related_concept))
+            else:
+                self._connect(i, j, related_concept, correlations)
+
+        # Nodes that listed this term before it existed can now be connected
+        for source, related_concept in self._pending.pop(term_key, []):
+            self._connect(source, i, related_concept, correlations)
+        return correlations
+
+    def _connect(self, i: int, j: int, related_concept: str, correlations: List[dict]):
+        # Don't create self-loops or repeat an edge
+        if i == j or (i, j) in self._seen:
+            return
+        self._seen.add((i, j))
+        correlations.append({
+            'source': f"node-{i}",
+            'target': f"node-{j}",
+            'explanation': f"{self.words[i]['term']} includes {related_concept} as a related concept"
+        })
+
+
+def format_node(i: int, word: dict, node_type: Optional[str] = None) -> dict:
+    """Format one entry of the ``words`` array as a React Flow node"""
+    node = {
+        'id': f"node-{i}",
+        'data': {
+            'label': word['term'],
+            'summary': word.get('summary', ''),
+            'description': word.get('description', ''),
+            'relatedTopics': word.get('related_concepts', []),
+            'examples': word.get('examples', [])
+        },
+        'position': {'x': i * 250, 'y': 0},
+        'sourcePosition': 'right',
+        'targetPosition': 'left'
+    }
+    if node_type:
+        node['type'] = node_type
+    return node
+
+
+def format_edge(i: int, corr: dict, edge_type: Optional[str] = 'smoothstep') -> dict:
+    """Format one correlation as a React Flow edge"""
+    edge = {
+        'id': f"edge-{i}",
+        'source': corr['source'],
+        'target': corr['target'],
+        'animated': True,
+        'style': dict(EDGE_STYLE),
+        'data': {'explanation': corr['explanation']}
+    }
+    if edge_type:
+        edge['type'] = edge_type
+    return edge
+
+
+def build_react_flow_graph(words: List[dict], node_type: Optional[str] = None,
+                           edge_type: Optional[str] = 'smoothstep') -> dict:
+    """
+    Turn the model's ``words`` array into a React Flow payload.
+
+    Args:
+        words: Entries of the model's ``words`` array
+        node_type: Optional React Flow node type
+        edge_type: Optional React Flow edge type
+
+    Returns:
+        Dict with 'nodes' and 'edges' lists
+    """
+    nodes = [format_node(i, word, node_type) for i, word in enumerate(words)]
+    edges = [format_edge(i, corr, edge_type) for i, corr in enumerate(build_correlations(words))]
+    return {'nodes': nodes, 'edges': edges}
@@ -0,0 +1,127 @@
+import time
+from typing import List, Optional
+
+from .cache import LRUCache, TieredCache, make_cache_key
+
+
+def graph_id_for(record: dict) -> str:
+    """
+    Content address of a stored graph record.
+
+    Everything the record holds is hashed (the graph with its analytics,
+    topic, parent, merge sources and options), apart from its ``id`` and
+    ``created_at``, which are never sent to clients. One ID, and so one
+    ETag, therefore always stands for the same response: the same nodes
+    and edges generated for another topic or expanded from another
+    parent get another ID.
+    """
+    return make_cache_key({key: value for key, value in record.items() if key not in ('id', 'created_at')})[:32]
+
+
+class GraphStore:
+    """
+    Generated graphs, addressed by a hash of their content.
+
+    Stored graphs never change: expanding one saves the result as a new
+    graph with its own ID (pointing back at its parent), so an ID always
+    names exactly one graph, and a client holding an older ID is never
+    surprised by somebody else's expansion. Since the ID covers every
+    stored field, saving a graph again under its ID writes the same record.
+
+    Args:
+        path: SQLite database file
+        ttl: Seconds a graph is kept after it was last saved
+        max_entries: Maximum number of graphs kept on disk
+        max_bytes: Maximum total size of graphs kept on disk
+        memory_entries: Number of graphs also kept in process
+    """
+
+    def __init__(self, path: str, ttl: float = 30 * 24 * 3600, max_entries: int = 50000,
+                 max_bytes: int = 1024 * 1024 * 1024, memory_entries: int = 256):
+        self.records = TieredCache(path, table='graphs', ttl=ttl, max_entries=max_entries,
+                                   max_bytes=max_bytes, memory_entries=memory_entries)
+
+    def save(self, graph: dict, topic: str = '', node_type: Optional[str] = None,
+             edge_type: Optional[str] = 'smoothstep', parent: Optional[str] = None,
+             merged_from: Optional[List[str]] = None) -> str:
+        """
+        Store a graph and return its ID.
+
+        Args:
+            graph: React Flow payload with 'nodes', 'edges' and optionally 'analytics'
+            topic: Topic the graph was generated for
+            node_type: React Flow node type used for its nodes, reused when it is expanded
+            edge_type: React Flow edge type used for its edges
+            parent: ID of the graph this one was expanded from
+            merged_from: IDs of the graphs this one was merged from
+
+        Returns:
+            The graph's ID
+        """
+        record = {
+            'parent': parent,
+            'merged_from': merged_from,
+            'topic': topic,
+            'options': {'node_type': node_type, 'edge_type': edge_type},
+            'graph': {key: graph[key] for key in ('nodes', 'edges', 'analytics') if key in graph},
+        }
+        graph_id = graph_id_for(record)
+        # Regenerating a cached topic yields the same record; don't rewrite it
+        if self._recently_saved(graph_id):
+            return graph_id
+        self._store(graph_id, dict(record, id=graph_id, created_at=time.time()))
+        return graph_id
+
+    def get(self, graph_id: str) -> Optional[dict]:
+        """The stored record for ``graph_id``, or None"""
+        return self.records.get(graph_id)
+
+    def stats(self) -> dict:
+        return self.records.stats()
+
+    def _recently_saved(self, graph_id: str) -> bool:
+        return self.records.memory.get(graph_id)[0]
+
+    def _store(self, graph_id: str, record: dict):
+        self.records.set(graph_id, record)
+
+
+class MemoryGraphStore(GraphStore):
+    """
+    GraphStore that keeps graphs in process only, for development and tests.
+
+    Graphs are lost on restart and aren't shared between workers.
+
+    Args:
+        ttl: Seconds a graph is kept after it was saved
+        max_entries: Number of graphs kept before the least recently used is dropped
+    """
+
+    def __init__(self, ttl: float = 30 * 24 * 3600, max_entries: int = 1000):
+        self.records = LRUCache(max_entries, ttl)
+
+    def get(self, graph_id: str) -> Optional[dict]:
+        return self.records.get(graph_id)[1]
+
+    def stats(self) -> dict:
+        return {'memory_entries': len(self.records)}
+
+    def _recently_saved(self, graph_id: str) -> bool:
+        return self.records.get(graph_id)[0]
+
+
+def open_graph_store(kind: str, path: str, **limits) -> GraphStore:
+    """
+    Create the graph store selected by GRAPH_STORE.
+
+    Args:
+        kind: 'sqlite' (persistent, shared by every worker on the host) or 'memory'
+        path: SQLite database file, for 'sqlite'
+        **limits: ttl, max_entries, max_bytes and memory_entries
+    """
+    if kind == 'sqlite':
+        return GraphStore(path, **limits)
+    if kind == 'memory':
+        return MemoryGraphStore(ttl=limits.get('ttl', 30 * 24 * 3600),
+                                max_entries=limits.get('max_entries', 1000))
+    raise ValueError(f"Unknown GRAPH_STORE {kind!r}; expected 'sqlite' or 'memory'")
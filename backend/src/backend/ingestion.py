@@ -0,0 +1,230 @@
+import contextvars
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from .lazy import PerProcess
+from .metrics import aryn_elements_total
+from .timing import stage
+
+# Optional: splits long PDFs so each page range is uploaded on its own;
+# without it a PDF is partitioned in one call
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', 100 * 1024 * 1024))
+
+# PDFs longer than this are partitioned as several page ranges at once
+ARYN_PAGES_PER_CHUNK = int(os.getenv('ARYN_PAGES_PER_CHUNK', 20))
+ARYN_MAX_PARALLEL = int(os.getenv('ARYN_MAX_PARALLEL', 4))
+
+# Aryn's raw elements are logged at DEBUG level for this fraction of
+# documents, and at most this many of them, since dumping a large document
+# costs more than partitioning it
+ARYN_DEBUG_SAMPLE_RATE = float(os.getenv('ARYN_DEBUG_SAMPLE_RATE', 0.1))
+ARYN_DEBUG_MAX_ELEMENTS = int(os.getenv('ARYN_DEBUG_MAX_ELEMENTS', 20))
+
+# Shared by every upload so concurrent uploads can't multiply Aryn calls without bound
+partition_executor = PerProcess(
+    lambda: ThreadPoolExecutor(max_workers=ARYN_MAX_PARALLEL, thread_name_prefix='aryn-partition')
+)
+
+# The Aryn SDK takes a few hundred ms to import, so it is only imported by
+# the first upload (or by warm_up)
+partition_file = None
+
+# Page tree root (/Count N) and individual page objects (/Type /Page, not /Pages)
+PDF_PAGE_COUNT_RE = re.compile(rb'/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b')
+PDF_PAGE_RE = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+
+
+class UploadTooLargeError(ValueError):
+    """Upload is bigger than UPLOAD_MAX_BYTES"""
+
+
+def import_aryn():
+    """Import the Aryn SDK's partition_file on first use"""
+    global partition_file
+    if partition_file is None:
+        from aryn_sdk.partition import partition_file as aryn_partition_file
+        partition_file = aryn_partition_file
+    return partition_file
+
+
+def read_upload(stream, max_bytes: int = UPLOAD_MAX_BYTES) -> Tuple[bytes, str]:
+    """
+    Read an uploaded file into memory in chunks, hashing it on the way.
+
+    Args:
+        stream: Readable binary stream, e.g. a FileStorage's ``stream``
+        max_bytes: Largest upload accepted
+
+    Returns:
+        (data, hex SHA-256 digest of data)
+    """
+    hasher = hashlib.sha256()
+    buffer = io.BytesIO()
+    while True:
+        chunk = stream.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        if buffer.tell() + len(chunk) > max_bytes:
+            raise UploadTooLargeError(f"File is larger than {max_bytes // (1024 * 1024)} MB")
+        hasher.update(chunk)
+        buffer.write(chunk)
+    return buffer.getvalue(), hasher.hexdigest()
+
+
+def count_pdf_pages(data: bytes) -> Optional[int]:
+    """
+    Cheaply estimate the number of pages in a PDF without parsing it.
+
+    Uses the largest page tree /Count, falling back to the number of page
+    objects. Returns None when neither is visible (e.g. compressed object
+    streams), in which case the document is partitioned in one call.
+    """
+    counts = [int(a or b) for a, b in PDF_PAGE_COUNT_RE.findall(data)]
+    if counts:
+        return max(counts)
+    pages = len(PDF_PAGE_RE.findall(data))
+    return pages or None
+
+
+def page_ranges(num_pages: int, pages_per_chunk: int = ARYN_PAGES_PER_CHUNK) -> List[List[int]]:
+    """Split pages 1..num_pages into inclusive [start, end] ranges"""
+    return [
+        [start, min(start + pages_per_chunk - 1, num_pages)]
+        for start in range(1, num_pages + 1, pages_per_chunk)
+    ]
+
+
+def split_pdf(data: bytes, pages_per_chunk: int = ARYN_PAGES_PER_CHUNK) -> Optional[List[bytes]]:
+    """
+    Split a long PDF into PDFs of at most ``pages_per_chunk`` pages each.
+
+    Returns:
+        The parts in page order, or None if the PDF should be partitioned
+        whole: it is short, pypdf isn't installed, or pypdf can't read it
+    """
+    num_pages = count_pdf_pages(data)
+    if pypdf is None or (num_pages is not None and num_pages <= pages_per_chunk):
+        return None
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(data))
+        if reader.is_encrypted or len(reader.pages) <= pages_per_chunk:
+            return None
+        parts = []
+        for start, end in page_ranges(len(reader.pages), pages_per_chunk):
+            writer = pypdf.PdfWriter()
+            for page in reader.pages[start - 1:end]:
+                writer.add_page(page)
+            part = io.BytesIO()
+            writer.write(part)
+            parts.append(part.getvalue())
+        return parts
+    except Exception as e:
+        logger.warning("Could not split PDF, partitioning it whole: %s", e)
+        return None
+
+
+def partition_document(data: bytes, file_ext: str, text_mode: str, api_key: str) -> List[dict]:
+    """
+    Partition a document with Aryn, splitting long PDFs into page ranges
+    that are partitioned concurrently. Each range is uploaded as a PDF of
+    its own pages only.
+
+    Args:
+        data: Contents of the uploaded file
+        file_ext: File extension (pdf, png, jpg, jpeg)
+        text_mode: Aryn text mode
+        api_key: Aryn API key
+
+    Returns:
+        Aryn elements of the whole document, in page order
+    """
+    import_aryn()
+
+    def partition(content):
+        # The upload's file name comes from the stream's name, which works on
+        # every aryn-sdk release (the filename keyword only exists from 0.2.8)
+        stream = io.BytesIO(content)
+        stream.name = f"upload.{file_ext}"
+        with stage('partition'):
+            data_dict = partition_file(
+                stream,
+                aryn_api_key=api_key,
+                text_mode=text_mode,
+                extract_table_structure=True,
+                extract_images=True,
+            )
+        return data_dict.get('elements', [])
+
+    parts = None
+    if file_ext == 'pdf':
+        with stage('split'):
+            parts = split_pdf(data)
+    if not parts:
+        return partition(data)
+
+    # Results are collected in submission order, so ranges reassemble in page
+    # order; each runs in a copy of this context so its stage is timed as
+    # part of the request
+    futures = [partition_executor.submit(contextvars.copy_context().run, partition, part) for part in parts]
+    try:
+        return [element for future in futures for element in future.result()]
+    finally:
+        # If one range failed, don't wait on (or pay for) ranges that haven't started
+        for future in futures:
+            future.cancel()
+
+
+def process_file_with_aryn(data, file_ext, text_mode):
+    """
+    Process a file using the Aryn SDK to extract text content.
+
+    Args:
+        data: Contents of the uploaded file
+        file_ext: File extension (pdf, png, jpg, jpeg)
+        text_mode: Aryn text mode for the file type
+
+    Returns:
+        List of text chunks extracted from the file, in document order
+    """
+    try:
+        # Get Aryn API key from environment variable
+        api_key = os.getenv('ARYN_API_KEY')
+        if not api_key:
+            raise ValueError("ARYN_API_KEY environment variable not set")
+
+        elements = partition_document(data, file_ext, text_mode, api_key)
+        aryn_elements_total.inc(amount=len(elements))
+
+        # Dump a sample of the elements for debugging, only when it will be shown
+        if logger.isEnabledFor(logging.DEBUG) and random.random() < ARYN_DEBUG_SAMPLE_RATE:
+            logger.debug("Aryn SDK response elements (%d, showing up to %d): %s", len(elements),
+                         ARYN_DEBUG_MAX_ELEMENTS, json.dumps(elements[:ARYN_DEBUG_MAX_ELEMENTS]))
+
+        context_chunks = []
+
+        for element in elements:
+            if 'text_representation' in element:
+                text = element['text_representation']
+                if text is not None:
+                    context_chunks.append(text)
+
+        return context_chunks
+
+    except Exception as e:
+        logger.error("Error processing file with Aryn SDK: %s", e)
+        raise
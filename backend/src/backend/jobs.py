@@ -0,0 +1,197 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from .cache import TieredCache
+from .lazy import PerProcess
+from .metrics import jobs_total
+from .timing import set_stage_listener
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_MAX_QUEUED = int(os.getenv('JOB_MAX_QUEUED', 16))
+JOB_TTL = float(os.getenv('JOB_TTL', 3600))
+# Where queued jobs keep their input bytes until they run; the system
+# temporary directory if unset
+JOB_SPOOL_DIR = os.getenv('JOB_SPOOL_DIR') or None
+
+# How often a progress stream re-reads a job that may be running in another process
+JOB_POLL_INTERVAL = 0.5
+
+FINISHED = ('done', 'failed')
+
+
+class QueueFullError(RuntimeError):
+    """The worker pool is busy and JOB_MAX_QUEUED jobs are already waiting"""
+
+
+class JobQueue:
+    """
+    Bounded pool of background workers for long-running requests.
+
+    At most ``workers`` jobs run at once and ``max_queued`` more wait;
+    beyond that, submit raises QueueFullError so the caller can shed load
+    instead of queueing work no one will wait for. Job records are kept
+    in SQLite (without an in-process tier), so any worker process can
+    report on a job that another one is running.
+
+    A job's ``stage`` follows the timing stages its function enters
+    (``extract``, ``llm``, ``layout``...), and its ``version`` goes up on
+    every change, so pollers can tell when there is something new.
+
+    A job's input bytes (e.g. an uploaded file) can be spooled to a file
+    rather than held in memory while it waits; the function gets the
+    file's path, and the file is deleted when the job finishes.
+
+    Args:
+        path: SQLite file for the job records
+        workers: Jobs run at once in this process
+        max_queued: Jobs allowed to wait for a worker
+        ttl: Seconds a job record is kept
+        spool_dir: Directory for spooled input, or None for the system
+            temporary directory
+    """
+
+    def __init__(self, path: str, workers: int = 2, max_queued: int = 16, ttl: float = 3600,
+                 spool_dir: Optional[str] = None):
+        self.records = TieredCache(path, table='jobs', ttl=ttl, memory_entries=0)
+        self.workers = workers
+        self.max_queued = max_queued
+        self.spool_dir = spool_dir
+        self._executor = PerProcess(
+            lambda: ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._failed = 0
+
+    def submit(self, kind: str, func: Callable, *args, spool: Optional[bytes] = None, **kwargs) -> dict:
+        """
+        Queue ``func(*args, **kwargs)``; its return value becomes the job's ``result``.
+
+        With ``spool``, the bytes are written to a file and the job runs
+        ``func(path, *args, **kwargs)`` instead; the file is deleted once
+        the job finishes.
+
+        Raises:
+            QueueFullError: Too many jobs are already waiting
+
+        Returns:
+            The new job record
+        """
+        with self._lock:
+            if self._pending >= self.workers + self.max_queued:
+                self._rejected += 1
+                jobs_total.inc(kind, 'rejected')
+                raise QueueFullError("Too many jobs are waiting; try again later")
+            self._pending += 1
+            self._submitted += 1
+        jobs_total.inc(kind, 'submitted')
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'status': 'queued',
+            'stage': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'version': 0,
+        }
+        spool_path = None
+        try:
+            if spool is not None:
+                spool_path = self._spool(spool)
+                args = (spool_path, *args)
+            self._save(job)
+            self._executor.submit(self._run, job, func, args, kwargs, spool_path)
+        except BaseException:
+            if spool_path is not None:
+                os.remove(spool_path)
+            with self._lock:
+                self._pending -= 1
+            raise
+        return job
+
+    def _spool(self, data: bytes) -> str:
+        fd, path = tempfile.mkstemp(prefix='job-', suffix='.spool', dir=self.spool_dir)
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        return path
+
+    def _run(self, job: dict, func: Callable, args: tuple, kwargs: dict, spool_path: Optional[str] = None):
+        def on_stage(name):
+            if job['stage'] != name:
+                job['stage'] = name
+                self._save(job)
+
+        job['status'] = 'running'
+        job['started_at'] = time.time()
+        self._save(job)
+        set_stage_listener(on_stage)
+        try:
+            job['result'] = func(*args, **kwargs)
+            job['status'] = 'done'
+        except Exception as e:
+            logger.exception("Error in %s job %s: %s", job['kind'], job['id'], e)
+            job['status'] = 'failed'
+            job['error'] = str(e)
+            with self._lock:
+                self._failed += 1
+        finally:
+            set_stage_listener(None)
+            if spool_path is not None:
+                try:
+                    os.remove(spool_path)
+                except OSError as e:
+                    logger.warning("Could not remove spooled input of job %s: %s", job['id'], e)
+            job['finished_at'] = time.time()
+            jobs_total.inc(job['kind'], job['status'])
+            self._save(job)
+            with self._lock:
+                self._pending -= 1
+
+    def _save(self, job: dict):
+        job['version'] += 1
+        self.records.set(job['id'], dict(job))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self.records.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queued': self.max_queued,
+                'pending': self._pending,
+                'submitted': self._submitted,
+                'rejected': self._rejected,
+                'failed': self._failed,
+            }
+
+
+def job_payload(job: dict) -> dict:
+    """The client's view of a job record"""
+    payload = {
+        'jobId': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'stage': job['stage'],
+        'createdAt': job['created_at'],
+        'startedAt': job['started_at'],
+        'finishedAt': job['finished_at'],
+        'version': job['version'],
+    }
+    if 'result' in job:
+        payload['result'] = job['result']
+    if 'error' in job:
+        payload['error'] = job['error']
+    return payload
@@ -0,0 +1,333 @@
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .cache import LRUCache, make_cache_key
+
+# Horizontal gap between layers and vertical gap between nodes in a layer
+RANK_SEP = 120
+NODE_SEP = 90
+# Matches the frontend's estimateTextWidth for a 16px label
+CHAR_WIDTH = 9.6
+LABEL_PADDING = 36
+MIN_NODE_WIDTH = 100
+
+CROSSING_SWEEPS = 8
+COORDINATE_PASSES = 4
+
+_layout_cache = LRUCache(int(os.getenv('LAYOUT_CACHE_ENTRIES', 1024)))
+
+
+def estimate_width(label: str) -> float:
+    """Rough rendered width of a node label, in pixels"""
+    return max(len(str(label)) * CHAR_WIDTH + LABEL_PADDING, MIN_NODE_WIDTH)
+
+
+def layout_graph(node_ids: Sequence[str], edges: Sequence[Tuple[str, str]],
+                 widths: Optional[Sequence[float]] = None) -> Dict[str, dict]:
+    """
+    Compute a left-to-right layered (Sugiyama-style) layout.
+
+    Results are cached by a hash of the topology, so laying out a graph we
+    have already seen is a dictionary lookup.
+
+    Args:
+        node_ids: Node IDs, in a stable order
+        edges: (source, target) pairs; edges to unknown nodes are ignored
+        widths: Optional rendered width of each node, used to space the layers
+
+    Returns:
+        Mapping of node ID to a React Flow position dict
+    """
+    if widths is None:
+        widths = [MIN_NODE_WIDTH] * len(node_ids)
+    key = make_cache_key(list(node_ids), sorted(edges), [round(w) for w in widths])
+    found, positions = _layout_cache.get(key)
+    if not found:
+        positions = _compute_layout(list(node_ids), edges, np.asarray(widths, dtype=float))
+        _layout_cache.set(key, positions)
+    return {node_id: {'x': x, 'y': y} for node_id, (x, y) in zip(node_ids, positions)}
+
+
+def apply_layout(graph: dict) -> dict:
+    """
+    Replace the positions of a React Flow payload's nodes with a layered layout.
+
+    Args:
+        graph: Dict with 'nodes' and 'edges' lists, updated in place
+
+    Returns:
+        The same graph
+    """
+    nodes = graph['nodes']
+    positions = layout_graph(
+        [node['id'] for node in nodes],
+        [(edge['source'], edge['target']) for edge in graph['edges']],
+        [estimate_width(node['data'].get('label', '')) for node in nodes],
+    )
+    for node in nodes:
+        node['position'] = positions[node['id']]
+    graph['layout'] = 'layered'
+    return graph
+
+
+def _compute_layout(node_ids: List[str], edges: Sequence[Tuple[str, str]],
+                    widths: np.ndarray) -> List[Tuple[float, float]]:
+    n = len(node_ids)
+    if n == 0:
+        return []
+
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    pairs = {(index[s], index[t]) for s, t in edges if s in index and t in index and s != t}
+    if pairs:
+        src, dst = np.array(sorted(pairs), dtype=np.int64).T
+    else:
+        src = dst = np.zeros(0, dtype=np.int64)
+
+    layer = _assign_layers(n, src, dst)
+    if layer is None:
+        src, dst = _break_cycles(n, src, dst)
+        layer = _assign_layers(n, src, dst)
+
+    layer, src, dst = _insert_dummies(n, layer, src, dst)
+    order = _minimize_crossings(layer, src, dst)
+    y = _assign_coordinates(layer, order, src, dst)
+
+    # Each layer is as wide as its widest real node
+    num_layers = int(layer.max()) + 1
+    layer_width = np.zeros(num_layers)
+    np.maximum.at(layer_width, layer[:n], widths)
+    layer_x = np.concatenate(([0.0], np.cumsum(layer_width + RANK_SEP)[:-1]))
+    x = layer_x[layer[:n]] + (layer_width[layer[:n]] - widths) / 2
+
+    y = y[:n] - y[:n].min()
+    return [(round(float(a), 1), round(float(b), 1)) for a, b in zip(x, y)]
+
+
+def _csr(n: int, src: np.ndarray, dst: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Compressed adjacency: targets of node v are targets[offsets[v]:offsets[v + 1]]"""
+    order = np.argsort(src, kind='stable')
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+    return offsets, dst[order]
+
+
+def _gather(offsets: np.ndarray, targets: np.ndarray, frontier: np.ndarray) -> np.ndarray:
+    """All targets of the frontier nodes, concatenated"""
+    starts = offsets[frontier]
+    counts = offsets[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    shift = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return targets[np.arange(total) + shift]
+
+
+def _group_by(keys: np.ndarray, num_groups: int) -> List[np.ndarray]:
+    """Indices of ``keys`` split by key value, for keys in range(num_groups)"""
+    order = np.argsort(keys, kind='stable')
+    bounds = np.cumsum(np.bincount(keys, minlength=num_groups))[:-1]
+    return np.split(order, bounds)
+
+
+def _assign_layers(n: int, src: np.ndarray, dst: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Longest-path layering, then pull nodes right so edges stay short.
+
+    Returns None if the graph has a cycle.
+    """
+    offsets, targets = _csr(n, src, dst)
+    indegree = np.bincount(dst, minlength=n)
+    layer = np.zeros(n, dtype=np.int64)
+
+    # Kahn's algorithm one wave at a time; the wave number is the longest
+    # path from any source
+    frontier = np.flatnonzero(indegree == 0)
+    placed = 0
+    level = 0
+    while frontier.size:
+        layer[frontier] = level
+        placed += frontier.size
+        reached = _gather(offsets, targets, frontier)
+        indegree -= np.bincount(reached, minlength=n)
+        frontier = np.unique(reached[indegree[reached] == 0])
+        level += 1
+    if placed < n:
+        return None
+
+    # Move every node with successors to just before its nearest successor,
+    # so sources that only feed the goal are not stranded in layer 0. Layers
+    # only ever grow, so walking the original layers from the right is enough.
+    if src.size:
+        unset = np.iinfo(np.int64).max
+        nearest = np.full(n, unset)
+        groups = _group_by(layer[src], int(layer.max()) + 1)
+        for level in range(len(groups) - 2, -1, -1):
+            edge_ids = groups[level]
+            if edge_ids.size == 0:
+                continue
+            np.minimum.at(nearest, src[edge_ids], layer[dst[edge_ids]])
+            movable = np.unique(src[edge_ids])
+            layer[movable] = nearest[movable] - 1
+    return layer
+
+
+def _break_cycles(n: int, src: np.ndarray, dst: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Reverse DFS back edges so the graph becomes acyclic"""
+    offsets, targets = _csr(n, src, dst)
+    state = np.zeros(n, dtype=np.int8)  # 0 = unvisited, 1 = on stack, 2 = done
+    back_edges = set()
+    for root in range(n):
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, int(offsets[root]))]
+        while stack:
+            v, k = stack[-1]
+            if k == offsets[v + 1]:
+                state[v] = 2
+                stack.pop()
+                continue
+            stack[-1] = (v, k + 1)
+            w = int(targets[k])
+            if state[w] == 1:
+                back_edges.add((v, w))
+            elif state[w] == 0:
+                state[w] = 1
+                stack.append((w, int(offsets[w])))
+
+    pairs = set()
+    for s, t in zip(src.tolist(), dst.tolist()):
+        pairs.add((t, s) if (s, t) in back_edges else (s, t))
+    src, dst = np.array(sorted(pairs), dtype=np.int64).T
+    return src, dst
+
+
+def _insert_dummies(n: int, layer: np.ndarray, src: np.ndarray,
+                    dst: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Split edges spanning several layers into chains through dummy nodes"""
+    span = layer[dst] - layer[src]
+    long_edges = span > 1
+    if not long_edges.any():
+        return layer, src, dst
+
+    ls, ld = src[long_edges], dst[long_edges]
+    num_dummies = span[long_edges] - 1
+    total = int(num_dummies.sum())
+    owner = np.repeat(np.arange(ls.size), num_dummies)
+    step = np.arange(total) - np.repeat(np.cumsum(num_dummies) - num_dummies, num_dummies)
+    dummy_ids = n + np.arange(total)
+    dummy_layer = layer[ls][owner] + 1 + step
+
+    chain_src = np.where(step == 0, ls[owner], dummy_ids - 1)
+    last_dummy = n + np.cumsum(num_dummies) - 1
+    src = np.concatenate((src[~long_edges], chain_src, last_dummy))
+    dst = np.concatenate((dst[~long_edges], dummy_ids, ld))
+    return np.concatenate((layer, dummy_layer)), src, dst
+
+
+def _count_crossings(order: np.ndarray, src: np.ndarray, dst: np.ndarray,
+                     groups: List[np.ndarray]) -> int:
+    """
+    Edge crossings between adjacent layers, in O(E log V).
+
+    Edges (a, b) and (c, d) between the same pair of layers cross when
+    a < c and b > d, so with each pair's edges sorted by source position,
+    the crossings are the inversions among their target positions. Those
+    are counted one bit of the target position at a time, for every layer
+    pair at once: an inverted pair is counted at the highest bit where the
+    two positions differ.
+    """
+    if not groups:
+        return 0
+    edge_ids = np.concatenate(groups)
+    if edge_ids.size < 2:
+        return 0
+    group = np.repeat(np.arange(len(groups)), [edge_ids.size for edge_ids in groups])
+    a, b = order[src[edge_ids]], order[dst[edge_ids]]
+    ranked = np.lexsort((b, a, group))
+    group, b = group[ranked], b[ranked]
+
+    bits = int(b.max()).bit_length()
+    total = 0
+    for k in range(bits):
+        # Edges of the same layer pair whose positions agree above bit k,
+        # in their sorted order (the sort is stable)
+        key = (group << bits) | (b >> (k + 1))
+        by_key = np.argsort(key, kind='stable')
+        key, bit = key[by_key], (b[by_key] >> k) & 1
+        ones_before = np.cumsum(bit) - bit
+        starts = np.flatnonzero(np.concatenate(([True], key[1:] != key[:-1])))
+        ones_before -= np.repeat(ones_before[starts], np.diff(np.append(starts, key.size)))
+        total += int(ones_before[bit == 0].sum())
+    return total
+
+
+def _minimize_crossings(layer: np.ndarray, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """Barycenter heuristic, sweeping down and up, keeping the best ordering seen"""
+    size = layer.size
+    num_layers = int(layer.max()) + 1
+    members = _group_by(layer, num_layers)
+    # Position of each node in its layer's member list, for per-layer bincounts
+    slot = np.zeros(size, dtype=np.int64)
+    order = np.zeros(size, dtype=np.int64)
+    for nodes in members:
+        slot[nodes] = np.arange(nodes.size)
+        order[nodes] = np.arange(nodes.size)
+    # After dummy insertion every edge joins adjacent layers, so grouping by
+    # the source layer gives the edges between each pair of layers
+    groups = _group_by(layer[src], num_layers)
+
+    best_order = order.copy()
+    best_crossings = _count_crossings(order, src, dst, groups)
+    for sweep in range(CROSSING_SWEEPS):
+        if best_crossings == 0:
+            break
+        downward = sweep % 2 == 0
+        # Barycenter of each node's neighbours in the previous layer of the sweep
+        fixed, free = (src, dst) if downward else (dst, src)
+        levels = range(1, num_layers) if downward else range(num_layers - 2, -1, -1)
+        for level in levels:
+            nodes = members[level]
+            edge_ids = groups[level - 1] if downward else groups[level]
+            free_slots = slot[free[edge_ids]]
+            weight = np.bincount(free_slots, weights=order[fixed[edge_ids]], minlength=nodes.size)
+            degree = np.bincount(free_slots, minlength=nodes.size)
+            current = order[nodes].astype(float)
+            barycenter = np.where(degree > 0, weight / np.maximum(degree, 1), current)
+            ranked = nodes[np.lexsort((current, barycenter))]
+            order[ranked] = np.arange(ranked.size)
+
+        crossings = _count_crossings(order, src, dst, groups)
+        if crossings < best_crossings:
+            best_crossings = crossings
+            best_order = order.copy()
+    return best_order
+
+
+def _assign_coordinates(layer: np.ndarray, order: np.ndarray, src: np.ndarray,
+                        dst: np.ndarray) -> np.ndarray:
+    """Place nodes near the mean of their neighbours while keeping NODE_SEP apart"""
+    size = layer.size
+    num_layers = int(layer.max()) + 1
+    members = [nodes[np.argsort(order[nodes])] for nodes in _group_by(layer, num_layers)]
+
+    y = np.zeros(size)
+    for nodes in members:
+        y[nodes] = (np.arange(nodes.size) - (nodes.size - 1) / 2) * NODE_SEP
+
+    both_src = np.concatenate((src, dst))
+    both_dst = np.concatenate((dst, src))
+    degree = np.bincount(both_dst, minlength=size)
+    for _ in range(COORDINATE_PASSES):
+        weight = np.bincount(both_dst, weights=y[both_src], minlength=size)
+        desired = np.where(degree > 0, weight / np.maximum(degree, 1), y)
+        for nodes in members:
+            target = desired[nodes]
+            # Smallest upward push that keeps every pair NODE_SEP apart in order
+            spacing = np.arange(nodes.size) * NODE_SEP
+            placed = np.maximum.accumulate(target - spacing) + spacing
+            # Re-centre on the desired positions so the push does not drift down
+            y[nodes] = placed - (placed.mean() - target.mean())
+    return y
@@ -0,0 +1,46 @@
+import os
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class PerProcess(Generic[T]):
+    """
+    Build an object on first use, once per process.
+
+    A preforking server (gunicorn ``--preload``) imports the app in the
+    master and forks workers from it. Objects created before the fork,
+    such as SDK clients holding sockets or thread pools whose threads
+    don't survive it, would be shared by or broken in every worker, so
+    they are wrapped in this and created again in each process that
+    uses them. Attribute access is forwarded to the object, so call
+    sites read the same as with the object itself.
+
+    Args:
+        factory: Builds the object; called at most once per process
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        """The object of this process, building it if needed"""
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._value = self._factory()
+                    self._pid = pid
+        return self._value
+
+    @property
+    def created(self) -> bool:
+        """Whether this process has built the object yet"""
+        return self._pid == os.getpid()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
@@ -0,0 +1,209 @@
+import math
+import os
+from collections import Counter
+from typing import List, Optional, Sequence, Set, Tuple
+
+from .graph_builder import format_edge, format_node
+from .terms import marker_words, term_words
+from .validation import find_back_edges
+
+MERGE_MAX_GRAPHS = int(os.getenv('MERGE_MAX_GRAPHS', 50))
+
+# Minimum trigram Jaccard similarity of two concept names for them to be
+# merged; 1 merges only names that are equal once canonicalized
+MERGE_SIMILARITY = float(os.getenv('MERGE_SIMILARITY', 0.8))
+
+ARTICLES = {'a', 'an', 'the'}
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def canonical_words(term: str) -> List[str]:
+    """
+    The words of a concept name with case, punctuation, a leading article
+    and simple plurals normalized away.
+    """
+    words = term_words(term)
+    if len(words) > 1 and words[0] in ARTICLES:
+        words = words[1:]
+    return [_singular(word) for word in words]
+
+
+def canonical_term(term: str) -> str:
+    """
+    Key under which spellings of one concept name are equal, so "The
+    Neural Networks", "neural-network" and "NeuralNetwork" share a key,
+    while "C", "C++" and "C#" don't.
+    """
+    return ''.join(canonical_words(term))
+
+
+def trigrams(key: str) -> Set[str]:
+    """Character trigrams of a canonical term, padded with ``<`` and ``>``"""
+    padded = f'<{key}>'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1; the smallest index of a set is its root"""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            # Path halving keeps the trees shallow
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def cluster_terms(terms: Sequence[str], threshold: float = MERGE_SIMILARITY) -> List[int]:
+    """
+    Group concept names that name the same concept, without comparing all pairs.
+
+    Names are only merged if their marker words (numbers, symbols, single
+    letters and numerals, see terms.marker_words) are the same, so neither
+    "World War I" and "II" nor "Pointers in C" and "Pointers in C++" are.
+    Names with the same canonical_term and markers are merged through a
+    hash index. The remaining distinct names are merged when their
+    trigram Jaccard similarity is at least ``threshold``. Only candidates
+    are scored:
+    names sharing one of their rarest trigrams, found through an inverted
+    index (prefix filtering: two sets that similar must share one of
+    their ``size - ceil(threshold * size) + 1`` rarest elements), so the
+    work grows with the number of near matches, not with n^2. Merges are
+    transitive.
+
+    Args:
+        terms: Concept names
+        threshold: Minimum similarity for a fuzzy match; 1 disables fuzzy matching
+
+    Returns:
+        For each name, the index of the first name of its group
+    """
+    groups = UnionFind(len(terms))
+    words = [canonical_words(term) for term in terms]
+    keys = [''.join(name_words) for name_words in words]
+    markers = [marker_words(name_words) for name_words in words]
+
+    first = {}
+    distinct = []
+    for i, key in enumerate(zip(keys, markers)):
+        j = first.setdefault(key, i)
+        if j == i:
+            distinct.append(i)
+        else:
+            groups.union(j, i)
+
+    if threshold < 1:
+        grams = {i: trigrams(keys[i]) for i in distinct}
+        frequency = Counter(gram for mine in grams.values() for gram in mine)
+        postings = {}
+        for i in distinct:
+            mine = grams[i]
+            prefix_size = len(mine) - math.ceil(threshold * len(mine) - 1e-9) + 1
+            candidates = set()
+            for gram in sorted(mine, key=lambda gram: (frequency[gram], gram))[:prefix_size]:
+                ids = postings.setdefault(gram, [])
+                candidates.update(ids)
+                ids.append(i)
+            for j in candidates:
+                theirs = grams[j]
+                # Sets whose sizes differ by more than the threshold allows can't match
+                if min(len(mine), len(theirs)) < threshold * max(len(mine), len(theirs)):
+                    continue
+                shared = len(mine & theirs)
+                if shared >= threshold * (len(mine) + len(theirs) - shared) and markers[i] == markers[j]:
+                    groups.union(j, i)
+
+    return [groups.find(i) for i in range(len(terms))]
+
+
+def merge_graphs(graphs: Sequence[dict], threshold: float = MERGE_SIMILARITY,
+                 node_type: Optional[str] = None,
+                 edge_type: Optional[str] = 'smoothstep') -> Tuple[dict, dict]:
+    """
+    Union React Flow graphs into one concept graph.
+
+    Nodes whose labels match (see cluster_terms) become one node, which
+    keeps the label of its first occurrence and takes the first non-empty
+    summary and description and every example of its matches. Edges are
+    remapped onto the merged nodes; duplicates and self-loops are dropped,
+    and so are the edges that would close a cycle, since graphs that
+    disagree on an order of two concepts can't both be followed. The
+    result isn't laid out.
+
+    Args:
+        graphs: Graphs with 'nodes' and 'edges', in order of precedence
+        threshold: Minimum name similarity for nodes to be merged
+        node_type: React Flow node type of the merged nodes
+        edge_type: React Flow edge type of the merged edges
+
+    Returns:
+        (graph, repairs) where repairs counts merged nodes and removed edges
+    """
+    members = [(g, node) for g, graph in enumerate(graphs) for node in graph['nodes']]
+    groups = cluster_terms([node['data'].get('label', '') for _, node in members], threshold)
+
+    numbers = {}
+    index = {}
+    words = []
+    loaded_flags = set()
+    for (g, node), root in zip(members, groups):
+        k = numbers.get(root)
+        data = node['data']
+        if k is None:
+            k = numbers[root] = len(words)
+            words.append({'term': data.get('label', ''), 'summary': '', 'description': '', 'examples': []})
+        index[(g, node['id'])] = k
+        word = words[k]
+        word['summary'] = word['summary'] or data.get('summary', '')
+        word['description'] = word['description'] or data.get('description', '')
+        word['examples'].extend(data.get('examples', []))
+        if 'detailsLoaded' in data:
+            loaded_flags.add(k)
+
+    adjacency = [[] for _ in words]
+    explanations = {}
+    for g, graph in enumerate(graphs):
+        for edge in graph['edges']:
+            s, t = index.get((g, edge['source'])), index.get((g, edge['target']))
+            if s is None or t is None or s == t or (s, t) in explanations:
+                continue
+            adjacency[s].append(t)
+            explanations[(s, t)] = edge.get('data', {}).get('explanation', '')
+
+    back_edges = find_back_edges(adjacency)
+    nodes = []
+    for k, word in enumerate(words):
+        word['examples'] = list(dict.fromkeys(word['examples']))
+        word['related_concepts'] = [words[t]['term'] for t in adjacency[k] if (k, t) not in back_edges]
+        node = format_node(k, word, node_type)
+        if k in loaded_flags:
+            node['data']['detailsLoaded'] = bool(word['description'])
+        nodes.append(node)
+    edges = [
+        format_edge(i, {'source': f"node-{s}", 'target': f"node-{t}", 'explanation': explanations[(s, t)]},
+                    edge_type)
+        for i, (s, t) in enumerate(pair for pair in explanations if pair not in back_edges)
+    ]
+
+    repairs = {}
+    if len(members) > len(words):
+        repairs['merged_concepts'] = len(members) - len(words)
+    if back_edges:
+        repairs['removed_cycle_edges'] = len(back_edges)
+    return {'nodes': nodes, 'edges': edges}, repairs
@@ -0,0 +1,407 @@
+import atexit
+import bisect
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans cache hits (sub-millisecond) to long map-reduce uploads
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# With several worker processes (gunicorn), each one writes its metrics to a
+# file in this directory and /api/metrics adds up the files of every process;
+# unset, /api/metrics reports the process that serves it
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+# Seconds between writes of a process's metrics to MULTIPROC_DIR
+FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels.
+
+    Args:
+        name: Metric name
+        help_text: One-line description
+        labels: Label names; every ``inc`` passes one value per name
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        key = tuple(str(value) for value in label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(tuple(str(value) for value in label_values), 0.0)
+
+    def empty(self) -> 'Counter':
+        """A counter like this one with no samples"""
+        return Counter(self.name, self.help_text, self.labels)
+
+    def dump(self) -> list:
+        """The samples as JSON, for ``load`` in another process"""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def load(self, samples: list):
+        """Add the samples of another counter's ``dump`` to this one"""
+        for key, value in samples:
+            self.inc(*key, amount=value)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+
+
+class Histogram:
+    """
+    Cumulative histogram with optional labels, in Prometheus bucket layout.
+
+    Args:
+        name: Metric name
+        help_text: One-line description
+        labels: Label names
+        buckets: Upper bounds, ascending; +Inf is implied
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (last is +Inf)], sum, count
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        key = tuple(str(label) for label in label_values)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(tuple(str(value) for value in label_values))
+        return series[2] if series else 0
+
+    def empty(self) -> 'Histogram':
+        """A histogram like this one with no samples"""
+        return Histogram(self.name, self.help_text, self.labels, self.buckets)
+
+    def dump(self) -> list:
+        """The samples as JSON, for ``load`` in another process"""
+        with self._lock:
+            return [[list(key), list(counts), total, count] for key, (counts, total, count) in self._series.items()]
+
+    def load(self, samples: list):
+        """Add the samples of another histogram's ``dump`` to this one"""
+        with self._lock:
+            for key, counts, total, count in samples:
+                if len(counts) != len(self.buckets) + 1:
+                    # Written with other buckets; they can't be added up
+                    continue
+                series = self._series.setdefault(tuple(key), [[0] * (len(self.buckets) + 1), 0.0, 0])
+                series[0] = [mine + theirs for mine, theirs in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, ('le', _format_value(bound)))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(self.labels, key)} {count}'
+
+
+def _read_json(path: str):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Error reading metrics file %s: %s", path, e)
+        return None
+
+
+def _write_json(path: str, data):
+    # Write to a temporary file and rename it, so readers never see half a file
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class Registry:
+    """
+    The metrics of this process, rendered in the Prometheus text format.
+
+    With ``multiproc_dir``, every process that records metrics writes them
+    to its own file there every ``flush_interval`` seconds and at exit, and
+    ``render`` adds up the files of every process, so any worker reports
+    the totals of the whole server. Files of exited processes are folded
+    into one by ``mark_process_dead``, so counters never go back when a
+    worker is replaced. Like prometheus_client's multiprocess mode, the
+    directory must be emptied (``clear``) before the server starts.
+
+    Args:
+        multiproc_dir: Directory shared by the server's processes, or None
+            to report this process only
+        flush_interval: Seconds between writes of this process's file
+    """
+
+    EXITED_FILE = 'exited.json'
+
+    def __init__(self, multiproc_dir: Optional[str] = None, flush_interval: float = 5.0):
+        self._metrics = []
+        self._lock = threading.Lock()
+        self.multiproc_dir = multiproc_dir
+        self.flush_interval = flush_interval
+        self._flusher_pid: Optional[int] = None
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def _process_path(self, pid: int) -> str:
+        return os.path.join(self.multiproc_dir, f'metrics-{pid}.json')
+
+    def _process_files(self) -> List[str]:
+        return glob.glob(os.path.join(self.multiproc_dir, 'metrics-*.json'))
+
+    def _dump(self) -> dict:
+        with self._lock:
+            metrics = list(self._metrics)
+        return {metric.name: metric.dump() for metric in metrics}
+
+    def _empty_copies(self) -> list:
+        with self._lock:
+            return [metric.empty() for metric in self._metrics]
+
+    def start_flushing(self):
+        """Write this process's metrics periodically from now on, and at exit"""
+        pid = os.getpid()
+        if not self.multiproc_dir or self._flusher_pid == pid:
+            return
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            # Set again in forked workers, whose copy of the thread is gone
+            self._flusher_pid = pid
+        threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True).start()
+        atexit.register(self.flush)
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write this process's metrics to its file in the shared directory"""
+        if not self.multiproc_dir or self._flusher_pid != os.getpid():
+            return
+        try:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+            _write_json(self._process_path(os.getpid()), self._dump())
+        except OSError as e:
+            logger.warning("Error writing metrics: %s", e)
+
+    def mark_process_dead(self, pid: int):
+        """
+        Fold the file of an exited process into the total of exited processes.
+
+        Called by the server's master when a worker exits (gunicorn's
+        ``child_exit`` hook), so replaced workers don't leave a file each.
+        """
+        if not self.multiproc_dir:
+            return
+        data = _read_json(self._process_path(pid))
+        if data is None:
+            return
+        exited_path = os.path.join(self.multiproc_dir, self.EXITED_FILE)
+        exited = _read_json(exited_path) or {'metrics': {}}
+        totals = {}
+        for metric in self._empty_copies():
+            for samples in (exited['metrics'].get(metric.name, []), data.get(metric.name, [])):
+                metric.load(samples)
+            totals[metric.name] = metric.dump()
+        # Readers skip the folded file until it is gone, so it is never counted twice
+        _write_json(exited_path, {'metrics': totals, 'folded_pid': pid})
+        os.remove(self._process_path(pid))
+        # A new process may get the same pid
+        _write_json(exited_path, {'metrics': totals})
+
+    def clear(self):
+        """Remove the files of a previous run of the server"""
+        if not self.multiproc_dir:
+            return
+        exited_path = os.path.join(self.multiproc_dir, self.EXITED_FILE)
+        for path in self._process_files() + glob.glob(exited_path):
+            os.remove(path)
+
+    def _collect(self) -> list:
+        """Copies of the metrics holding the samples of every process"""
+        self.start_flushing()
+        self.flush()
+        for _ in range(3):
+            metrics = self._empty_copies()
+            by_name = {metric.name: metric for metric in metrics}
+            exited = _read_json(os.path.join(self.multiproc_dir, self.EXITED_FILE)) or {'metrics': {}}
+            files = [exited['metrics']]
+            skipped = self._process_path(exited['folded_pid']) if 'folded_pid' in exited else None
+            for path in self._process_files():
+                if path == skipped:
+                    continue
+                data = _read_json(path)
+                if data is None:
+                    # Folded into exited.json after that was read; read again
+                    break
+                files.append(data)
+            else:
+                for data in files:
+                    for name, samples in data.items():
+                        if name in by_name:
+                            by_name[name].load(samples)
+                return metrics
+        logger.warning("Metrics files kept changing; reporting this process only")
+        with self._lock:
+            return list(self._metrics)
+
+    def render(self) -> str:
+        lines = []
+        if self.multiproc_dir:
+            metrics = self._collect()
+        else:
+            with self._lock:
+                metrics = list(self._metrics)
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry(MULTIPROC_DIR, FLUSH_INTERVAL)
+
+stage_seconds = registry.histogram(
+    'flowlearn_stage_duration_seconds',
+    'Time spent in each pipeline stage (extract, partition, prompt, llm, parse, edges, layout, serialize...)',
+    ['stage'],
+)
+request_seconds = registry.histogram(
+    'flowlearn_request_duration_seconds', 'Time to handle a request, by route', ['route', 'method'],
+)
+requests_total = registry.counter(
+    'flowlearn_requests_total', 'Requests handled, by route and status code', ['route', 'method', 'status'],
+)
+llm_call_seconds = registry.histogram(
+    'flowlearn_llm_call_duration_seconds', 'Latency of individual model calls', ['provider', 'method'],
+)
+llm_calls_total = registry.counter(
+    'flowlearn_llm_calls_total', 'Model calls, by outcome', ['provider', 'method', 'outcome'],
+)
+llm_tokens_total = registry.counter(
+    'flowlearn_llm_tokens_total',
+    'Prompt and output tokens (as reported by the model, or estimated from text length)',
+    ['provider', 'kind'],
+)
+cache_lookups_total = registry.counter(
+    'flowlearn_cache_lookups_total', 'Cache lookups, by cache and the tier that answered', ['cache', 'result'],
+)
+llm_retries_total = registry.counter(
+    'flowlearn_llm_retries_total', 'Model calls retried after a transient error', ['provider'],
+)
+llm_rejected_total = registry.counter(
+    'flowlearn_llm_rejected_total',
+    'Model calls refused before reaching the API (rate_limited or circuit_open)',
+    ['provider', 'reason'],
+)
+jobs_total = registry.counter(
+    'flowlearn_jobs_total', 'Background jobs, by kind and what became of them', ['kind', 'outcome'],
+)
+coalesced_total = registry.counter(
+    'flowlearn_coalesced_total',
+    'Callers that waited on an identical in-flight call instead of running their own, by flight',
+    ['flight'],
+)
+aryn_elements_total = registry.counter(
+    'flowlearn_aryn_elements_total', 'Elements returned by Aryn partitioning',
+)
+
+
+def observe_stage(name: str, duration_ms: float):
+    stage_seconds.observe(duration_ms / 1000, name)
+
+
+def record_request(route: str, method: str, status: int, duration: float):
+    """Count one handled request that took ``duration`` seconds"""
+    registry.start_flushing()
+    request_seconds.observe(duration, route, method)
+    requests_total.inc(route, method, status)
+
+
+def record_llm_call(provider: str, method: str, duration: float, outcome: str = 'ok',
+                    prompt_tokens: int = 0, output_tokens: int = 0):
+    """Count one model call and the tokens it used"""
+    llm_call_seconds.observe(duration, provider, method)
+    llm_calls_total.inc(provider, method, outcome)
+    if prompt_tokens:
+        llm_tokens_total.inc(provider, 'prompt', amount=prompt_tokens)
+    if output_tokens:
+        llm_tokens_total.inc(provider, 'output', amount=output_tokens)
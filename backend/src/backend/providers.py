@@ -0,0 +1,758 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from .concepts import estimate_tokens
+from .metrics import llm_rejected_total, llm_retries_total, record_llm_call
+from .resilience import (
+    CircuitBreaker, CircuitOpenError, RetryBudget, TokenBucket, UpstreamError, backoff_delay, deadline,
+    is_transient, time_remaining, upstream_error,
+)
+
+# (prompt_tokens, output_tokens) of the current context's last model call,
+# for providers whose API reports them; a ContextVar so concurrent threads
+# and tasks each see their own call's usage
+_last_usage: ContextVar[Optional[Tuple[int, int]]] = ContextVar('llm_usage', default=None)
+
+
+# google.generativeai takes about half a second to import, so it is only
+# imported when a Gemini provider is created
+genai = None
+
+
+def import_genai():
+    """Import the Gemini SDK on first use"""
+    global genai
+    if genai is None:
+        import google.generativeai
+        genai = google.generativeai
+    return genai
+
+
+def report_usage(usage_metadata):
+    """Record the token counts a model API returned for the current call"""
+    if usage_metadata is not None:
+        _last_usage.set((getattr(usage_metadata, 'prompt_token_count', 0) or 0,
+                         getattr(usage_metadata, 'candidates_token_count', 0) or 0))
+
+
+class LLMProvider:
+    """
+    Interface the word graph routes use to talk to a language model.
+
+    Implementations return the raw response text; prompt building and
+    parsing stay in the routes so every provider goes through the same
+    pipeline.
+    """
+
+    name = 'base'
+
+    def generate(self, prompt: str, schema: Optional[dict] = None) -> str:
+        """
+        Args:
+            prompt: Full prompt text
+            schema: JSON schema the response must follow, for providers
+                that support constrained output (others just ignore it)
+        """
+        raise NotImplementedError
+
+    async def generate_async(self, prompt: str, schema: Optional[dict] = None) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, schema: Optional[dict] = None) -> Iterator[str]:
+        """Yield the response text piece by piece"""
+        yield self.generate(prompt, schema)
+
+    async def stream_async(self, prompt: str, schema: Optional[dict] = None) -> AsyncIterator[str]:
+        yield await self.generate_async(prompt, schema)
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini through the google-generativeai SDK"""
+
+    name = 'gemini'
+
+    def __init__(self, model_name: str = 'gemini-2.0-flash', api_key: Optional[str] = None):
+        import_genai()
+        genai.configure(api_key=api_key or os.getenv('GEMINI_API_KEY'))
+        self.model = genai.GenerativeModel(model_name)
+
+    @staticmethod
+    def _generation_config(schema: Optional[dict]):
+        if schema is None:
+            return None
+        # Constrained decoding: the model can only emit JSON matching the schema
+        return genai.GenerationConfig(response_mime_type='application/json', response_schema=schema)
+
+    @staticmethod
+    def _request_options() -> Optional[dict]:
+        # Give up on the HTTP request when the call's deadline passes
+        remaining = time_remaining()
+        return None if remaining is None else {'timeout': max(remaining, 0.1)}
+
+    def generate(self, prompt: str, schema: Optional[dict] = None) -> str:
+        response = self.model.generate_content(
+            prompt, generation_config=self._generation_config(schema), request_options=self._request_options()
+        )
+        report_usage(response.usage_metadata)
+        return response.text
+
+    async def generate_async(self, prompt: str, schema: Optional[dict] = None) -> str:
+        response = await self.model.generate_content_async(
+            prompt, generation_config=self._generation_config(schema), request_options=self._request_options()
+        )
+        report_usage(response.usage_metadata)
+        return response.text
+
+    def stream(self, prompt: str, schema: Optional[dict] = None) -> Iterator[str]:
+        for chunk in self.model.generate_content(
+            prompt, generation_config=self._generation_config(schema), stream=True,
+            request_options=self._request_options(),
+        ):
+            # The running totals arrive with each chunk; the last one wins
+            report_usage(chunk.usage_metadata)
+            yield chunk.text
+
+    async def stream_async(self, prompt: str, schema: Optional[dict] = None) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(
+            prompt, generation_config=self._generation_config(schema), stream=True,
+            request_options=self._request_options(),
+        )
+        async for chunk in response:
+            report_usage(chunk.usage_metadata)
+            yield chunk.text
+
+
+DETAILS_TERM_RE = re.compile(r'Here is the concept to describe:\s*(.+?)\s*$', re.DOTALL)
+
+
+class FakeProviderError(RuntimeError):
+    """Injected failure from FakeProvider, retried like an API outage"""
+
+    transient = True
+
+
+def sample_words(topic: str, num_words: int = 5, description_words: int = 40,
+                 seed: int = 0) -> List[dict]:
+    """
+    Deterministic stand-in for the model's ``words`` array.
+
+    Every concept points at one or two later concepts, so the result is a
+    connected DAG that ends in a single goal node, like a good model answer.
+
+    Args:
+        topic: Topic used in the generated terms and text
+        num_words: Number of concepts
+        description_words: Approximate length of each description, to control response size
+        seed: Seed for the choice of related concepts
+
+    Returns:
+        List of word dicts in the same shape Gemini is asked for
+    """
+    rng = random.Random(seed)
+    terms = [f"{topic} Concept {i + 1}" for i in range(num_words)]
+    filler = ' '.join(['details'] * max(0, description_words - 12))
+    words = []
+    for i, term in enumerate(terms):
+        later = list(range(i + 1, num_words))
+        related = sorted(rng.sample(later, min(len(later), rng.randint(1, 2)))) if later else []
+        words.append({
+            "term": term,
+            "summary": f"A brief summary of {term}.",
+            "description": f"Detailed description of {term} and how it relates to {topic}. {filler}".strip(),
+            "related_concepts": [terms[j] for j in related],
+            "examples": [f"Example 1 for {term}", f"Example 2 for {term}"]
+        })
+    return words
+
+
+class FakeProvider(LLMProvider):
+    """
+    In-process provider with canned answers, for load tests and offline profiling.
+
+    Graph prompts get a ``sample_words`` graph whose shape is seeded by the
+    prompt, so different topics get different (but repeatable) graphs, with
+    only terms and edges if the prompt asks for no summaries (skeleton
+    mode); node details prompts get one node's text, and any other prompt
+    (such as topic inference) gets a short topic name.
+
+    A synchronous call that would outlast the caller's deadline sleeps until
+    the deadline and raises TimeoutError, like a timed-out HTTP request.
+
+    Args:
+        latency: Seconds each call takes, spread across chunks when streaming
+        error_rate: Probability in [0, 1] that a call raises FakeProviderError
+        num_words: Number of concepts in each generated graph
+        description_words: Approximate length of each description
+        chunk_size: Characters per piece when streaming
+        seed: Seed for error injection and graph shape
+    """
+
+    name = 'fake'
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, num_words: int = 7,
+                 description_words: int = 40, chunk_size: int = 64, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.num_words = num_words
+        self.description_words = description_words
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def respond(self, prompt: str) -> str:
+        """The canned response for a prompt, without latency or errors"""
+        if 'JSON' not in prompt:
+            return 'Sample Topic'
+        details_match = DETAILS_TERM_RE.search(prompt)
+        if details_match:
+            term = details_match.group(1).strip()
+            filler = ' '.join(['details'] * max(0, self.description_words - 6))
+            return json.dumps({
+                'summary': f"A brief summary of {term}.",
+                'description': f"Detailed description of {term}. {filler}".strip(),
+                'examples': [f"Example 1 for {term}", f"Example 2 for {term}"],
+            }, indent=2)
+        topic = self._guess_topic(prompt)
+        words = sample_words(topic or 'Sample Topic', self.num_words,
+                             self.description_words, self.seed ^ zlib.crc32(prompt.encode('utf-8')))
+        if '"summary"' not in prompt:
+            words = [{'term': word['term'], 'related_concepts': word['related_concepts']} for word in words]
+        # Combined upload prompts also ask the model to name the topic
+        if '"topic"' in prompt:
+            return json.dumps({'topic': topic or 'Sample Topic', 'words': words}, indent=2)
+        return json.dumps({'words': words}, indent=2)
+
+    def _maybe_fail(self):
+        with self._lock:
+            failed = self._rng.random() < self.error_rate
+        if failed:
+            raise FakeProviderError("Injected fake provider failure")
+
+    @staticmethod
+    def _guess_topic(prompt: str) -> Optional[str]:
+        match = (re.search(r'Here is the problem:\s*(.+?)\s*$', prompt, re.DOTALL)
+                 or re.search(r'content about (.+?), generate', prompt)
+                 or re.search(r'Here is the concept to break down:\s*(.+?)\s*$', prompt, re.DOTALL))
+        return match.group(1).strip()[:80] if match else None
+
+    def _chunks(self, text: str) -> List[str]:
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+
+    def _wait(self):
+        remaining = time_remaining()
+        if remaining is not None and remaining < self.latency:
+            time.sleep(remaining)
+            raise TimeoutError("Fake provider call timed out")
+        time.sleep(self.latency)
+
+    def generate(self, prompt: str, schema: Optional[dict] = None) -> str:
+        self._wait()
+        self._maybe_fail()
+        return self.respond(prompt)
+
+    async def generate_async(self, prompt: str, schema: Optional[dict] = None) -> str:
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        return self.respond(prompt)
+
+    def stream(self, prompt: str, schema: Optional[dict] = None) -> Iterator[str]:
+        self._maybe_fail()
+        chunks = self._chunks(self.respond(prompt))
+        for chunk in chunks:
+            time.sleep(self.latency / len(chunks))
+            yield chunk
+
+    async def stream_async(self, prompt: str, schema: Optional[dict] = None) -> AsyncIterator[str]:
+        self._maybe_fail()
+        chunks = self._chunks(self.respond(prompt))
+        for chunk in chunks:
+            await asyncio.sleep(self.latency / len(chunks))
+            yield chunk
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+class RecordingProvider(LLMProvider):
+    """
+    Wraps another provider and appends every prompt/response pair to a JSONL file.
+
+    The file can be served back later by ReplayProvider, so benchmarks run
+    against real captured responses without calling the API.
+    """
+
+    name = 'recording'
+
+    def __init__(self, inner: LLMProvider, path: str):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _record(self, prompt: str, response: str):
+        line = json.dumps({'key': prompt_key(prompt), 'prompt': prompt, 'response': response})
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+    def generate(self, prompt: str, schema: Optional[dict] = None) -> str:
+        response = self.inner.generate(prompt, schema)
+        self._record(prompt, response)
+        return response
+
+    async def generate_async(self, prompt: str, schema: Optional[dict] = None) -> str:
+        response = await self.inner.generate_async(prompt, schema)
+        self._record(prompt, response)
+        return response
+
+    def stream(self, prompt: str, schema: Optional[dict] = None) -> Iterator[str]:
+        pieces = []
+        for piece in self.inner.stream(prompt, schema):
+            pieces.append(piece)
+            yield piece
+        self._record(prompt, ''.join(pieces))
+
+    async def stream_async(self, prompt: str, schema: Optional[dict] = None) -> AsyncIterator[str]:
+        pieces = []
+        async for piece in self.inner.stream_async(prompt, schema):
+            pieces.append(piece)
+            yield piece
+        self._record(prompt, ''.join(pieces))
+
+
+class ReplayMissError(LookupError):
+    """No recorded response for a prompt"""
+
+
+class ReplayProvider(LLMProvider):
+    """
+    Serves responses captured by RecordingProvider.
+
+    Args:
+        path: JSONL file written by RecordingProvider
+        latency: Seconds each call takes
+        strict: If False, prompts that were never recorded get the next
+            recorded response of the same kind (graph or plain text), which
+            keeps load tests with fresh topics running on real response shapes
+    """
+
+    name = 'replay'
+
+    def __init__(self, path: str, latency: float = 0.0, strict: bool = True):
+        self.latency = latency
+        self.strict = strict
+        self.responses = {}
+        recorded = {True: [], False: []}
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.responses[entry['key']] = entry['response']
+                    recorded['JSON' in entry['prompt']].append(entry['response'])
+        self._cycles = {kind: itertools.cycle(items) for kind, items in recorded.items() if items}
+        self._lock = threading.Lock()
+
+    def respond(self, prompt: str) -> str:
+        response = self.responses.get(prompt_key(prompt))
+        if response is not None:
+            return response
+        cycle = self._cycles.get('JSON' in prompt)
+        if self.strict or cycle is None:
+            raise ReplayMissError("No recorded response for prompt")
+        with self._lock:
+            return next(cycle)
+
+    def generate(self, prompt: str, schema: Optional[dict] = None) -> str:
+        time.sleep(self.latency)
+        return self.respond(prompt)
+
+    async def generate_async(self, prompt: str, schema: Optional[dict] = None) -> str:
+        await asyncio.sleep(self.latency)
+        return self.respond(prompt)
+
+
+class InstrumentedProvider(LLMProvider):
+    """
+    Wraps another provider and reports each call's latency, outcome and
+    token counts to the metrics registry.
+
+    Token counts come from the model API when the provider reports them
+    (Gemini), and are estimated from the prompt and response length otherwise.
+    """
+
+    def __init__(self, inner: LLMProvider):
+        self.inner = inner
+        self.name = inner.name
+
+    def _record(self, method: str, start: float, prompt: str, response: Optional[str], outcome: str = 'ok'):
+        usage = _last_usage.get()
+        _last_usage.set(None)
+        if usage is None:
+            usage = (estimate_tokens(prompt), estimate_tokens(response) if response else 0)
+        record_llm_call(self.name, method, time.perf_counter() - start, outcome, *usage)
+
+    def generate(self, prompt: str, schema: Optional[dict] = None) -> str:
+        _last_usage.set(None)
+        start = time.perf_counter()
+        try:
+            response = self.inner.generate(prompt, schema)
+        except Exception:
+            self._record('generate', start, prompt, None, 'error')
+            raise
+        self._record('generate', start, prompt, response)
+        return response
+
+    async def generate_async(self, prompt: str, schema: Optional[dict] = None) -> str:
+        _last_usage.set(None)
+        start = time.perf_counter()
+        try:
+            response = await self.inner.generate_async(prompt, schema)
+        except Exception:
+            self._record('generate', start, prompt, None, 'error')
+            raise
+        self._record('generate', start, prompt, response)
+        return response
+
+    def stream(self, prompt: str, schema: Optional[dict] = None) -> Iterator[str]:
+        _last_usage.set(None)
+        start = time.perf_counter()
+        pieces = []
+        try:
+            for piece in self.inner.stream(prompt, schema):
+                pieces.append(piece)
+                yield piece
+        except Exception:
+            self._record('stream', start, prompt, ''.join(pieces), 'error')
+            raise
+        self._record('stream', start, prompt, ''.join(pieces))
+
+    async def stream_async(self, prompt: str, schema: Optional[dict] = None) -> AsyncIterator[str]:
+        _last_usage.set(None)
+        start = time.perf_counter()
+        pieces = []
+        try:
+            async for piece in self.inner.stream_async(prompt, schema):
+                pieces.append(piece)
+                yield piece
+        except Exception:
+            self._record('stream', start, prompt, ''.join(pieces), 'error')
+            raise
+        self._record('stream', start, prompt, ''.join(pieces))
+
+
+class ResilientProvider(LLMProvider):
+    """
+    Wraps another provider so quota limits and API outages degrade gracefully.
+
+    Every call takes a token from a rate limiter sized to the API quota
+    (waiting for one if needed), and must finish within ``deadline``
+    seconds, retries included. Transient errors (quota, 5xx, timeouts) are
+    retried with jittered exponential backoff while the retry budget
+    lasts, and then raised as UpstreamError with the HTTP status the
+    routes should answer with. After ``breaker_threshold`` failures in a
+    row the circuit opens and calls raise CircuitOpenError at once,
+    instead of each waiting out its deadline on an API that is down.
+
+    Streams are only retried until their first piece arrives.
+
+    Args:
+        inner: Provider to call
+        rate_limit: Calls per second (in this process), or 0 for no limit
+        burst: Calls allowed back to back before pacing starts
+        deadline: Seconds a call may take, retries included
+        max_attempts: Attempts per call
+        retry_budget: Retries allowed as a fraction of recent calls
+        breaker_threshold: Failures in a row that open the circuit
+        breaker_reset: Seconds the circuit stays open before a probe call
+    """
+
+    def __init__(self, inner: LLMProvider, rate_limit: float = 0.0, burst: Optional[float] = None,
+                 deadline: float = 60.0, max_attempts: int = 3, retry_budget: float = 0.2,
+                 breaker_threshold: int = 5, breaker_reset: float = 30.0):
+        self.inner = inner
+        self.name = inner.name
+        self.limiter = TokenBucket(rate_limit, burst) if rate_limit > 0 else None
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.budget = RetryBudget(retry_budget)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+
+    def _reject_if_open(self):
+        llm_rejected_total.inc(self.name, 'circuit_open')
+        raise CircuitOpenError("The model API is failing; try again shortly", 503,
+                               retry_after=self.breaker.retry_after() or self.breaker.reset_timeout)
+
+    def _rate_limited(self):
+        llm_rejected_total.inc(self.name, 'rate_limited')
+        raise UpstreamError("Too many model calls; try again shortly", 429,
+                            retry_after=1 / self.limiter.rate)
+
+    def _start(self) -> Tuple[float, int]:
+        """
+        Admit a call; the first rate limit token is taken here.
+
+        Returns:
+            (deadline, ticket) where the ticket goes back to the breaker's
+            ``release`` once the call is over, however it ended
+        """
+        deadline_at = time.monotonic() + self.deadline
+        if self.breaker.state == 'open':
+            self._reject_if_open()
+        self._pace(deadline_at)
+        ticket = self.breaker.admit()
+        if ticket is None:
+            self._reject_if_open()
+        self.budget.record_call()
+        return deadline_at, ticket
+
+    def _pace(self, deadline_at: float):
+        if self.limiter and not self.limiter.acquire(deadline_at - time.monotonic()):
+            self._rate_limited()
+
+    async def _start_async(self) -> Tuple[float, int]:
+        deadline_at = time.monotonic() + self.deadline
+        if self.breaker.state == 'open':
+            self._reject_if_open()
+        await self._pace_async(deadline_at)
+        ticket = self.breaker.admit()
+        if ticket is None:
+            self._reject_if_open()
+        self.budget.record_call()
+        return deadline_at, ticket
+
+    async def _pace_async(self, deadline_at: float):
+        if self.limiter and not await self.limiter.acquire_async(deadline_at - time.monotonic()):
+            self._rate_limited()
+
+    def _retry_delay(self, error: Exception, attempt: int, deadline_at: float) -> float:
+        """
+        Record a failed attempt and decide whether to try again.
+
+        Called from the ``except`` block of the attempt.
+
+        Raises:
+            UpstreamError: A transient error that won't be retried
+            Exception: The original error, if it isn't transient
+
+        Returns:
+            Seconds to wait before the next attempt
+        """
+        if not is_transient(error):
+            # The API answered; the request itself was the problem
+            self.breaker.record_success()
+            raise error
+        self.breaker.record_failure()
+        delay = backoff_delay(attempt)
+        if (attempt >= self.max_attempts or time.monotonic() + delay >= deadline_at
+                or not self.breaker.allow() or not self.budget.try_spend()):
+            raise upstream_error(error) from error
+        llm_retries_total.inc(self.name)
+        return delay
+
+    def generate(self, prompt: str, schema: Optional[dict] = None) -> str:
+        deadline_at, ticket = self._start()
+        try:
+            for attempt in itertools.count(1):
+                if attempt > 1:
+                    self._pace(deadline_at)
+                try:
+                    with deadline(deadline_at):
+                        response = self.inner.generate(prompt, schema)
+                except Exception as e:
+                    time.sleep(self._retry_delay(e, attempt, deadline_at))
+                    continue
+                self.breaker.record_success()
+                return response
+        finally:
+            self.breaker.release(ticket)
+
+    async def generate_async(self, prompt: str, schema: Optional[dict] = None) -> str:
+        deadline_at, ticket = await self._start_async()
+        try:
+            for attempt in itertools.count(1):
+                if attempt > 1:
+                    await self._pace_async(deadline_at)
+                try:
+                    with deadline(deadline_at):
+                        response = await asyncio.wait_for(self.inner.generate_async(prompt, schema),
+                                                          deadline_at - time.monotonic())
+                except Exception as e:
+                    await asyncio.sleep(self._retry_delay(e, attempt, deadline_at))
+                    continue
+                self.breaker.record_success()
+                return response
+        finally:
+            # Cancellation (a BaseException) skips the handlers above
+            self.breaker.release(ticket)
+
+    def stream(self, prompt: str, schema: Optional[dict] = None) -> Iterator[str]:
+        deadline_at, ticket = self._start()
+        try:
+            for attempt in itertools.count(1):
+                if attempt > 1:
+                    self._pace(deadline_at)
+                pieces = self.inner.stream(prompt, schema)
+                try:
+                    # The request is made when the first piece is asked for
+                    with deadline(deadline_at):
+                        first = next(pieces, None)
+                except Exception as e:
+                    time.sleep(self._retry_delay(e, attempt, deadline_at))
+                    continue
+                self.breaker.record_success()
+                break
+        finally:
+            self.breaker.release(ticket)
+        try:
+            if first is not None:
+                yield first
+            yield from pieces
+        except Exception as e:
+            if is_transient(e):
+                self.breaker.record_failure()
+            raise
+
+    async def stream_async(self, prompt: str, schema: Optional[dict] = None) -> AsyncIterator[str]:
+        deadline_at, ticket = await self._start_async()
+        try:
+            for attempt in itertools.count(1):
+                if attempt > 1:
+                    await self._pace_async(deadline_at)
+                pieces = self.inner.stream_async(prompt, schema).__aiter__()
+                try:
+                    with deadline(deadline_at):
+                        first = await asyncio.wait_for(pieces.__anext__(), deadline_at - time.monotonic())
+                except StopAsyncIteration:
+                    first = None
+                except Exception as e:
+                    await pieces.aclose()
+                    await asyncio.sleep(self._retry_delay(e, attempt, deadline_at))
+                    continue
+                self.breaker.record_success()
+                break
+        finally:
+            # Cancellation (a BaseException) skips the handlers above
+            self.breaker.release(ticket)
+        try:
+            if first is not None:
+                yield first
+            async for piece in pieces:
+                yield piece
+        except Exception as e:
+            if is_transient(e):
+                self.breaker.record_failure()
+            raise
+
+    def stats(self) -> dict:
+        return {
+            'provider': self.name,
+            'rate_limit': self.limiter.rate if self.limiter else None,
+            'deadline': self.deadline,
+            'breaker': self.breaker.stats(),
+            'retry_budget': self.budget.stats(),
+        }
+
+
+def wrap_provider(provider: LLMProvider) -> LLMProvider:
+    """
+    Add metrics and the resilience settings from env to a provider.
+
+    Metrics wrap the provider directly, so each attempt of a retried call
+    is counted.
+    """
+    if isinstance(provider, ResilientProvider):
+        return provider
+    if not isinstance(provider, InstrumentedProvider):
+        provider = InstrumentedProvider(provider)
+    return ResilientProvider(
+        provider,
+        rate_limit=float(os.getenv('LLM_RATE_LIMIT', 0)),
+        burst=float(os.getenv('LLM_RATE_BURST', 0)) or None,
+        deadline=float(os.getenv('LLM_DEADLINE', 60)),
+        max_attempts=int(os.getenv('LLM_MAX_ATTEMPTS', 3)),
+        retry_budget=float(os.getenv('LLM_RETRY_BUDGET', 0.2)),
+        breaker_threshold=int(os.getenv('LLM_BREAKER_THRESHOLD', 5)),
+        breaker_reset=float(os.getenv('LLM_BREAKER_RESET', 30)),
+    )
+
+
+def create_provider(name: Optional[str] = None) -> LLMProvider:
+    """
+    Build the provider named by ``name`` or the LLM_PROVIDER env var.
+
+    If LLM_RECORD_PATH is set, the provider is wrapped so every response is
+    captured there for later replay. Every provider is wrapped to report
+    metrics and to pace, retry and fail fast (see ResilientProvider).
+
+    Args:
+        name: 'gemini' (the default), 'fake' or 'replay'
+
+    Returns:
+        A configured LLMProvider
+    """
+    name = (name or os.getenv('LLM_PROVIDER', 'gemini')).lower()
+    if name == 'gemini':
+        provider = GeminiProvider(os.getenv('GEMINI_MODEL', 'gemini-2.0-flash'))
+    elif name == 'fake':
+        provider = FakeProvider(
+            latency=float(os.getenv('FAKE_LLM_LATENCY', 0.0)),
+            error_rate=float(os.getenv('FAKE_LLM_ERROR_RATE', 0.0)),
+            num_words=int(os.getenv('FAKE_LLM_NUM_WORDS', 7)),
+            description_words=int(os.getenv('FAKE_LLM_DESCRIPTION_WORDS', 40)),
+            seed=int(os.getenv('FAKE_LLM_SEED', 0)),
+        )
+    elif name == 'replay':
+        provider = ReplayProvider(
+            os.environ['LLM_REPLAY_PATH'],
+            latency=float(os.getenv('FAKE_LLM_LATENCY', 0.0)),
+            strict=os.getenv('LLM_REPLAY_STRICT', '1') != '0',
+        )
+    else:
+        raise ValueError(f"Unknown LLM provider: {name}")
+
+    record_path = os.getenv('LLM_RECORD_PATH')
+    if record_path:
+        provider = RecordingProvider(provider, record_path)
+    return wrap_provider(provider)
+
+
+_provider = None
+_provider_pid = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> LLMProvider:
+    """
+    The process-wide provider, created from config on first use.
+
+    A provider created before a fork (e.g. while warming up a preloaded
+    app) isn't reused by the forked workers; each builds its own client.
+    """
+    global _provider, _provider_pid
+    pid = os.getpid()
+    if _provider is None or _provider_pid != pid:
+        with _provider_lock:
+            if _provider is None or _provider_pid != pid:
+                _provider = create_provider()
+                _provider_pid = pid
+    return _provider
+
+
+def set_provider(provider: Optional[LLMProvider]):
+    """Swap the process-wide provider (None resets it to the configured one)"""
+    global _provider, _provider_pid
+    if provider is not None:
+        provider = wrap_provider(provider)
+    with _provider_lock:
+        _provider = provider
+        _provider_pid = os.getpid()
@@ -0,0 +1,279 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Absolute time.monotonic() by which the current model call must finish
+_deadline: ContextVar[Optional[float]] = ContextVar('llm_deadline', default=None)
+
+# HTTP statuses of upstream errors worth retrying
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class UpstreamError(RuntimeError):
+    """
+    The model API couldn't answer in time, and the routes should say so.
+
+    Args:
+        message: Error shown to the client
+        status: HTTP status for the response (429, 503 or 504)
+        retry_after: Seconds the client should wait before trying again
+    """
+
+    def __init__(self, message: str, status: int = 503, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamError):
+    """Calls are failing fast because the model API has been failing"""
+
+
+@contextmanager
+def deadline(at: float):
+    """Make ``at`` (a time.monotonic() value) the deadline of model calls in this context"""
+    token = _deadline.set(at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_remaining() -> Optional[float]:
+    """Seconds left before the current call's deadline, or None without one"""
+    at = _deadline.get()
+    return None if at is None else max(0.0, at - time.monotonic())
+
+
+def error_status(error: Exception) -> Optional[int]:
+    """The HTTP status of an API error (google.api_core errors carry it as ``code``)"""
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return 504
+    return None
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed call may succeed if tried again"""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    return error_status(error) in TRANSIENT_STATUSES or getattr(error, 'transient', False)
+
+
+def upstream_error(error: Exception) -> Exception:
+    """
+    Translate a transient API error into the UpstreamError the client sees.
+
+    Quota errors become 429, timeouts 504 and other transient failures 503;
+    anything else is returned unchanged.
+    """
+    if isinstance(error, UpstreamError) or not is_transient(error):
+        return error
+    status = error_status(error)
+    if status == 429:
+        return UpstreamError(f"Model quota exhausted: {error}", 429, retry_after=10)
+    if status in (408, 504):
+        return UpstreamError(f"Model call timed out: {error}", 504)
+    return UpstreamError(f"Model unavailable: {error}", 503, retry_after=5)
+
+
+class TokenBucket:
+    """
+    Rate limiter: ``rate`` calls per second on average, bursts of up to ``burst``.
+
+    Callers reserve a token and wait until it is theirs, so calls are paced
+    instead of rejected, unless the wait would outlast their deadline.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Take a token.
+
+        Returns:
+            Seconds to wait before using it, or None (and nothing taken) if
+            that would be longer than ``timeout``
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        wait = self.reserve(timeout)
+        if wait is None:
+            return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        wait = self.reserve(timeout)
+        if wait is None:
+            return False
+        if wait:
+            await asyncio.sleep(wait)
+        return True
+
+
+class RetryBudget:
+    """
+    Allow retries only while they stay a small fraction of recent calls.
+
+    During an outage every call fails, and retrying each one several times
+    multiplies the load on an API that is already struggling. Over the last
+    ``window`` seconds, retries are capped at ``ratio`` of calls plus
+    ``min_retries``, so isolated failures are still retried.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 3, window: float = 10.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._calls = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float):
+        for times in (self._calls, self._retries):
+            while times and times[0] <= now - self.window:
+                times.popleft()
+
+    def record_call(self):
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            self._calls.append(now)
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget, if there is one left"""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._calls):
+                return False
+            self._retries.append(now)
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._trim(time.monotonic())
+            return {'calls': len(self._calls), 'retries': len(self._retries), 'window': self.window}
+
+
+class CircuitBreaker:
+    """
+    Stop calling an API that keeps failing, and probe it now and then.
+
+    After ``failure_threshold`` transient failures in a row the circuit
+    opens and calls fail immediately. After ``reset_timeout`` seconds one
+    call is let through (half-open); if it succeeds the circuit closes,
+    otherwise it opens again. A probe that ends without an answer (its
+    caller was cancelled) must be handed back with ``release``, or the
+    circuit would wait for it forever.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe = 0
+        self._opens = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now"""
+        return self.admit() is not None
+
+    def admit(self) -> Optional[int]:
+        """
+        Let a call through if the circuit allows it.
+
+        Returns:
+            None if the call must fail fast, otherwise a ticket for
+            ``release``: 0 while the circuit is closed, and a number for
+            the one probe call of a half-open circuit
+        """
+        with self._lock:
+            if self._state == 'closed':
+                return 0
+            if self._state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = 'half_open'
+                self._probing = False
+            if self._state == 'half_open' and not self._probing:
+                self._probing = True
+                self._probe += 1
+                return self._probe
+            return None
+
+    def release(self, ticket: int):
+        """
+        End a call admitted with ``ticket`` that may not have recorded an outcome.
+
+        If it was the half-open probe and nothing was recorded, another
+        call may probe; otherwise this does nothing.
+        """
+        with self._lock:
+            if ticket and ticket == self._probe and self._state == 'half_open' and self._probing:
+                self._probing = False
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe may go through"""
+        with self._lock:
+            if self._state != 'open':
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._state = 'closed'
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == 'half_open' or self._failures >= self.failure_threshold:
+                if self._state != 'open':
+                    self._opens += 1
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self) -> dict:
+        state = self.state
+        with self._lock:
+            return {'state': state, 'consecutive_failures': self._failures, 'opens': self._opens}
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """Full-jitter exponential backoff before retry number ``attempt`` (1-based)"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
@@ -0,0 +1,309 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from .terms import marker_words, term_words
+
+logger = logging.getLogger(__name__)
+
+# Words that change how a topic is phrased, not what it's about
+FILLER_WORDS = {
+    'a', 'an', 'the', 'to', 'of', 'for', 'and', 'in', 'on', 'with', 'about',
+    'intro', 'introduction', 'introductory', 'basics', 'basic', 'fundamentals',
+    'fundamental', 'beginner', 'beginners', 'beginner\'s', 'primer', 'overview',
+}
+
+
+# Detail levels of indexed responses, stored by position. A full response
+# has everything a skeleton request needs, but not the other way round
+DETAIL_LEVELS = ('full', 'skeleton')
+SERVED_BY = {'full': ('full',), 'skeleton': ('skeleton', 'full')}
+
+
+def topic_words(topic: str) -> List[str]:
+    """
+    The words of a topic that say what it is about: filler words are
+    dropped, except a single letter at the end ("Vitamin A", "Plan A").
+    """
+    words = term_words(topic)
+    return [
+        word for i, word in enumerate(words)
+        if word not in FILLER_WORDS or (len(word) == 1 and i == len(words) - 1)
+    ]
+
+
+def topic_markers(topic: str) -> str:
+    """The topic's marker words (see terms.marker_words), as one comparable string"""
+    return ' '.join(marker_words(topic_words(topic)))
+
+
+class HashingEmbedder:
+    """
+    Dependency-free topic embedding: hashed word, initials and character
+    trigram features, L2-normalized.
+
+    Filler words ("intro to", "basics") are dropped, so "Intro to Machine
+    Learning" and "machine learning basics" embed identically, and the
+    initials of multi-word topics are added as a word, which moves "ML"
+    somewhat closer to "machine learning". It catches rewordings and
+    spelling variants, not true paraphrases or acronyms; set
+    SEMANTIC_CACHE_MODEL to use a sentence-transformers model for those.
+
+    Args:
+        dim: Number of hashed dimensions
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        # Versioned, so an index saved with other features isn't reloaded
+        self.name = f'hashing-v2-{dim}'
+
+    def _features(self, text: str) -> List[tuple]:
+        words = topic_words(text)
+        features = [(word, 2.0) for word in words]
+        if len(words) > 1:
+            features.append((''.join(word[0] for word in words), 2.0))
+        for word in words:
+            padded = f'<{word}>'
+            features.extend((padded[i:i + 3], 1.0) for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+                value = int.from_bytes(digest, 'little')
+                # The top bit picks the sign, so collisions cancel out on average
+                vectors[row, value % self.dim] += weight if value >> 63 else -weight
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEmbedder:
+    """Topic embedding with a local sentence-transformers model"""
+
+    def __init__(self, model_name: str):
+        # Optional dependency; only imported when a model is configured
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f'st-{model_name}'
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+def create_embedder(model_name: Optional[str] = None):
+    """The configured embedder, falling back to hashing if the model can't be loaded"""
+    if model_name:
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:
+            logger.warning("Error loading embedding model %r, using hashed embeddings: %s", model_name, e)
+    return HashingEmbedder()
+
+
+class SemanticMatch(NamedTuple):
+    cache_key: str
+    topic: str
+    score: float
+
+
+class SemanticIndex:
+    """
+    Cosine-similarity index over the topics of previously generated graphs.
+
+    Each row holds a topic's unit embedding, its ``num_words``, the detail
+    level and the graph cache key of its response; a search is one
+    matrix-vector product over the rows with the same ``num_words`` whose
+    level can serve the request (see SERVED_BY). Topics only match if
+    their marker words are the same (see topic_markers), so however close
+    their embeddings are, "C" never serves "C++" and "Spanish" never serves
+    "Spanish 101". Memory is bounded
+    by ``max_entries`` (the least recently used row is overwritten), and
+    the index is saved to ``path`` with ``np.savez`` (in the background)
+    at most every ``save_interval`` seconds, then reloaded on startup.
+
+    Args:
+        embedder: Object with ``dim``, ``name`` and ``embed(texts)``
+        path: .npz file the index is persisted to, or None to keep it in memory
+        threshold: Minimum cosine similarity for a match
+        max_entries: Maximum number of topics kept
+        save_interval: Minimum seconds between saves
+    """
+
+    def __init__(self, embedder, path: Optional[str] = None, threshold: float = 0.9,
+                 max_entries: int = 10000, save_interval: float = 30.0):
+        self.embedder = embedder
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((0, embedder.dim), dtype=np.float32)
+        self._num_words = np.zeros(0, dtype=np.int64)
+        self._levels = np.zeros(0, dtype=np.int8)
+        self._used_at = np.zeros(0, dtype=np.float64)
+        self._keys = []
+        self._topics = []
+        self._markers = []
+        self._rows = {}
+        self._dirty = False
+        self._saved_at = 0.0
+        self._searches = 0
+        self._matches = 0
+        if path:
+            self._load()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def search(self, topic: str, num_words: int, detail: str = 'full') -> Optional[SemanticMatch]:
+        """
+        The most similar indexed topic with the same ``num_words`` whose
+        response has the detail a ``detail`` request needs, if it clears
+        the threshold.
+        """
+        query = self.embedder.embed([topic])[0]
+        markers = topic_markers(topic)
+        levels = [DETAIL_LEVELS.index(level) for level in SERVED_BY[detail]]
+        with self._lock:
+            self._searches += 1
+            # Rows past len(self._keys) are spare capacity, not topics
+            size = len(self._keys)
+            candidates = np.flatnonzero((self._num_words[:size] == num_words)
+                                        & np.isin(self._levels[:size], levels))
+            if not len(candidates):
+                return None
+            scores = self._vectors[candidates] @ query
+            above = np.flatnonzero(scores >= self.threshold)
+            # Best first, skipping topics that differ in a marker word
+            for best in above[np.argsort(-scores[above], kind='stable')]:
+                row = int(candidates[best])
+                if self._markers[row] == markers:
+                    self._used_at[row] = time.time()
+                    self._matches += 1
+                    return SemanticMatch(self._keys[row], self._topics[row], float(scores[best]))
+            return None
+
+    def add(self, topic: str, num_words: int, cache_key: str, detail: str = 'full'):
+        """Index a generated topic, overwriting the least recently used row when full"""
+        vector = self.embedder.embed([topic])[0]
+        with self._lock:
+            row = self._rows.get(cache_key)
+            if row is None:
+                if len(self._keys) < self.max_entries:
+                    row = len(self._keys)
+                    self._grow()
+                else:
+                    row = int(np.argmin(self._used_at[:len(self._keys)]))
+                    del self._rows[self._keys[row]]
+                self._rows[cache_key] = row
+            self._vectors[row] = vector
+            self._num_words[row] = num_words
+            self._levels[row] = DETAIL_LEVELS.index(detail)
+            self._used_at[row] = time.time()
+            self._keys[row] = cache_key
+            self._topics[row] = topic
+            self._markers[row] = topic_markers(topic)
+            self._dirty = True
+        self.maybe_save()
+
+    def discard(self, cache_key: str):
+        """Stop matching a key whose cached response is gone"""
+        with self._lock:
+            row = self._rows.get(cache_key)
+            if row is not None:
+                # Can never match again and is the first row to be reused
+                self._num_words[row] = -1
+                self._used_at[row] = 0.0
+                self._dirty = True
+
+    def _grow(self):
+        # Called with the lock held; appends one row, doubling capacity as needed
+        size = len(self._keys)
+        if size == len(self._vectors):
+            capacity = min(self.max_entries, max(16, size * 2))
+            self._vectors = np.resize(self._vectors, (capacity, self.embedder.dim))
+            self._num_words = np.resize(self._num_words, capacity)
+            self._levels = np.resize(self._levels, capacity)
+            self._used_at = np.resize(self._used_at, capacity)
+        self._keys.append('')
+        self._topics.append('')
+        self._markers.append('')
+
+    def maybe_save(self, force: bool = False):
+        """Persist the index if it changed and the last save is old enough"""
+        if not self.path or not self._dirty:
+            return
+        if not force and time.time() - self._saved_at < self.save_interval:
+            return
+        with self._lock:
+            size = len(self._keys)
+            arrays = {
+                'vectors': self._vectors[:size].copy(),
+                'num_words': self._num_words[:size].copy(),
+                'levels': self._levels[:size].copy(),
+                'used_at': self._used_at[:size].copy(),
+                'keys': np.array(self._keys, dtype=str),
+                'topics': np.array(self._topics, dtype=str),
+                'embedder': np.array(self.embedder.name),
+            }
+            self._dirty = False
+            self._saved_at = time.time()
+        if force:
+            self._write(arrays)
+        else:
+            # Don't make the request that happened to trigger the save wait for the disk
+            threading.Thread(target=self._write, args=(arrays,), daemon=True).start()
+
+    def _write(self, arrays: dict):
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Write to a temporary file and rename it, so readers never see half an index
+            tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp.npz'
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Error saving semantic index: %s", e)
+
+    def _load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data['embedder']) != self.embedder.name:
+                    # Vectors from another model aren't comparable
+                    return
+                size = min(len(data['keys']), self.max_entries)
+                order = np.argsort(-data['used_at'])[:size]
+                self._vectors = data['vectors'][order].astype(np.float32)
+                self._num_words = data['num_words'][order].astype(np.int64)
+                # Indexes saved before skeletons were indexed only hold full responses
+                levels = data['levels'] if 'levels' in data.files else np.zeros(len(data['keys']))
+                self._levels = levels[order].astype(np.int8)
+                self._used_at = data['used_at'][order].astype(np.float64)
+                self._keys = [str(key) for key in data['keys'][order]]
+                self._topics = [str(topic) for topic in data['topics'][order]]
+                self._markers = [topic_markers(topic) for topic in self._topics]
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning("Error loading semantic index, starting empty: %s", e)
+            return
+        self._rows = {key: row for row, key in enumerate(self._keys)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._keys),
+                'searches': self._searches,
+                'matches': self._matches,
+                'match_rate': self._matches / self._searches if self._searches else 0.0,
+                'threshold': self.threshold,
+                'embedder': self.embedder.name,
+            }
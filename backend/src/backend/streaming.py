@@ -0,0 +1,103 @@
+import json
+from typing import Iterator
+
+
+class WordStreamParser:
+    """
+    Incremental parser for the ``{"words": [...]}`` object Gemini returns.
+
+    Text is fed in as it arrives and every entry of the top-level ``words``
+    array is yielded as soon as its closing brace is seen, without waiting
+    for the rest of the document. Anything before the first ``{`` (such as
+    a markdown code fence) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.words_found = 0
+        self._pos = 0
+        self._started = False
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None
+        self._words_depth = None
+        self._item_start = None
+
+    @property
+    def complete(self) -> bool:
+        """True once the top-level object has been closed."""
+        return self._started and not self._stack
+
+    def feed(self, text: str) -> Iterator[dict]:
+        """
+        Consume more response text.
+
+        Args:
+            text: Next piece of the model response
+
+        Yields:
+            Each ``words`` entry completed by this piece of text
+        """
+        self.buffer += text
+        buffer = self.buffer
+        stack = self._stack
+
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    # Remember keys of the top-level object so we can spot "words"
+                    if len(stack) == 1 and stack[0] == '{':
+                        self._last_key = buffer[self._string_start + 1:i]
+                continue
+
+            if not self._started:
+                if char == '{':
+                    self._started = True
+                    stack.append('{')
+                continue
+            if not stack:
+                # Trailing text after the top-level object
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in '{[':
+                if (char == '[' and len(stack) == 1 and self._last_key == 'words'
+                        and self._words_depth is None):
+                    self._words_depth = len(stack) + 1
+                elif (char == '{' and self._words_depth is not None
+                        and len(stack) == self._words_depth):
+                    self._item_start = i
+                stack.append(char)
+            elif char in '}]':
+                stack.pop()
+                if (char == '}' and self._item_start is not None
+                        and len(stack) == self._words_depth):
+                    raw_item = buffer[self._item_start:i + 1]
+                    self._item_start = None
+                    try:
+                        item = json.loads(raw_item)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(item, dict) and 'term' in item:
+                        self.words_found += 1
+                        yield item
+                elif char == ']' and self._words_depth is not None and len(stack) < self._words_depth:
+                    self._words_depth = -1
+
+        self._pos = len(buffer)
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,26 @@
+import re
+from typing import List, Sequence, Tuple
+
+# Words of a topic or concept name. '+', '#' and inner dots belong to the
+# word, so "C++", "C#" and "Node.js" aren't read as "C" and "Node js"
+TOKEN_RE = re.compile(r"[\w'+#]+(?:\.[\w'+#]+)*")
+
+# Words that tell otherwise similar names apart ("World War I" / "II",
+# "Python 2" / "3", "Vitamin C" / "D", "C" / "C++" / "C#"): anything with a
+# digit or a symbol, single letters and small roman numerals
+MARKER_RE = re.compile(r"^(?:.*[\d+#].*|\w|x{0,3}(?:ix|iv|v?i{0,3}))$")
+
+
+def term_words(text: str) -> List[str]:
+    """The lowercase words of a topic or concept name"""
+    return TOKEN_RE.findall(str(text).casefold())
+
+
+def marker_words(words: Sequence[str]) -> Tuple[str, ...]:
+    """
+    The words of a name that MARKER_RE says set it apart, in order.
+
+    Two names can only stand for the same thing if these are equal, however
+    similar the rest of them is.
+    """
+    return tuple(word for word in words if MARKER_RE.match(word))
@@ -0,0 +1,80 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from .metrics import observe_stage
+
+# Stage durations (ms) for the request being handled; a ContextVar so it
+# works for Flask threads and Quart tasks alike
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar('stage_timings', default=None)
+_started: ContextVar[Optional[float]] = ContextVar('request_started', default=None)
+# Called with each stage's name as it starts, e.g. to report a background job's progress
+_listener: ContextVar[Optional[Callable[[str], None]]] = ContextVar('stage_listener', default=None)
+
+
+def start_request_timing():
+    """Begin collecting stage timings for the current request"""
+    _timings.set({})
+    _started.set(time.perf_counter())
+
+
+def set_stage_listener(listener: Optional[Callable[[str], None]]):
+    """Call ``listener(name)`` whenever a stage starts in the current context"""
+    _listener.set(listener)
+
+
+def request_elapsed() -> Optional[float]:
+    """Seconds since start_request_timing, or None outside a timed request"""
+    started = _started.get()
+    return None if started is None else time.perf_counter() - started
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block of work as one stage of the current request.
+
+    Repeated stages (e.g. two model calls) are summed. Every stage is also
+    observed in the stage duration histogram, including stages that run
+    outside a request that called start_request_timing (e.g. on an
+    executor thread).
+    """
+    listener = _listener.get()
+    if listener is not None:
+        listener(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, (time.perf_counter() - start) * 1000)
+
+
+def record_stage(name: str, duration: float):
+    """Add ``duration`` ms to a stage of the current request, if one is being timed"""
+    observe_stage(name, duration)
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + duration
+
+
+def request_timings() -> Dict[str, float]:
+    """Stage durations recorded so far for the current request, in ms"""
+    return dict(_timings.get() or {})
+
+
+def server_timing_header() -> str:
+    """Format the current request's stages as a Server-Timing header value"""
+    return ', '.join(f"{name};dur={duration:.2f}" for name, duration in request_timings().items())
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Inverse of server_timing_header"""
+    timings = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if name and key == 'dur':
+                timings[name] = float(value)
+    return timings
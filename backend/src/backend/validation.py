@@ -0,0 +1,317 @@
+import json
+import re
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .graph_builder import normalize_term
+from .streaming import WordStreamParser
+
+# Response schemas for Gemini's structured output mode (OpenAPI subset)
+WORD_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'term': {'type': 'string'},
+        'summary': {'type': 'string'},
+        'description': {'type': 'string'},
+        'related_concepts': {'type': 'array', 'items': {'type': 'string'}},
+        'examples': {'type': 'array', 'items': {'type': 'string'}},
+    },
+    'required': ['term', 'summary', 'description', 'related_concepts', 'examples'],
+}
+
+WORDS_SCHEMA = {
+    'type': 'object',
+    'properties': {'words': {'type': 'array', 'items': WORD_SCHEMA}},
+    'required': ['words'],
+}
+
+# Skeleton mode: just the graph, details are generated per node on demand
+SKELETON_WORD_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'term': {'type': 'string'},
+        'related_concepts': {'type': 'array', 'items': {'type': 'string'}},
+    },
+    'required': ['term', 'related_concepts'],
+}
+
+SKELETON_SCHEMA = {
+    'type': 'object',
+    'properties': {'words': {'type': 'array', 'items': SKELETON_WORD_SCHEMA}},
+    'required': ['words'],
+}
+
+DETAILS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'summary': {'type': 'string'},
+        'description': {'type': 'string'},
+        'examples': {'type': 'array', 'items': {'type': 'string'}},
+    },
+    'required': ['summary', 'description', 'examples'],
+}
+
+UPLOAD_SCHEMA = {
+    'type': 'object',
+    'properties': {'topic': {'type': 'string'}, 'words': {'type': 'array', 'items': WORD_SCHEMA}},
+    'required': ['topic', 'words'],
+}
+
+CODE_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)(?:```|$)', re.DOTALL)
+TOPIC_RE = re.compile(r'"topic"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def strip_trailing_commas(text: str) -> str:
+    """Drop commas directly before a closing bracket, ignoring string contents"""
+    out = []
+    in_string = escape = False
+    pending_comma = None
+    for char in text:
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if pending_comma is not None:
+            if char.isspace():
+                pending_comma.append(char)
+                continue
+            if char not in '}]':
+                out.append(',')
+            out.extend(pending_comma)
+            pending_comma = None
+        if char == ',':
+            pending_comma = []
+            continue
+        if char == '"':
+            in_string = True
+        out.append(char)
+    if pending_comma is not None:
+        out.append(',')
+        out.extend(pending_comma)
+    return ''.join(out)
+
+
+def decode_json_objects(response_text: str) -> Iterator[dict]:
+    """
+    Yield the JSON objects that can be decoded from model output: from
+    each code fence, then the raw text, starting at the first ``{``, as
+    is and with trailing commas removed.
+    """
+    decoder = json.JSONDecoder()
+    candidates = [match.group(1) for match in CODE_FENCE_RE.finditer(response_text)] + [response_text]
+    for candidate in candidates:
+        start = candidate.find('{')
+        if start < 0:
+            continue
+        for body in (candidate[start:], strip_trailing_commas(candidate[start:])):
+            try:
+                data, _ = decoder.raw_decode(body)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(data, dict):
+                yield data
+
+
+def parse_model_json(response_text: str) -> dict:
+    """
+    Tolerantly extract the ``{"words": [...]}`` object from model output.
+
+    Tries, in order: the contents of a code fence or the raw text, decoded
+    from the first ``{`` (so prose before or after is ignored); the same
+    with trailing commas removed; and finally, for truncated output, every
+    complete ``words`` entry that can be salvaged with the streaming parser.
+
+    Args:
+        response_text: Raw model output
+
+    Returns:
+        Dict with a ``words`` list (and ``topic`` if the model gave one)
+    """
+    for data in decode_json_objects(response_text):
+        if isinstance(data.get('words'), list):
+            return data
+
+    # Truncated or otherwise broken: keep whatever entries are complete
+    parser = WordStreamParser()
+    words = list(parser.feed(strip_trailing_commas(response_text)))
+    if not words:
+        raise ValueError("Could not find JSON with a 'words' list in response")
+    data = {'words': words}
+    topic_match = TOPIC_RE.search(response_text)
+    if topic_match:
+        data['topic'] = json.loads(f'"{topic_match.group(1)}"')
+    return data
+
+
+def as_string_list(value) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    if not isinstance(value, list):
+        return []
+    return [str(item) for item in value if isinstance(item, (str, int, float))]
+
+
+def find_back_edges(adjacency: List[List[int]]) -> Set[Tuple[int, int]]:
+    """
+    The edges an iterative depth-first search finds pointing back into its
+    current path, visiting nodes and their targets in order; removing them
+    leaves a DAG. O(V + E).
+
+    Args:
+        adjacency: Target node indexes of each node
+    """
+    n = len(adjacency)
+    state = [0] * n  # 0 unvisited, 1 on the current path, 2 finished
+    back_edges = set()
+    for root in range(n):
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, 0)]
+        while stack:
+            v, k = stack[-1]
+            if k < len(adjacency[v]):
+                stack[-1] = (v, k + 1)
+                w = adjacency[v][k]
+                if state[w] == 1:
+                    back_edges.add((v, w))
+                elif state[w] == 0:
+                    state[w] = 1
+                    stack.append((w, 0))
+            else:
+                state[v] = 2
+                stack.pop()
+    return back_edges
+
+
+def repair_words(words: List[dict], single_goal: bool = True,
+                 goal: Optional[str] = None) -> Tuple[List[dict], Dict[str, int]]:
+    """
+    Make a ``words`` list a valid, connected DAG, in O(V + E).
+
+    Deterministic repairs, applied in order:
+    - entries without a term are dropped and duplicate terms merged
+    - related_concepts that name no node (or the node itself) are dropped
+    - cycles are broken by removing the back edges a depth-first search
+      finds, visiting nodes and their related concepts in response order
+    - with ``single_goal``, every other sink gets an edge to the goal (the
+      last sink of the largest component), so all paths end at one node;
+      otherwise only one sink per extra component is linked, which just
+      connects the graph. Linking into a sink can never create a cycle.
+
+    Args:
+        words: Parsed ``words`` array
+        single_goal: Whether all concepts must lead to one final node
+        goal: Term to use as the goal instead of picking one; its own
+            related concepts are dropped so it is a sink
+
+    Returns:
+        (words, repairs) where repairs counts each kind of fix made
+    """
+    repairs = {}
+
+    def count(kind, amount=1):
+        repairs[kind] = repairs.get(kind, 0) + amount
+
+    # Clean entries and merge duplicate terms
+    index = {}
+    nodes = []
+    for word in words:
+        term = str(word.get('term') or '').strip() if isinstance(word, dict) else ''
+        if not term:
+            count('invalid_entries')
+            continue
+        key = normalize_term(term)
+        related = as_string_list(word.get('related_concepts'))
+        if key in index:
+            count('merged_duplicates')
+            nodes[index[key]]['related_concepts'].extend(related)
+            continue
+        entry = dict(word)
+        entry['term'] = term
+        entry['summary'] = str(word.get('summary') or '')
+        entry['description'] = str(word.get('description') or '')
+        entry['related_concepts'] = related
+        entry['examples'] = as_string_list(word.get('examples'))
+        index[key] = len(nodes)
+        nodes.append(entry)
+
+    # Resolve related concepts to node indexes
+    n = len(nodes)
+    adjacency = [[] for _ in range(n)]
+    for i, entry in enumerate(nodes):
+        seen = set()
+        for related in entry['related_concepts']:
+            j = index.get(normalize_term(related))
+            if j is None:
+                count('dangling_references')
+            elif j == i:
+                count('self_references')
+            elif j not in seen:
+                seen.add(j)
+                adjacency[i].append(j)
+
+    goal_index = index.get(normalize_term(goal)) if goal else None
+    if goal_index is not None and adjacency[goal_index]:
+        count('goal_edges_removed', len(adjacency[goal_index]))
+        adjacency[goal_index] = []
+
+    # Break cycles by dropping the edges back into the current DFS path
+    back_edges = find_back_edges(adjacency)
+    if back_edges:
+        count('removed_cycle_edges', len(back_edges))
+        adjacency = [[w for w in adjacency[v] if (v, w) not in back_edges] for v in range(n)]
+
+    # Weakly connected components
+    undirected = [[] for _ in range(n)]
+    for v in range(n):
+        for w in adjacency[v]:
+            undirected[v].append(w)
+            undirected[w].append(v)
+    component = [-1] * n
+    sizes = []
+    for root in range(n):
+        if component[root] >= 0:
+            continue
+        component[root] = len(sizes)
+        queue = deque([root])
+        size = 0
+        while queue:
+            v = queue.popleft()
+            size += 1
+            for w in undirected[v]:
+                if component[w] < 0:
+                    component[w] = component[root]
+                    queue.append(w)
+        sizes.append(size)
+
+    # Link sinks to a single goal; a DAG always has a sink in every component
+    if n:
+        main = max(range(len(sizes)), key=lambda c: (sizes[c], -c))
+        last_sink = {}
+        for v in range(n):
+            if not adjacency[v]:
+                last_sink[component[v]] = v
+        if goal_index is not None:
+            main = component[goal_index]
+            last_sink[main] = goal_index
+        goal_index = last_sink[main]
+        if single_goal:
+            sources = [v for v in range(n) if not adjacency[v] and v != goal_index]
+        else:
+            sources = [sink for c, sink in last_sink.items() if c != main]
+        for v in sources:
+            adjacency[v].append(goal_index)
+        if len(sizes) > 1:
+            count('disconnected_components', len(sizes) - 1)
+        if sources:
+            count('linked_to_goal', len(sources))
+
+    for v, entry in enumerate(nodes):
+        entry['related_concepts'] = [nodes[w]['term'] for w in adjacency[v]]
+    return nodes, repairs
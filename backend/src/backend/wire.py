@@ -0,0 +1,207 @@
+import gzip
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Optional faster encoder and better compression; plain json and gzip otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this aren't worth the CPU to compress
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+
+WIRE_FORMATS = ('full', 'compact')
+COMPACT_VERSION = 1
+
+# Node data fields a client can project with ?fields=
+NODE_FIELDS = ('label', 'summary', 'description', 'relatedTopics', 'examples')
+
+# Keys that differ per item by nature, so never become shared defaults
+PER_ITEM_KEYS = {'id', 'source', 'target', 'position', 'data'}
+
+
+def dumps(payload) -> bytes:
+    """Encode a JSON payload compactly, with orjson when it's installed"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def parse_wire_options(args) -> Tuple[str, Optional[Tuple[str, ...]]]:
+    """
+    Read the optional ``format`` and ``fields`` query parameters.
+
+    Returns:
+        (wire_format, fields) where fields is None to keep every node data field
+    """
+    wire_format = args.get('format', 'full')
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(f"'format' must be one of: {', '.join(WIRE_FORMATS)}")
+    fields = args.get('fields')
+    if fields is None:
+        return wire_format, None
+    fields = tuple(dict.fromkeys(field.strip() for field in fields.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in NODE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}; expected some of: {', '.join(NODE_FIELDS)}")
+    # The label is what the graph draws, so it's always kept
+    return wire_format, tuple(dict.fromkeys(('label',) + fields))
+
+
+def project_nodes(nodes: List[dict], fields: Iterable[str]) -> List[dict]:
+    """Copies of ``nodes`` whose ``data`` holds only ``fields``"""
+    fields = tuple(fields)
+    return [
+        dict(node, data={key: value for key, value in node['data'].items() if key in fields})
+        for node in nodes
+    ]
+
+
+def _shared_defaults(items: List[dict]) -> Dict:
+    """Keys whose value is identical in every item"""
+    if not items:
+        return {}
+    candidates = {key: value for key, value in items[0].items() if key not in PER_ITEM_KEYS}
+    for item in items[1:]:
+        for key in list(candidates):
+            if key not in item or item[key] != candidates[key]:
+                del candidates[key]
+        if not candidates:
+            break
+    return candidates
+
+
+def compact_graph(payload: dict) -> dict:
+    """
+    Encode a React Flow payload in the compact wire format.
+
+    - ``defaults.node`` / ``defaults.edge`` hold the keys every node or
+      edge shares (``sourcePosition``, ``type``, ``animated``, ``style``...),
+      which are then left out of each item
+    - ``strings`` is a table of node IDs and labels; node ``id`` and
+      ``data.label``, ``data.relatedTopics`` entries and edge ``source``
+      and ``target`` are indexes into it when they are integers
+    - positions are ``[x, y]`` pairs
+
+    Other top-level keys (``graphId``, ``topic``, ``positions``...) are
+    passed through unchanged.
+
+    Args:
+        payload: Graph or expansion delta with 'nodes' and 'edges'
+
+    Returns:
+        The compact payload
+    """
+    nodes, edges = payload['nodes'], payload['edges']
+    strings = []
+    index = {}
+
+    def intern(value):
+        if not isinstance(value, str):
+            return value
+        if value not in index:
+            index[value] = len(strings)
+            strings.append(value)
+        return index[value]
+
+    node_defaults = _shared_defaults(nodes)
+    edge_defaults = _shared_defaults(edges)
+
+    compact_nodes = []
+    for node in nodes:
+        item = {key: value for key, value in node.items() if key not in node_defaults}
+        item['id'] = intern(node['id'])
+        if 'position' in node:
+            item['position'] = [node['position']['x'], node['position']['y']]
+        data = dict(node['data'])
+        if 'label' in data:
+            data['label'] = intern(data['label'])
+        if 'relatedTopics' in data:
+            data['relatedTopics'] = [intern(topic) for topic in data['relatedTopics']]
+        item['data'] = data
+        compact_nodes.append(item)
+
+    compact_edges = []
+    for edge in edges:
+        item = {key: value for key, value in edge.items() if key not in edge_defaults}
+        item['source'] = intern(edge['source'])
+        item['target'] = intern(edge['target'])
+        compact_edges.append(item)
+
+    compact = {key: value for key, value in payload.items() if key not in ('nodes', 'edges')}
+    compact.update({
+        'format': 'compact',
+        'version': COMPACT_VERSION,
+        'defaults': {'node': node_defaults, 'edge': edge_defaults},
+        'strings': strings,
+        'nodes': compact_nodes,
+        'edges': compact_edges,
+    })
+    return compact
+
+
+def encode_graph(payload: dict, wire_format: str = 'full', fields: Optional[Iterable[str]] = None) -> dict:
+    """Apply the requested projection and wire format to a graph payload"""
+    if fields is not None:
+        payload = dict(payload, nodes=project_nodes(payload['nodes'], fields))
+    if wire_format == 'compact':
+        payload = compact_graph(payload)
+    return payload
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best content coding the client accepts: br, then gzip"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    for coding in ('br', 'gzip'):
+        if coding == 'br' and brotli is None:
+            continue
+        if accepted.get(coding, accepted.get('*', 0)) > 0:
+            return coding
+    return None
+
+
+def encode_body(payload, accept_encoding: str = '') -> Tuple[bytes, Dict[str, str]]:
+    """
+    Serialize a JSON payload and compress it if the client accepts it.
+
+    Args:
+        payload: JSON-serializable payload
+        accept_encoding: The request's Accept-Encoding header
+
+    Returns:
+        (body, headers) where headers has Content-Type and, when compressed,
+        Content-Encoding; Vary is always set since the body depends on it
+    """
+    body = dumps(payload)
+    headers = {'Content-Type': 'application/json', 'Vary': 'Accept-Encoding'}
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, headers
+    coding = choose_encoding(accept_encoding)
+    if coding == 'br':
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif coding == 'gzip':
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if coding:
+        headers['Content-Encoding'] = coding
+    return body, headers
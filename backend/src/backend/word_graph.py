@@ -1,52 +1,177 @@
-from flask import Blueprint, request, jsonify
-import google.generativeai as genai
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 import os
 from typing import List, Dict
 import random
-import json
-import re
-from werkzeug.utils import secure_filename
-import tempfile
-# Import the Aryn SDK
-from aryn_sdk.partition import partition_file
-from dotenv import load_dotenv
-
-load_dotenv()
-# Initialize Gemini
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-model = genai.GenerativeModel('gemini-2.0-flash')
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import atexit
+import logging
+from .analytics import apply_analytics
+from .api import (
+    GRAPH_MAX_AGE, JOB_RETRY_AFTER, batch_result_event, cache_stats_payload, cache_status, details_cache_key,
+    details_payload, expansion_cache_key, generation_cache_keys, get_text_mode, job_accepted, merge_cache_key,
+    parse_batch_request, parse_detail_level, parse_details_request, parse_expand_request, parse_generate_request,
+    parse_job_flag, parse_merge_request, parse_upload_file, parse_upload_options, set_stored_graph_headers,
+    stored_graph_etag, stored_graph_payload, stream_done_event, upload_cache_key, upstream_error_response,
+)
+from .cache import CACHE_DIR, TieredCache, make_cache_key
+from .concepts import MAP_CONCURRENCY, build_map_prompt, merge_concepts, split_into_chunks
+from .details import build_details_prompt, mark_details_loaded, parse_details_response
+from .expansion import build_expand_prompt, neighbor_labels, splice_expansion
+from .graph_builder import IncrementalEdgeBuilder, build_react_flow_graph, format_edge, format_node
+from .graph_store import open_graph_store
+from .ingestion import UploadTooLargeError, import_aryn, process_file_with_aryn, read_upload
+from .jobs import JOB_MAX_QUEUED, JOB_SPOOL_DIR, JOB_TTL, JOB_WORKERS, JobQueue, QueueFullError, job_payload
+from .layout import apply_layout
+from .lazy import PerProcess
+from .merge import merge_graphs
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, record_request, registry
+from .providers import get_provider, import_genai
+from .resilience import CircuitOpenError, UpstreamError
+from .semantic import SemanticIndex, create_embedder
+from .singleflight import SingleFlight
+from .streaming import WordStreamParser, sse_event
+from .timing import record_stage, request_elapsed, server_timing_header, stage, start_request_timing
+from .validation import (
+    DETAILS_SCHEMA, SKELETON_SCHEMA, UPLOAD_SCHEMA, WORDS_SCHEMA, parse_model_json, repair_words,
+)
+from .wire import encode_body, encode_graph, parse_wire_options
+
+logger = logging.getLogger(__name__)
+
+# Cache of raw Gemini responses for /api/word-graph/generate
+graph_cache = TieredCache(
+    os.getenv('WORD_GRAPH_CACHE_PATH', os.path.join(CACHE_DIR, 'word_graph_cache.sqlite3')),
+    table='word_graphs',
+    ttl=float(os.getenv('WORD_GRAPH_CACHE_TTL', 7 * 24 * 3600)),
+    max_entries=int(os.getenv('WORD_GRAPH_CACHE_MAX_ENTRIES', 10000)),
+    max_bytes=int(os.getenv('WORD_GRAPH_CACHE_MAX_BYTES', 256 * 1024 * 1024)),
+    memory_entries=int(os.getenv('WORD_GRAPH_CACHE_MEMORY_ENTRIES', 256)),
+)
+
+# Content-addressed cache of Aryn extraction results, keyed on the digest of
+# the uploaded bytes and the text mode used to partition them
+extraction_cache = TieredCache(
+    os.getenv('EXTRACTION_CACHE_PATH', os.path.join(CACHE_DIR, 'extraction_cache.sqlite3')),
+    table='extractions',
+    ttl=float(os.getenv('EXTRACTION_CACHE_TTL', 30 * 24 * 3600)),
+    max_entries=int(os.getenv('EXTRACTION_CACHE_MAX_ENTRIES', 2000)),
+    max_bytes=int(os.getenv('EXTRACTION_CACHE_MAX_BYTES', 512 * 1024 * 1024)),
+    memory_entries=int(os.getenv('EXTRACTION_CACHE_MEMORY_ENTRIES', 32)),
+)
+
+def open_semantic_index():
+    index = SemanticIndex(
+        create_embedder(os.getenv('SEMANTIC_CACHE_MODEL')),
+        os.getenv('SEMANTIC_CACHE_PATH', os.path.join(CACHE_DIR, 'semantic_index.npz')),
+        threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.9)),
+        max_entries=int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', 10000)),
+    )
+    atexit.register(index.maybe_save, force=True)
+    return index
+
+# Topics of generated graphs, so rewordings of a topic reuse its cached
+# response; SEMANTIC_CACHE=0 turns this off. Loaded on first use, since
+# reading the index (and any embedding model) is the slowest part of startup
+semantic_index = None
+if os.getenv('SEMANTIC_CACHE', '1') != '0':
+    semantic_index = PerProcess(open_semantic_index)
+
+# Every generated graph, so clients can fetch or expand it later by ID
+graph_store = open_graph_store(
+    os.getenv('GRAPH_STORE', 'sqlite'),
+    os.getenv('GRAPH_STORE_PATH', os.path.join(CACHE_DIR, 'graph_store.sqlite3')),
+    ttl=float(os.getenv('GRAPH_STORE_TTL', 30 * 24 * 3600)),
+    max_entries=int(os.getenv('GRAPH_STORE_MAX_ENTRIES', 50000)),
+    max_bytes=int(os.getenv('GRAPH_STORE_MAX_BYTES', 1024 * 1024 * 1024)),
+    memory_entries=int(os.getenv('GRAPH_STORE_MEMORY_ENTRIES', 256)),
+)
+
+# Uploads sent with ?job=1 run here instead of holding a request thread
+job_queue = JobQueue(
+    os.getenv('JOB_STORE_PATH', os.path.join(CACHE_DIR, 'jobs.sqlite3')),
+    workers=JOB_WORKERS,
+    max_queued=JOB_MAX_QUEUED,
+    ttl=JOB_TTL,
+    spool_dir=JOB_SPOOL_DIR,
+)
+
+# Concurrent duplicates of a generation share one model call
+generation_flight = SingleFlight('generate')
+upload_flight = SingleFlight('upload')
+expansion_flight = SingleFlight('expand')
+details_flight = SingleFlight('details')
+merge_flight = SingleFlight('merge')
+FLIGHTS = {
+    'generate': generation_flight,
+    'upload': upload_flight,
+    'expand': expansion_flight,
+    'details': details_flight,
+    'merge': merge_flight,
+}
+
+# Map calls of every map-reduce upload share this pool, bounding concurrent model calls
+map_executor = PerProcess(
+    lambda: ThreadPoolExecutor(max_workers=MAP_CONCURRENCY, thread_name_prefix='map-concepts')
+)
+
+# While the model API is failing (its circuit breaker is open), generation
+# requests get a generic study plan for the topic instead of a 503;
+# DEGRADED_GRAPHS=0 turns this off
+DEGRADED_GRAPHS = os.getenv('DEGRADED_GRAPHS', '1') != '0'
+
+# (term, summary, indices of later stages it leads to) of the degraded graph
+DEGRADED_STAGES = [
+    ('{topic} - Start', 'Get oriented: what {topic} is and why it matters.', [1, 2]),
+    ('Research', 'Gather the background material and key terms of {topic}.', [3]),
+    ('Planning', 'Decide which parts of {topic} to learn first and how.', [3]),
+    ('Implementation', 'Work through the core ideas of {topic} hands-on.', [4]),
+    ('Testing', 'Check your understanding of {topic} with problems and examples.', [5]),
+    ('{topic} - Complete', 'Bring it all together and apply {topic} on your own.', []),
+]
 
 word_graph_bp = Blueprint('word_graph', __name__)
 
-@word_graph_bp.route('/api/word-graph/generate', methods=['POST'])
-def generate_word_graph():
-    try:
-        data = request.get_json()
-        topic = data.get('topic', 'Technology')
-        num_words = data.get('num_words', 5)
+def warm_up(clients=True):
+    """
+    Do the slow parts of the first request ahead of time.
 
-        # Generate words related to the topic
-        prompt = f"""Generate {num_words} key concepts or terms related to {topic}.
-        For each term, provide:
-        1. A brief summary (1-2 sentences)
-        2. A detailed description (2-3 paragraphs)
-        3. 2-3 related concepts (IMPORTANT: make sure these are actual terms that could appear as other nodes)
-        4. 2-3 practical examples or use cases
-        
-        Format the response as a JSON object with the following structure:
-        {{
-            "words": [
-                {{
-                    "term": "term name",
-                    "summary": "brief summary",
-                    "description": "detailed description",
-                    "related_concepts": ["concept1", "concept2"],
-                    "examples": ["example1", "example2"]
-                }}
-            ]
-        }}"""
+    Imports the Gemini and Aryn SDKs, which is safe before a fork and lets
+    preforked workers share the loaded modules. With ``clients``, also
+    builds this process's model provider and loads the semantic index;
+    call it that way only in the process that will serve requests (e.g.
+    gunicorn's post_worker_init), since neither is shared across a fork.
+    """
+    start = time.perf_counter()
+    if os.getenv('LLM_PROVIDER', 'gemini').lower() == 'gemini':
+        import_genai()
+    import_aryn()
+    if clients:
+        get_provider()
+        if semantic_index is not None:
+            semantic_index.get()
+    logger.info("Warmed up in %.0f ms (clients=%s)", (time.perf_counter() - start) * 1000, clients)
+
+@word_graph_bp.before_request
+def begin_timing():
+    start_request_timing()
 
-        prompt = f"""
+@word_graph_bp.after_request
+def add_server_timing(response):
+    # Per-stage durations, read by benchmarks/bench.py and browser dev tools
+    header = server_timing_header()
+    if header:
+        response.headers['Server-Timing'] = header
+    # Streaming responses are counted when their headers are sent
+    elapsed = request_elapsed()
+    if elapsed is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        record_request(route, request.method, response.status_code, elapsed)
+    return response
+
+def build_generate_prompt(topic, num_words):
+    """Build the Gemini prompt for /api/word-graph/generate and its streaming variant"""
+    return f"""
         Pretend you are a teacher, trying to walk a student through what to learn to approach a problem.
         Create a list of execution tasks ("nodes"), concepts that the student should learn to eventually solve the problem.
         These "node" "terms" should be concepts, not actions.
@@ -90,146 +215,61 @@ def generate_word_graph():
         {topic}
         """
 
-        # Generate content using Gemini
-        response = model.generate_content(prompt)
-        if not response.text:
-            raise ValueError("Empty response from Gemini")
+def build_skeleton_prompt(topic, num_words):
+    """
+    Build the Gemini prompt for skeleton mode: the same graph as
+    build_generate_prompt, but only terms and edges, so the answer is a
+    fraction of the size; node details are generated when a node is opened.
+    """
+    return f"""
+        Pretend you are a teacher, trying to walk a student through what to learn to approach a problem.
+        Create a list of concepts ("nodes") that the student should learn to eventually solve the problem.
+        Node names should be short, descriptive concepts instead of actions.
 
-        # Parse the response and extract JSON
-        try:
-            # Extract JSON from the response
-            json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
-            if not json_match:
-                raise ValueError("Could not find JSON in response")
-            
-            words_data = json.loads(json_match.group())
-            if not isinstance(words_data, dict) or 'words' not in words_data:
-                print("words_data", words_data)
-                raise ValueError("Invalid JSON structure")
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Failed to parse JSON: {str(e)}")
-
-        words = words_data['words']
-        
-        # Create a dictionary to map terms to their indices
-        term_to_index = {word['term'].lower(): i for i, word in enumerate(words)}
-        
-        # Generate correlations based on related concepts
-        correlations = []
-        for i, word1 in enumerate(words):
-            # Check if any of word1's related concepts match other nodes' terms
-            for related_concept in word1.get('related_concepts', []):
-                related_concept_lower = related_concept.lower()
-                # If the related concept exists as a node
-                if related_concept_lower in term_to_index:
-                    j = term_to_index[related_concept_lower]
-                    # Don't create self-loops
-                    if i != j:
-                        correlations.append({
-                            'source': f"node-{i}",
-                            'target': f"node-{j}",
-                            'explanation': f"{word1['term']} includes {related_concept} as a related concept"
-                        })
-                        
-            # Also check if this word is mentioned in other nodes' related concepts
-            for j, word2 in enumerate(words):
-                if i != j:  # Don't create self-loops
-                    if any(word1['term'].lower() == related.lower() for related in word2.get('related_concepts', [])):
-                        correlations.append({
-                            'source': f"node-{j}",
-                            'target': f"node-{i}",
-                            'explanation': f"{word2['term']} includes {word1['term']} as a related concept"
-                        })
-
-        # Format the response for React Flow
-        nodes = [
-            {
-                'id': f"node-{i}",
-                'data': {
-                    'label': word['term'],
-                    'summary': word['summary'],
-                    'description': word['description'],
-                    'relatedTopics': word['related_concepts'],
-                    'examples': word['examples']
-                },
-                'position': {'x': i * 250, 'y': 0},
-                # 'type': 'wordNode',
-                'sourcePosition': 'right',
-                'targetPosition': 'left'
-            }
-            for i, word in enumerate(words)
-        ]
-
-        edges = [
-            {
-                'id': f"edge-{i}",
-                'source': corr['source'],
-                'target': corr['target'],
-                'animated': True,
-                'type': 'smoothstep',
-                'style': {'stroke': '#3b82f6', 'strokeWidth': 2},
-                'data': {'explanation': corr['explanation']}
-            }
-            for i, corr in enumerate(correlations)
-        ]
+        Format the response as a JSON object with the following structure, and nothing else:
 
-        return jsonify({
-            'nodes': nodes,
-            'edges': edges
-        })
+        {{
+            "words": [
+                {{
+                    "term": "conceptName",
+                    "related_concepts": ["concept1", "concept2"]
+                }}
+            ]
+        }}
 
-    except Exception as e:
-        print(f"Error in generate_word_graph: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        "related_concepts" lists the concepts the student can learn after this one (a directed edge).
+        Each value must EXACTLY match the "term" of another node.
 
-@word_graph_bp.route('/api/word-graph/upload', methods=['POST'])
-def upload_file_for_graph():
-    try:
-        # Check if the post request has the file part
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file part'}), 400
-        
-        file = request.files['file']
-        topic = request.form.get('topic', '')
-        
-        # If user does not select file, browser submits an empty part without filename
-        if file.filename == '':
-            return jsonify({'error': 'No selected file'}), 400
-        
-        # Make sure the filename is safe
-        filename = secure_filename(file.filename)
-        file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
-        
-        # Check if it's a valid file type
-        if file_ext not in ['pdf', 'png', 'jpg', 'jpeg']:
-            return jsonify({'error': 'File type not supported. Please upload PDF or image files.'}), 400
-        
-        # Create a temporary file to store the uploaded content
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_ext}') as temp:
-            file.save(temp.name)
-            temp_path = temp.name
-        
-        # Process the file with Aryn SDK
-        content_text = process_file_with_aryn(temp_path, file_ext)
-        
-        # Clean up the temporary file
-        os.unlink(temp_path)
-        
-        # Extract content from the file
-        if not content_text:
-            return jsonify({'error': 'Could not extract content from file'}), 400
-        
-        # Generate topic if not provided
-        if not topic:
-            # Use a simple prompt to extract the main topic from the content
-            topic_prompt = f"Read the following content and identify the main subject or topic in 1-3 words only:\n\n{content_text[:1500]}"
-            topic_response = model.generate_content(topic_prompt)
-            topic = topic_response.text.strip()
-        
-        # Use the extracted content to generate the graph
-        prompt = f"""Based on the following content about {topic}, generate 5 key concepts or terms related to this topic.
+        Important Requirements:
+        1. Make sure it's a valid DAG (no cycles)
+        2. All nodes MUST be connected.
+        3. All nodes must eventually lead to one final node, indicating the goal.
+        4. When there are multiple ways to do something, make the paths diverge, to form a DAG that's not a straight line.
+        5. Generate between 5-8 nodes based on the complexity of the topic
+
+        Here is the problem:
+        {topic}
+        """
+
+def build_upload_prompt(topic, content_text, num_words=5):
+    """
+    Build the Gemini prompt for /api/word-graph/upload.
+    
+    The whole extracted text goes into the prompt. Without a topic, the
+    same prompt also asks the model to name the document's topic, so the
+    upload needs only one round trip.
+    """
+    if topic:
+        intro = (f"Based on the following content about {topic}, "
+                 f"generate {num_words} key concepts or terms related to this topic.")
+        topic_field = ""
+    else:
+        intro = ("Read the following content, identify its main subject or topic in 1-3 words, "
+                 f"and generate {num_words} key concepts or terms related to that topic.")
+        topic_field = '\n            "topic": "main topic in 1-3 words",'
+    return f"""{intro}
         
-        Content: {content_text[:4000]}
+        Content: {content_text}
         
         For each term, provide:
         1. A brief summary (1-2 sentences)
@@ -238,7 +278,7 @@ def upload_file_for_graph():
         4. 2-3 practical examples or use cases
         
         Format the response as a JSON object with the following structure:
-        {{
+        {{{topic_field}
             "words": [
                 {{
                     "term": "term name",
@@ -250,145 +290,829 @@ def upload_file_for_graph():
             ]
         }}"""
 
-        # Generate content using Gemini
-        response = model.generate_content(prompt)
-        if not response.text:
-            raise ValueError("Empty response from Gemini")
+def parse_words_response(response_text):
+    """
+    Extract the ``words`` array from a Gemini response.
+    
+    Args:
+        response_text: Raw model output, possibly wrapped in prose or code
+            fences, or truncated
+        
+    Returns:
+        List of word dicts
+    """
+    return parse_model_json(response_text)['words']
+
+def parse_upload_response(response_text, topic):
+    """
+    Parse the response to build_upload_prompt.
+    
+    Returns:
+        (topic, words), where topic is the given one or else the one the model named
+    """
+    data = parse_model_json(response_text)
+    if not topic:
+        topic = str(data.get('topic') or '').strip()
+    return topic, data['words']
+
+def generate_words(topic, num_words, cache_key, detail='full'):
+    """Call the model for a cache miss, parse its answer and cache it"""
+    # Generate content using the configured LLM provider (Gemini by default)
+    with stage('prompt'):
+        if detail == 'skeleton':
+            prompt, schema = build_skeleton_prompt(topic, num_words), SKELETON_SCHEMA
+        else:
+            prompt, schema = build_generate_prompt(topic, num_words), WORDS_SCHEMA
+    with stage('llm'):
+        response_text = get_provider().generate(prompt, schema)
+    if not response_text:
+        raise ValueError("Empty response from the model")
+
+    with stage('parse'):
+        words = parse_words_response(response_text)
+
+    # Only cache responses that parsed, so a bad generation is retried next time
+    with stage('cache'):
+        graph_cache.set(cache_key, response_text)
+        # Indexed with its detail level, so a full request never gets a skeleton
+        if semantic_index is not None:
+            semantic_index.add(topic, num_words, cache_key, detail)
+    return words
+
+def semantic_lookup(topic, num_words, detail='full'):
+    """
+    Find the cached response of a previously generated topic similar to
+    this one, with the detail a ``detail`` request needs.
+    
+    Returns:
+        (response_text, match), or (None, None) if there's no close enough topic
+    """
+    if semantic_index is None:
+        return None, None
+    with stage('semantic'):
+        match = semantic_index.search(topic, num_words, detail)
+        if match is None:
+            return None, None
+        response_text = graph_cache.get(match.cache_key)
+        if response_text is None:
+            # The response was evicted; the topic is no use any more
+            semantic_index.discard(match.cache_key)
+            return None, None
+    return response_text, match
+
+def generate_graph(topic, num_words, detail='full'):
+    """
+    Generate (or fetch from the cache) the React Flow graph for one topic.
+    
+    Args:
+        topic: Problem or subject to break down
+        num_words: Requested number of concepts
+        detail: 'full', or 'skeleton' for terms and edges only; nodes then
+            carry ``detailsLoaded`` and their details are fetched separately
+        
+    Returns:
+        (graph, cache_tier) where cache_tier is None if Gemini was called for
+        this request, 'semantic' if a similar topic's response was reused, or
+        'inflight' if it shared an identical request's call
+    """
+    # Reuse a previous Gemini response for the same request if we have one
+    cache_key, *fallback_keys = generation_cache_keys(topic, num_words, detail)
+    with stage('cache'):
+        response_text, cache_tier = graph_cache.lookup(cache_key)
+        for key in fallback_keys:
+            if cache_tier is not None:
+                break
+            response_text, cache_tier = graph_cache.lookup(key)
+
+    if cache_tier is None:
+        # Or one for a reworded topic ("intro to X" / "X basics")
+        response_text, match = semantic_lookup(topic, num_words, detail)
+        if match is not None:
+            cache_tier = 'semantic'
+
+    if cache_tier is None:
+        # Identical requests that arrive while this one is generating wait
+        # for its answer instead of each calling the model
+        start = time.perf_counter()
+        words, shared = generation_flight.do(cache_key, generate_words, topic, num_words, cache_key, detail)
+        if shared:
+            cache_tier = 'inflight'
+            record_stage('coalesce', (time.perf_counter() - start) * 1000)
+    else:
+        with stage('parse'):
+            words = parse_words_response(response_text)
+
+    graph = build_graph(words)
+    if detail == 'skeleton':
+        mark_details_loaded(graph)
+    with stage('store'):
+        graph['graphId'] = graph_store.save(graph, topic=topic)
+    return graph, cache_tier
+
+def build_graph(words, single_goal=True, **kwargs):
+    """
+    Validate, build, lay out and analyze the React Flow graph for parsed
+    words, timing each step.
+    
+    Malformed model output (cycles, dangling related concepts, disconnected
+    pieces) is repaired locally rather than costing another generation; any
+    repairs are listed under ``repairs`` in the graph.
+    
+    Args:
+        words: Parsed ``words`` array
+        single_goal: Whether every concept must lead to one final node
+            (the generation prompt asks for this; the upload prompt doesn't)
+    """
+    with stage('validate'):
+        words, repairs = repair_words(words, single_goal=single_goal)
+    if not words:
+        raise ValueError("Could not find any words in response")
+    with stage('edges'):
+        graph = build_react_flow_graph(words, **kwargs)
+    with stage('layout'):
+        graph = apply_layout(graph)
+    with stage('analytics'):
+        apply_analytics(graph)
+    if repairs:
+        graph['repairs'] = repairs
+    return graph
+
+def degraded_graph(topic, detail='full'):
+    """
+    A generic study plan for a topic, served while the model API is down.
+
+    It isn't cached or stored, so the real graph is generated once the API
+    is back.
+    """
+    terms = [term.format(topic=topic) for term, _, _ in DEGRADED_STAGES]
+    words = [{
+        'term': terms[i],
+        'summary': summary.format(topic=topic),
+        'description': summary.format(topic=topic),
+        'related_concepts': [terms[j] for j in later],
+        'examples': [],
+    } for i, (_, summary, later) in enumerate(DEGRADED_STAGES)]
+    graph = build_graph(words)
+    if detail == 'skeleton':
+        mark_details_loaded(graph)
+    return graph
+
+def json_response(payload, status=200):
+    """
+    Like jsonify, but with the faster encoder and compressed when the
+    client's Accept-Encoding allows it.
+    """
+    body, headers = encode_body(payload, request.headers.get('Accept-Encoding', ''))
+    return Response(body, status=status, headers=headers)
+
+@word_graph_bp.route('/api/word-graph/generate', methods=['POST'])
+def generate_word_graph():
+    try:
+        wire_format, fields = parse_wire_options(request.args)
+        data = request.get_json(silent=True)
+        detail = parse_detail_level(data)
+        topic, num_words = parse_generate_request(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        degraded = False
+        try:
+            graph, cache_tier = generate_graph(topic, num_words, detail)
+        except CircuitOpenError as e:
+            if not DEGRADED_GRAPHS:
+                raise
+            logger.warning("Serving a degraded graph for %r: %s", topic, e)
+            graph, cache_tier, degraded = degraded_graph(topic, detail), None, True
+
+        with stage('serialize'):
+            result = json_response(encode_graph(graph, wire_format, fields))
+        result.headers['X-Cache'] = cache_status(cache_tier)
+        if cache_tier is not None:
+            result.headers['X-Cache-Tier'] = cache_tier
+        if degraded:
+            result.headers['X-Degraded'] = 'true'
+            result.headers['Cache-Control'] = 'no-store'
+        return result
+
+    except UpstreamError as e:
+        payload, status, headers = upstream_error_response(e)
+        return jsonify(payload), status, headers
+    except Exception as e:
+        logger.exception("Error in generate_word_graph: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@word_graph_bp.route('/api/word-graph/generate/stream', methods=['POST'])
+def stream_word_graph():
+    """
+    Streaming variant of /api/word-graph/generate.
+
+    Sends Server-Sent Events: a ``node`` event for each React Flow node as soon
+    as its entry in the Gemini response has parsed, an ``edge`` event as soon as
+    both of its endpoints exist, a ``layout`` event with the final positions,
+    then a final ``done`` event (or ``error``). The finished words are repaired
+    and stored like any generated graph, so ``done`` carries its ``graphId``,
+    ``analytics`` and any ``repairs``.
+
+    A cache miss streams its own model response rather than going through
+    generation_flight: a caller that joined halfway would have missed the
+    events already sent.
+    """
+    try:
+        topic, num_words = parse_generate_request(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    cache_key, = generation_cache_keys(topic, num_words)
+    with stage('cache'):
+        response_text, cache_tier = graph_cache.lookup(cache_key)
+    if cache_tier is None:
+        response_text, match = semantic_lookup(topic, num_words)
+        if match is not None:
+            cache_tier = 'semantic'
+
+    def generate_events():
+        parser = WordStreamParser()
+        edge_builder = IncrementalEdgeBuilder()
+        edges_sent = 0
+
+        try:
+            if cache_tier is None:
+                with stage('prompt'):
+                    prompt = build_generate_prompt(topic, num_words)
+                pieces = get_provider().stream(prompt, WORDS_SCHEMA)
+            else:
+                pieces = [response_text]
+
+            for piece in pieces:
+                for word in parser.feed(piece):
+                    i = len(edge_builder.words)
+                    correlations = edge_builder.add_word(word)
+                    yield sse_event('node', format_node(i, word))
+                    for corr in correlations:
+                        yield sse_event('edge', format_edge(edges_sent, corr))
+                        edges_sent += 1
+
+            if parser.words_found == 0:
+                raise ValueError("Could not find any words in response")
+
+            # Only cache responses that parsed, so a bad generation is retried next time
+            if cache_tier is None:
+                graph_cache.set(cache_key, parser.buffer)
+                if semantic_index is not None:
+                    semantic_index.add(topic, num_words, cache_key)
 
-        # Parse the response and extract JSON
+            # Final positions and learning paths once the whole graph is
+            # known, from the same repaired graph /generate would store
+            graph = build_graph(edge_builder.words)
+            with stage('store'):
+                graph_id = graph_store.save(graph, topic=topic)
+            yield sse_event('layout', {node['id']: node['position'] for node in graph['nodes']})
+            yield sse_event('done', stream_done_event(graph, graph_id, cache_tier))
+
+        except Exception as e:
+            logger.exception("Error in stream_word_graph: %s", e)
+            yield sse_event('error', {'error': str(e)})
+
+    result = Response(stream_with_context(generate_events()), mimetype='text/event-stream')
+    result.headers['Cache-Control'] = 'no-cache'
+    result.headers['X-Accel-Buffering'] = 'no'
+    result.headers['X-Cache'] = cache_status(cache_tier)
+    return result
+
+@word_graph_bp.route('/api/word-graph/batch', methods=['POST'])
+def batch_word_graphs():
+    """
+    Generate graphs for a list of topics, at most ``concurrency`` at a time.
+    
+    Results stream back as Server-Sent Events in completion order: a
+    ``result`` event with the topic's index and graph, or an ``error`` event
+    if that topic failed (the rest of the batch carries on), then ``done``.
+    """
+    try:
+        topics, num_words, concurrency = parse_batch_request(request.get_json())
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate_events():
+        succeeded = 0
+        executor = ThreadPoolExecutor(max_workers=concurrency)
         try:
-            # Extract JSON from the response
-            json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
-            if not json_match:
-                raise ValueError("Could not find JSON in response")
-            
-            words_data = json.loads(json_match.group())
-            if not isinstance(words_data, dict) or 'words' not in words_data:
-                raise ValueError("Invalid JSON structure")
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Failed to parse JSON: {str(e)}")
-
-        words = words_data['words']
+            futures = {
+                executor.submit(generate_graph, topic, num_words): (i, topic)
+                for i, topic in enumerate(topics)
+            }
+            for future in as_completed(futures):
+                i, topic = futures[future]
+                try:
+                    graph, cache_tier = future.result()
+                except Exception as e:
+                    logger.error("Error in batch_word_graphs for %r: %s", topic, e)
+                    yield sse_event('error', {'index': i, 'topic': topic, 'error': str(e)})
+                    continue
+                succeeded += 1
+                yield sse_event('result', batch_result_event(i, topic, graph, cache_tier))
+        finally:
+            # If the client went away, don't start Gemini calls nobody will read
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        yield sse_event('done', {'succeeded': succeeded, 'failed': len(topics) - succeeded})
+
+    result = Response(stream_with_context(generate_events()), mimetype='text/event-stream')
+    result.headers['Cache-Control'] = 'no-cache'
+    result.headers['X-Accel-Buffering'] = 'no'
+    return result
+
+@word_graph_bp.route('/api/word-graph/upload', methods=['POST'])
+def upload_file_for_graph():
+    try:
+        topic = request.form.get('topic', '')
+        try:
+            file, file_ext = parse_upload_file(request.files)
+            mode, num_words = parse_upload_options(request.form)
+            wire_format, fields = parse_wire_options(request.args)
+            job_mode = parse_job_flag(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Create a dictionary to map terms to their indices
-        term_to_index = {word['term'].lower(): i for i, word in enumerate(words)}
+        # Read the upload into memory, hashing it as it streams in; Aryn is
+        # handed the bytes directly, so nothing is written to disk
+        with stage('upload'):
+            data, digest = read_upload(file.stream)
         
-        # Generate correlations based on related concepts
-        correlations = []
-        for i, word1 in enumerate(words):
-            # Check if any of word1's related concepts match other nodes' terms
-            for related_concept in word1.get('related_concepts', []):
-                related_concept_lower = related_concept.lower()
-                # If the related concept exists as a node
-                if related_concept_lower in term_to_index:
-                    j = term_to_index[related_concept_lower]
-                    # Don't create self-loops
-                    if i != j:
-                        correlations.append({
-                            'source': f"node-{i}",
-                            'target': f"node-{j}",
-                            'explanation': f"{word1['term']} includes {related_concept} as a related concept"
-                        })
-                        
-            # Also check if this word is mentioned in other nodes' related concepts
-            for j, word2 in enumerate(words):
-                if i != j:  # Don't create self-loops
-                    if any(word1['term'].lower() == related.lower() for related in word2.get('related_concepts', [])):
-                        correlations.append({
-                            'source': f"node-{j}",
-                            'target': f"node-{i}",
-                            'explanation': f"{word2['term']} includes {word1['term']} as a related concept"
-                        })
-
-        # Format the response for React Flow
-        nodes = [
-            {
-                'id': f"node-{i}",
-                'data': {
-                    'label': word['term'],
-                    'summary': word['summary'],
-                    'description': word['description'],
-                    'relatedTopics': word['related_concepts'],
-                    'examples': word['examples']
-                },
-                'position': {'x': i * 250, 'y': 0},
-                'type': 'wordNode',
-                'sourcePosition': 'right',
-                'targetPosition': 'left'
-            }
-            for i, word in enumerate(words)
-        ]
-
-        edges = [
-            {
-                'id': f"edge-{i}",
-                'source': corr['source'],
-                'target': corr['target'],
-                'animated': True,
-                'style': {'stroke': '#3b82f6', 'strokeWidth': 2},
-                'data': {'explanation': corr['explanation']}
-            }
-            for i, corr in enumerate(correlations)
-        ]
+        # Concurrent uploads of the same document with the same options share
+        # one extraction and one round of model calls
+        upload_key = upload_cache_key(digest, file_ext, topic, mode, num_words)
+
+        if job_mode:
+            try:
+                job = job_queue.submit('upload', run_upload_job, upload_key, file_ext, digest,
+                                       topic, mode, num_words, spool=data)
+            except QueueFullError as e:
+                return jsonify({'error': str(e)}), 503, {'Retry-After': str(JOB_RETRY_AFTER)}
+            payload, headers = job_accepted(job)
+            return jsonify(payload), 202, headers
+
+        start = time.perf_counter()
+        (graph, extraction_tier), shared = upload_flight.do(
+            upload_key, generate_upload_graph, data, file_ext, digest, topic, mode, num_words
+        )
+        if shared:
+            record_stage('coalesce', (time.perf_counter() - start) * 1000)
+        
+        if graph is None:
+            return jsonify({'error': 'Could not extract content from file'}), 400
 
-        return jsonify({
-            'nodes': nodes,
-            'edges': edges
-        })
+        with stage('serialize'):
+            result = json_response(encode_graph(graph, wire_format, fields))
+        result.headers['X-Extraction-Cache'] = cache_status(extraction_tier)
+        if shared:
+            result.headers['X-Coalesced'] = 'true'
+        return result
 
+    except UploadTooLargeError as e:
+        return jsonify({'error': str(e)}), 413
+    except UpstreamError as e:
+        payload, status, headers = upstream_error_response(e)
+        return jsonify(payload), status, headers
     except Exception as e:
-        print(f"Error in upload_file_for_graph: {str(e)}")
+        logger.exception("Error in upload_file_for_graph: %s", e)
         return jsonify({'error': str(e)}), 500
 
-def process_file_with_aryn(file_path, file_ext):
+def run_upload_job(path, upload_key, file_ext, digest, topic, mode, num_words):
     """
-    Process a file using the Aryn SDK to extract text content.
+    Build an upload's graph on a job worker.
+    
+    The uploaded file waits in the job queue's spool file at ``path``, so
+    queued jobs don't hold their uploads in memory. The graph goes to the
+    graph store like any other, so the job's result is just where to find it.
+    """
+    with stage('upload'):
+        with open(path, 'rb') as file:
+            data = file.read()
+    (graph, extraction_tier), shared = upload_flight.do(
+        upload_key, generate_upload_graph, data, file_ext, digest, topic, mode, num_words
+    )
+    if graph is None:
+        raise ValueError('Could not extract content from file')
+    return {
+        'graphId': graph['graphId'],
+        'topic': graph.get('topic', topic),
+        'extractionCache': cache_status(extraction_tier),
+        'coalesced': shared,
+    }
+
+def generate_upload_graph(data, file_ext, digest, topic, mode='single', num_words=5):
+    """
+    Build the graph for an uploaded document.
     
     Args:
-        file_path: Path to the temporary file
+        data: Contents of the uploaded file
         file_ext: File extension (pdf, png, jpg, jpeg)
+        digest: SHA-256 of the file contents
+        topic: Topic given by the user, or '' to infer one from the content
+        mode: 'single' prompts once with the whole document;
+            'mapreduce' extracts concepts from every part of it in parallel
+        num_words: Number of concepts in the graph
         
     Returns:
-        Extracted text content from the file
+        (graph, extraction_tier); graph is None if no text could be extracted
     """
-    try:
-        # Get Aryn API key from environment variable
-        api_key = os.getenv('ARYN_API_KEY')
-        if not api_key:
-            raise ValueError("ARYN_API_KEY environment variable not set")
-        
-        # Determine text mode based on file type
-        text_mode = "standard_ocr" if file_ext in ['png', 'jpg', 'jpeg'] else "vision_ocr"
-        
-        # Use Aryn SDK to process the file
-        with open(file_path, "rb") as f:
-            data = partition_file(
-                f,
-                aryn_api_key=api_key,
-                text_mode=text_mode,
-                extract_table_structure=True,
-                extract_images=True
-            )
-        
-        # Get elements from the response
-        # Print all elements for debugging
-        print("Aryn SDK Response Elements:")
-        print(json.dumps(data.get('elements', []), indent=2))
-
-        context_chunks = []
-
-        for element in data.get('elements', []):
-            if 'text_representation' in element:
-                text = element['text_representation']
-                if text is not None:
-                    context_chunks.append(text)
-                        
-        
-        # Combine all chunks
-        combined_text = "\n".join(context_chunks)
+    # Reuse the extraction of an identical document if we have one,
+    # otherwise process the file with Aryn SDK
+    with stage('extract'):
+        chunks, extraction_tier = extract_chunks(data, file_ext, digest)
+    
+    content_text = "\n".join(chunks)
+    
+    # Extract content from the file
+    if not content_text:
+        return None, extraction_tier
+    
+    if mode == 'mapreduce':
+        words = map_reduce_words(chunks, topic, num_words)
+    else:
+        # Use the extracted content to generate the graph; with no topic the
+        # same call names one, so this is the only model round trip
+        with stage('prompt'):
+            prompt = build_upload_prompt(topic, content_text, num_words)
+
+        # Generate content using the configured LLM provider
+        with stage('llm'):
+            response_text = get_provider().generate(prompt, WORDS_SCHEMA if topic else UPLOAD_SCHEMA)
+        if not response_text:
+            raise ValueError("Empty response from the model")
+
+        with stage('parse'):
+            topic, words = parse_upload_response(response_text, topic)
+
+    graph = build_graph(words, single_goal=False, node_type='wordNode', edge_type=None)
+    with stage('store'):
+        graph['graphId'] = graph_store.save(graph, topic=topic, node_type='wordNode', edge_type=None)
+    if topic:
+        graph['topic'] = topic
+    return graph, extraction_tier
+
+def map_reduce_words(chunks, topic, num_words):
+    """
+    Extract concepts from a whole document rather than its first few pages.
+    
+    The text is packed into token-bounded chunks, each chunk gets its own
+    prompt (all in parallel, so latency stays close to a single call), and
+    the concepts are merged and ranked locally. Chunks whose response fails
+    are skipped as long as at least one succeeds.
+    
+    Args:
+        chunks: Extracted text elements, in document order
+        topic: Topic given by the user, or '' if none
+        num_words: Number of concepts to keep
         
-        return combined_text
+    Returns:
+        List of word dicts
+    """
+    chunk_texts = split_into_chunks(chunks)
+    provider = get_provider()
+
+    def map_chunk(i, chunk_text):
+        prompt = build_map_prompt(chunk_text, i, len(chunk_texts), topic or None)
+        response_text = provider.generate(prompt, WORDS_SCHEMA)
+        if not response_text:
+            raise ValueError("Empty response from the model")
+        return parse_words_response(response_text)
+
+    with stage('llm'):
+        futures = [map_executor.submit(map_chunk, i, chunk_text) for i, chunk_text in enumerate(chunk_texts)]
+        chunk_words = []
+        for i, future in enumerate(futures):
+            try:
+                chunk_words.append(future.result())
+            except Exception as e:
+                logger.warning("Error in map_reduce_words for chunk %d/%d: %s", i + 1, len(chunk_texts), e)
+    if not chunk_words:
+        raise ValueError("Could not extract concepts from any part of the document")
+
+    with stage('merge'):
+        return merge_concepts(chunk_words, num_words)
+
+@word_graph_bp.route('/api/word-graph/<graph_id>', methods=['GET'])
+def get_word_graph(graph_id):
+    """
+    Fetch a stored graph by ID.
+    
+    Stored graphs never change, so the ID (plus the requested format) is
+    the ETag: a request whose If-None-Match names it gets a 304 without
+    reading the store.
+    """
+    try:
+        wire_format, fields = parse_wire_options(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    etag = stored_graph_etag(graph_id, wire_format, fields)
+    if request.if_none_match.contains_weak(etag):
+        return set_stored_graph_headers(Response(status=304), etag)
+
+    with stage('store'):
+        record = graph_store.get(graph_id)
+    if record is None:
+        return jsonify({'error': 'Graph not found'}), 404
+
+    with stage('serialize'):
+        result = json_response(encode_graph(stored_graph_payload(record), wire_format, fields))
+    return set_stored_graph_headers(result, etag)
+
+@word_graph_bp.route('/api/word-graph/<graph_id>/expand', methods=['POST'])
+def expand_word_graph(graph_id):
+    """
+    Break one node of a stored graph down into the concepts that lead to it.
+    
+    Only the new nodes and edges are returned, with the new positions of
+    existing nodes the layout moved, and the ID of the expanded graph
+    (the original graph is left as it was).
+    """
+    try:
+        wire_format, fields = parse_wire_options(request.args)
+        record, node_id, num_words = parse_expand_request(graph_store, graph_id, request.get_json(silent=True))
+    except LookupError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        cache_key = expansion_cache_key(graph_id, node_id, num_words)
+        start = time.perf_counter()
+        (delta, cache_tier), shared = expansion_flight.do(cache_key, expand_graph, record, node_id, num_words, cache_key)
+        if shared:
+            record_stage('coalesce', (time.perf_counter() - start) * 1000)
+
+        with stage('serialize'):
+            result = json_response(encode_graph(delta, wire_format, fields))
+        result.headers['X-Cache'] = cache_status(cache_tier)
+        if shared:
+            result.headers['X-Coalesced'] = 'true'
+        return result
+
+    except UpstreamError as e:
+        payload, status, headers = upstream_error_response(e)
+        return jsonify(payload), status, headers
+    except Exception as e:
+        logger.exception("Error in expand_word_graph: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+def expand_graph(record, node_id, num_words, cache_key):
+    """
+    Generate the sub-graph for one node, splice it in and store the result.
     
+    Args:
+        record: Stored graph record from graph_store
+        node_id: ID of the node to expand
+        num_words: Number of new concepts to ask for
+        cache_key: Cache key of the model's answer for this expansion
+    
+    Returns:
+        (delta, cache_tier) where delta has the new nodes and edges, moved
+        positions, the new ``graphId`` and the ``parentId`` it was expanded from
+    """
+    with stage('cache'):
+        response_text, cache_tier = graph_cache.lookup(cache_key)
+
+    if cache_tier is None:
+        with stage('prompt'):
+            prompt = expansion_prompt(record, node_id, num_words)
+        with stage('llm'):
+            response_text = get_provider().generate(prompt, WORDS_SCHEMA)
+        if not response_text:
+            raise ValueError("Empty response from the model")
+        with stage('parse'):
+            words = parse_words_response(response_text)
+        with stage('cache'):
+            graph_cache.set(cache_key, response_text)
+    else:
+        with stage('parse'):
+            words = parse_words_response(response_text)
+
+    return store_expansion(record, node_id, words), cache_tier
+
+def expansion_prompt(record, node_id, num_words):
+    """Build the expansion prompt for a node of a stored graph"""
+    graph = record['graph']
+    node = next(node for node in graph['nodes'] if node['id'] == node_id)
+    return build_expand_prompt(record.get('topic', ''), node['data'].get('label', ''),
+                               node['data'].get('summary', ''), neighbor_labels(graph, node_id), num_words)
+
+def store_expansion(record, node_id, words):
+    """Splice an expansion's words into a stored graph and store the result as a new graph"""
+    options = record.get('options', {})
+    with stage('layout'):
+        expanded, delta = splice_expansion(record['graph'], node_id, words, **options)
+    with stage('store'):
+        delta['graphId'] = graph_store.save(expanded, topic=record.get('topic', ''),
+                                            parent=record['id'], **options)
+    delta['parentId'] = record['id']
+    return delta
+
+@word_graph_bp.route('/api/word-graph/<graph_id>/nodes/<node_id>/details', methods=['GET'])
+def get_node_details(graph_id, node_id):
+    """
+    The summary, description and examples of one node of a stored graph.
+    
+    Nodes of skeleton graphs (``detailsLoaded: false``) are generated on the
+    first request and cached by topic and term, so reopening the node, or
+    the same concept in another graph of the topic, costs no model call.
+    """
+    try:
+        record, node = parse_details_request(graph_store, graph_id, node_id)
+    except LookupError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+
+    try:
+        cache_key = details_cache_key(record, node)
+        start = time.perf_counter()
+        (details, cache_tier), shared = details_flight.do(cache_key, node_details, record, node, cache_key)
+        if shared:
+            record_stage('coalesce', (time.perf_counter() - start) * 1000)
+
+        with stage('serialize'):
+            result = json_response(details_payload(record, node, details))
+        result.headers['X-Cache'] = cache_status(cache_tier)
+        if shared:
+            result.headers['X-Coalesced'] = 'true'
+        # Generated once and then served from the cache, like the graph itself
+        result.headers['Cache-Control'] = f'private, max-age={GRAPH_MAX_AGE}'
+        return result
+
+    except UpstreamError as e:
+        payload, status, headers = upstream_error_response(e)
+        return jsonify(payload), status, headers
     except Exception as e:
-        print(f"Error processing file with Aryn SDK: {str(e)}")
-        raise 
\ No newline at end of file
+        logger.exception("Error in get_node_details: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+def node_details(record, node, cache_key):
+    """
+    The details of a node: its own if the graph was generated in full,
+    else the cached or newly generated ones.
+    
+    Returns:
+        (details, cache_tier) where cache_tier is 'graph' if the node
+        already had them and None if the model was called
+    """
+    if node['data'].get('detailsLoaded', True):
+        return {key: node['data'].get(key) for key in ('summary', 'description', 'examples')}, 'graph'
+
+    with stage('cache'):
+        response_text, cache_tier = graph_cache.lookup(cache_key)
+
+    if cache_tier is None:
+        with stage('prompt'):
+            prompt = details_prompt(record, node)
+        with stage('llm'):
+            response_text = get_provider().generate(prompt, DETAILS_SCHEMA)
+        if not response_text:
+            raise ValueError("Empty response from the model")
+        with stage('parse'):
+            details = parse_details_response(response_text)
+        with stage('cache'):
+            graph_cache.set(cache_key, response_text)
+    else:
+        with stage('parse'):
+            details = parse_details_response(response_text)
+    return details, cache_tier
+
+def details_prompt(record, node):
+    """Build the details prompt for a node of a stored graph"""
+    return build_details_prompt(record.get('topic', ''), node['data'].get('label', ''),
+                                neighbor_labels(record['graph'], node['id']))
+
+@word_graph_bp.route('/api/word-graph/merge', methods=['POST'])
+def merge_word_graphs():
+    """
+    Union stored graphs into one concept map.
+
+    Concepts with matching names collapse into one node and edges are
+    remapped onto them (see merge.merge_graphs). The result is stored as a
+    new graph listing the graphs it was ``mergedFrom``; merging the same
+    graphs again returns it from the cache.
+    """
+    try:
+        wire_format, fields = parse_wire_options(request.args)
+        records, similarity = parse_merge_request(graph_store, request.get_json(silent=True))
+    except LookupError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        cache_key = merge_cache_key(records, similarity)
+        start = time.perf_counter()
+        (graph, cache_tier), shared = merge_flight.do(cache_key, merge_stored_graphs, records, similarity, cache_key)
+        if shared:
+            record_stage('coalesce', (time.perf_counter() - start) * 1000)
+
+        with stage('serialize'):
+            result = json_response(encode_graph(graph, wire_format, fields))
+        result.headers['X-Cache'] = cache_status(cache_tier)
+        if shared:
+            result.headers['X-Coalesced'] = 'true'
+        return result
+
+    except Exception as e:
+        logger.exception("Error in merge_word_graphs: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+def merge_stored_graphs(records, similarity, cache_key):
+    """
+    Merge stored graphs, or fetch the result of an earlier identical merge.
+    
+    Returns:
+        (graph, cache_tier) where cache_tier is None if the graphs were merged now
+    """
+    with stage('cache'):
+        merged_id, cache_tier = graph_cache.lookup(cache_key)
+    if cache_tier is not None:
+        with stage('store'):
+            record = graph_store.get(merged_id)
+        if record is not None:
+            return stored_graph_payload(record), cache_tier
+
+    # Merged nodes and edges take the types of the first graph
+    options = records[0].get('options', {})
+    with stage('merge'):
+        graph, repairs = merge_graphs([record['graph'] for record in records], similarity, **options)
+    with stage('layout'):
+        apply_layout(graph)
+    with stage('analytics'):
+        apply_analytics(graph)
+
+    topic = ' + '.join(dict.fromkeys(record['topic'] for record in records if record.get('topic')))
+    merged_from = [record['id'] for record in records]
+    with stage('store'):
+        graph['graphId'] = graph_store.save(graph, topic=topic, merged_from=merged_from, **options)
+    with stage('cache'):
+        graph_cache.set(cache_key, graph['graphId'])
+    if topic:
+        graph['topic'] = topic
+    graph['mergedFrom'] = merged_from
+    if repairs:
+        graph['repairs'] = repairs
+    return graph, None
+
+@word_graph_bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Status of a background job, with its ``result`` or ``error`` once finished.
+    
+    Answers straight away, so clients poll it; this app has no progress
+    event stream, which would hold a request thread until the job ended.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    result = jsonify(job_payload(job))
+    result.headers['Cache-Control'] = 'no-store'
+    return result
+
+@word_graph_bp.route('/api/metrics', methods=['GET'])
+def metrics():
+    """This worker's counters and histograms in the Prometheus text format"""
+    return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+@word_graph_bp.route('/api/word-graph/cache/stats', methods=['GET'])
+def cache_stats():
+    """Report hit and miss counts for this worker's caches"""
+    return jsonify(cache_stats_payload(cache_stats_sources(), FLIGHTS))
+
+def cache_stats_sources():
+    """The caches, stores and model provider /api/word-graph/cache/stats reports on"""
+    return {
+        'word_graphs': graph_cache,
+        'extractions': extraction_cache,
+        'graphs': graph_store,
+        'semantic': semantic_index,
+        'jobs': job_queue,
+        'llm': get_provider(),
+    }
+
+def extract_chunks(data, file_ext, digest):
+    """
+    Extract text chunks from an uploaded file, reusing a cached extraction of
+    identical bytes when there is one.
+    
+    Args:
+        data: Contents of the uploaded file
+        file_ext: File extension (pdf, png, jpg, jpeg)
+        digest: SHA-256 of the file contents
+        
+    Returns:
+        (chunks, tier) where tier is the cache tier that served them, or None on a miss
+    """
+    text_mode = get_text_mode(file_ext)
+    extraction_key = make_cache_key(digest, text_mode)
+    extraction, extraction_tier = extraction_cache.lookup(extraction_key)
+    if extraction_tier is not None:
+        return extraction['chunks'], extraction_tier
+    
+    chunks = process_file_with_aryn(data, file_ext, text_mode)
+    if chunks:
+        extraction_cache.set(extraction_key, {'text_mode': text_mode, 'chunks': chunks})
+    return chunks, None
@@ -0,0 +1,21 @@
+import os
+import tempfile
+
+import pytest
+
+# Before any backend module is imported: caches go to a scratch directory,
+# and the deterministic fake provider stands in for Gemini
+os.environ['FLOWLEARN_CACHE_DIR'] = tempfile.mkdtemp(prefix='flowlearn-test-')
+os.environ['LLM_PROVIDER'] = 'fake'
+os.environ.setdefault('FAKE_LLM_LATENCY', '0')
+
+
+@pytest.fixture(scope='session')
+def app():
+    from src.backend.app import create_app
+    return create_app(warm_up=False)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
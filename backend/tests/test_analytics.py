@@ -0,0 +1,86 @@
+import random
+from functools import lru_cache
+
+from src.backend.analytics import apply_analytics, graph_analytics
+
+
+def random_dag(rng, n, p):
+    """Edges of a random DAG, with node IDs shuffled so index order isn't topological"""
+    ids = [f"n{i}" for i in range(n)]
+    rng.shuffle(ids)
+    edges = [(ids[i], ids[j]) for i in range(n) for j in range(i + 1, n) if rng.random() < p]
+    return sorted(ids), edges
+
+
+def brute_force(node_ids, edges):
+    parents = {node_id: set() for node_id in node_ids}
+    for source, target in edges:
+        parents[target].add(source)
+
+    @lru_cache(maxsize=None)
+    def ancestors(node_id):
+        found = set(parents[node_id])
+        for parent in parents[node_id]:
+            found |= ancestors(parent)
+        return frozenset(found)
+
+    @lru_cache(maxsize=None)
+    def level(node_id):
+        return max((level(parent) + 1 for parent in parents[node_id]), default=0)
+
+    return {node_id: ancestors(node_id) for node_id in node_ids}, {node_id: level(node_id) for node_id in node_ids}
+
+
+def decode(mask, node_ids):
+    bits = int(mask, 16)
+    return {node_id for i, node_id in enumerate(node_ids) if bits >> i & 1}
+
+
+def test_matches_brute_force_on_random_dags():
+    rng = random.Random(2)
+    # Past 64 nodes the masks no longer fit in one machine word
+    for n in (1, 5, 20, 70, 150):
+        node_ids, edges = random_dag(rng, n, min(0.3, 4 / n))
+        result = graph_analytics(node_ids, edges)
+        ancestors, levels = brute_force(node_ids, edges)
+
+        assert result['acyclic']
+        assert {node_id: decode(mask, node_ids) for node_id, mask in result['prerequisites'].items()} == ancestors
+        assert result['levels'] == levels
+
+        position = {node_id: i for i, node_id in enumerate(result['order'])}
+        assert sorted(position) == node_ids
+        assert all(position[source] < position[target] for source, target in edges)
+        assert set(result['sources']) == {node_id for node_id in node_ids if levels[node_id] == 0}
+
+        path = result['criticalPath']
+        assert path[-1] == result['goal']
+        assert len(path) == levels[result['goal']] + 1 == max(levels.values()) + 1
+        assert all(pair in set(edges) for pair in zip(path, path[1:]))
+
+
+def test_chain_and_diamond():
+    result = graph_analytics(['a', 'b', 'c', 'd'], [('a', 'b'), ('a', 'c'), ('b', 'd'), ('c', 'd')])
+    assert result['order'][0] == 'a' and result['order'][-1] == 'd'
+    assert result['levels'] == {'a': 0, 'b': 1, 'c': 1, 'd': 2}
+    assert result['prerequisites'] == {'a': '0', 'b': '1', 'c': '1', 'd': '7'}
+    assert result['goal'] == 'd'
+    assert result['criticalPath'] in (['a', 'b', 'd'], ['a', 'c', 'd'])
+
+
+def test_cycles_unknown_nodes_and_self_loops():
+    result = graph_analytics(['a', 'b', 'c', 'd'],
+                             [('a', 'b'), ('b', 'c'), ('c', 'b'), ('c', 'd'), ('d', 'd'), ('d', 'ghost')])
+    assert not result['acyclic']
+    assert sorted(result['order']) == ['a', 'b', 'c', 'd']
+    assert result['order'].index('a') < result['order'].index('b') < result['order'].index('d')
+    assert result['goal'] == 'd'
+
+    empty = graph_analytics([], [])
+    assert empty['order'] == [] and empty['goal'] is None and empty['criticalPath'] == []
+
+
+def test_apply_analytics():
+    graph = {'nodes': [{'id': 'x'}, {'id': 'y'}], 'edges': [{'source': 'x', 'target': 'y'}]}
+    assert apply_analytics(graph) is graph
+    assert graph['analytics']['criticalPath'] == ['x', 'y']
@@ -0,0 +1,44 @@
+import asyncio
+import io
+
+import pytest
+from werkzeug.datastructures import FileStorage, MultiDict
+
+from src.backend.api import parse_upload_file, upload_cache_key
+
+
+def test_parse_upload_file():
+    file, file_ext = parse_upload_file(MultiDict({'file': FileStorage(io.BytesIO(b'%PDF'), '../Notes.PDF')}))
+    assert file_ext == 'pdf'
+    for files, error in [
+        (MultiDict(), 'No file part'),
+        (MultiDict({'file': FileStorage(io.BytesIO(b''), '')}), 'No selected file'),
+        (MultiDict({'file': FileStorage(io.BytesIO(b''), 'notes.exe')}), 'File type not supported'),
+    ]:
+        with pytest.raises(ValueError, match=error):
+            parse_upload_file(files)
+
+
+def test_upload_cache_key_covers_every_option():
+    key = upload_cache_key('digest', 'pdf', 'Heat', 'single', 5)
+    assert upload_cache_key('digest', 'pdf', ' heat ', 'single', 5) == key
+    assert len({key, upload_cache_key('digest', 'png', 'Heat', 'single', 5),
+                upload_cache_key('digest', 'pdf', 'Heat', 'mapreduce', 5),
+                upload_cache_key('digest', 'pdf', 'Heat', 'single', 6)}) == 4
+
+
+def test_both_apps_report_the_same_stats(client):
+    pytest.importorskip('quart')
+    from src.backend.asgi import create_app
+
+    async def get():
+        async_client = create_app(warm_up=False).test_client()
+        stats = await async_client.get('/api/word-graph/cache/stats')
+        metrics = await async_client.get('/api/metrics')
+        return await stats.get_json(), metrics.status_code, await metrics.get_data(as_text=True)
+
+    stats, status, text = asyncio.run(get())
+    expected = client.get('/api/word-graph/cache/stats').get_json()
+    assert stats.keys() == expected.keys()
+    assert stats['coalescing'].keys() == expected['coalescing'].keys()
+    assert status == 200 and 'flowlearn_requests_total' in text
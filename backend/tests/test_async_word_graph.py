@@ -0,0 +1,67 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+pytest.importorskip('quart')
+
+from src.backend import async_word_graph
+from src.backend.asgi import create_app
+from src.backend.concepts import MAP_CONCURRENCY
+from src.backend.providers import LLMProvider, sample_words
+from src.backend.timing import parse_server_timing
+
+
+class SlowMapProvider(LLMProvider):
+    name = 'slow-map'
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def generate_async(self, prompt, schema=None):
+        self.calls += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.001)
+        self.running -= 1
+        return json.dumps({'words': sample_words('Map', 3)})
+
+
+def test_map_limit_works_on_every_event_loop(monkeypatch):
+    provider = SlowMapProvider()
+    monkeypatch.setattr(async_word_graph, 'get_provider', lambda: provider)
+    chunks = [f"chunk {i}" for i in range(MAP_CONCURRENCY + 4)]
+    monkeypatch.setattr(async_word_graph, 'split_into_chunks', lambda texts: chunks)
+
+    # Each asyncio.run is a new loop, like a restarted worker or a test client
+    for _ in range(2):
+        words = asyncio.run(async_word_graph.map_reduce_words_async(chunks, 'Map', 3))
+        assert words
+    # A failed map call is only logged, so count that every chunk was mapped
+    assert provider.calls == 2 * len(chunks)
+    assert provider.peak == MAP_CONCURRENCY
+
+
+def test_stores_and_layout_run_off_the_event_loop(monkeypatch):
+    threads = set()
+    save = async_word_graph.graph_store.save
+
+    def record_save(*args, **kwargs):
+        threads.add(threading.current_thread())
+        return save(*args, **kwargs)
+    monkeypatch.setattr(async_word_graph.graph_store, 'save', record_save)
+
+    async def run():
+        threads.add(threading.current_thread())
+        response = await create_app(warm_up=False).test_client().post(
+            '/api/word-graph/generate', json={'topic': 'Off the loop', 'num_words': 4})
+        assert response.status_code == 200
+        return response.headers['Server-Timing']
+
+    timings = parse_server_timing(asyncio.run(run()))
+    # The save ran on another thread, and its stages still reached the header
+    assert len(threads) == 2
+    assert {'store', 'layout', 'cache'} <= set(timings)
@@ -0,0 +1,44 @@
+import sqlite3
+
+from src.backend.cache import TieredCache
+
+
+def disk_totals(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache').fetchone()
+
+
+def test_running_totals_follow_writes_and_enforce_limits(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = TieredCache(path, max_entries=3, memory_entries=0)
+    conn = cache._connect()
+    for i in range(5):
+        cache.set(f'key-{i}', 'x' * i)
+    cache.set('key-4', 'longer value')
+    cache.delete('key-3')
+    assert cache._totals(conn) == disk_totals(path) == (2, 14 + len('"xx"'))
+    assert cache.get('key-0') is None and cache.get('key-4') == 'longer value'
+
+    # A second instance on the same file picks the totals up without rescanning
+    other = TieredCache(path, max_entries=3, max_bytes=20, memory_entries=0)
+    other.set('key-5', 'y' * 10)
+    assert other._totals(other._connect()) == disk_totals(path)
+    assert disk_totals(path)[1] <= 20
+
+
+def test_disk_hits_only_touch_stale_entries(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = TieredCache(path, memory_entries=0, touch_interval=60)
+    cache.set('key', 'value')
+    conn = cache._connect()
+
+    def accessed_at():
+        return conn.execute("SELECT accessed_at FROM cache WHERE key = 'key'").fetchone()[0]
+
+    written = accessed_at()
+    assert cache.get('key') == 'value'
+    assert accessed_at() == written
+
+    conn.execute("UPDATE cache SET accessed_at = accessed_at - 120 WHERE key = 'key'")
+    assert cache.get('key') == 'value'
+    assert accessed_at() >= written
@@ -0,0 +1,90 @@
+import json
+
+from src.backend.expansion import splice_expansion
+from src.backend.word_graph import build_graph
+
+
+def chain(terms):
+    return [{'term': term, 'related_concepts': [later] if later else []}
+            for term, later in zip(terms, terms[1:] + [None])]
+
+
+def test_delta_analytics_scale_with_the_expansion():
+    terms = [f"Concept {i}" for i in range(300)]
+    graph = build_graph(chain(terms))
+    target = next(node['id'] for node in graph['nodes'] if node['data']['label'] == 'Concept 290')
+
+    words = chain(['Part A', 'Part B', 'Part C']) + [{'term': 'Part D', 'related_concepts': ['Concept 290']}]
+    words[2]['related_concepts'] = ['Concept 290']
+    expanded, delta = splice_expansion(graph, target, words)
+
+    new_ids = {node['id'] for node in delta['nodes']}
+    assert len(new_ids) == 4
+    # Concept 290 is deeper than the new chain, so no existing level moves
+    assert set(delta['analytics']) == {'levels', 'goal', 'acyclic'}
+    assert set(delta['analytics']['levels']) == new_ids
+    assert delta['analytics']['goal'] == expanded['analytics']['goal']
+    assert len(json.dumps(delta['analytics'])) < 300
+    assert set(expanded['analytics']['prerequisites']) == {node['id'] for node in expanded['nodes']}
+
+
+def test_delta_reports_levels_pushed_deeper():
+    graph = build_graph(chain(['Start', 'Middle', 'Goal']))
+    start = graph['nodes'][0]['id']
+    _, delta = splice_expansion(graph, start, chain(['First', 'Second']))
+    levels = delta['analytics']['levels']
+    # Two prerequisites before Start move it and everything after it two levels down
+    assert {levels[node['id']] for node in delta['nodes']} == {0, 1}
+    assert [levels[node['id']] for node in graph['nodes']] == [2, 3, 4]
+
+
+def reaches(graph, start, goal):
+    successors = {}
+    for edge in graph['edges']:
+        successors.setdefault(edge['source'], []).append(edge['target'])
+    stack, seen = [start], {start}
+    while stack:
+        v = stack.pop()
+        if v == goal:
+            return True
+        for w in successors.get(v, []):
+            if w not in seen:
+                seen.add(w)
+                stack.append(w)
+    return False
+
+
+def test_reused_concept_keeps_its_edges_into_the_expansion():
+    graph = build_graph(chain(['Algebra', 'Calculus', 'Physics']) + [{'term': 'Geometry', 'related_concepts': ['Physics']}])
+    ids = {node['data']['label']: node['id'] for node in graph['nodes']}
+    # The model names an existing concept (Algebra) between two new ones
+    words = [
+        {'term': 'Arithmetic', 'related_concepts': ['Algebra']},
+        {'term': 'algebra', 'related_concepts': ['Limits']},
+        {'term': 'Limits', 'related_concepts': ['Calculus']},
+    ]
+    expanded, delta = splice_expansion(graph, ids['Calculus'], words)
+    new_ids = {node['data']['label']: node['id'] for node in delta['nodes']}
+    assert set(new_ids) == {'Arithmetic', 'Limits'}
+    assert {(edge['source'], edge['target']) for edge in delta['edges']} == {
+        (new_ids['Arithmetic'], ids['Algebra']),
+        (ids['Algebra'], new_ids['Limits']),
+        (new_ids['Limits'], ids['Calculus']),
+    }
+    assert all(reaches(expanded, node_id, ids['Calculus']) for node_id in new_ids.values())
+    assert expanded['analytics']['acyclic']
+
+
+def test_reused_concept_after_the_target_cannot_close_a_cycle():
+    graph = build_graph(chain(['Algebra', 'Calculus', 'Physics']))
+    ids = {node['data']['label']: node['id'] for node in graph['nodes']}
+    # Physics comes after Algebra, so Physics -> Basics -> Algebra would be a cycle
+    words = [
+        {'term': 'Physics', 'related_concepts': ['Basics']},
+        {'term': 'Basics', 'related_concepts': []},
+    ]
+    expanded, delta = splice_expansion(graph, ids['Algebra'], words)
+    basics = delta['nodes'][0]['id']
+    assert {(edge['source'], edge['target']) for edge in delta['edges']} == {(basics, ids['Algebra'])}
+    assert delta['repairs']['removed_cycle_edges'] == 1
+    assert expanded['analytics']['acyclic']
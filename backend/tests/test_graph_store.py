@@ -0,0 +1,70 @@
+import pytest
+
+from src.backend.graph_store import GraphStore, MemoryGraphStore
+
+
+def sample_graph(*labels):
+    nodes = [{'id': f'node-{i}', 'data': {'label': label}} for i, label in enumerate(labels)]
+    edges = [{'id': f'edge-{i}', 'source': f'node-{i}', 'target': f'node-{i + 1}'} for i in range(len(labels) - 1)]
+    return {'nodes': nodes, 'edges': edges}
+
+
+@pytest.fixture(params=['sqlite', 'memory'])
+def store(request, tmp_path):
+    if request.param == 'sqlite':
+        # One graph in the memory tier, so the SQLite tier is exercised
+        return GraphStore(str(tmp_path / 'graphs.sqlite3'), memory_entries=1)
+    return MemoryGraphStore()
+
+
+def test_same_content_with_other_metadata_gets_its_own_id(store):
+    graph = sample_graph('Algebra', 'Calculus')
+    algebra = store.save(graph, topic='Algebra')
+    store.save(sample_graph('Something', 'Else'), topic='Evicts the first graph from memory')
+    calculus = store.save(graph, topic='Calculus')
+    child = store.save(graph, topic='Algebra', parent=algebra)
+
+    assert len({algebra, calculus, child}) == 3
+    assert store.get(algebra)['topic'] == 'Algebra' and store.get(algebra)['parent'] is None
+    assert store.get(calculus)['topic'] == 'Calculus'
+    assert store.get(child)['parent'] == algebra
+
+
+def test_saving_again_returns_the_same_record(store):
+    graph = sample_graph('Algebra', 'Calculus')
+    first = store.save(graph, topic='Algebra', merged_from=['a', 'b'])
+    store.save(sample_graph('Something', 'Else'))
+    assert store.save(graph, topic='Algebra', merged_from=['a', 'b']) == first
+    record = store.get(first)
+    assert record['id'] == first and record['merged_from'] == ['a', 'b']
+    assert record['graph'] == graph
+
+
+def test_stored_graph_etag_and_revalidation(client):
+    response = client.post('/api/word-graph/generate', json={'topic': 'ETag topic', 'num_words': 3})
+    graph_id = response.get_json()['graphId']
+
+    response = client.get(f'/api/word-graph/{graph_id}')
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{graph_id}"'
+    assert 'max-age' in response.headers['Cache-Control']
+    assert response.get_json()['topic'] == 'ETag topic'
+
+    response = client.get(f'/api/word-graph/{graph_id}', headers={'If-None-Match': f'"{graph_id}"'})
+    assert response.status_code == 304 and response.data == b''
+
+    compact = client.get(f'/api/word-graph/{graph_id}?format=compact')
+    assert compact.headers['ETag'] != f'"{graph_id}"'
+    response = client.get(f'/api/word-graph/{graph_id}', headers={'If-None-Match': compact.headers['ETag']})
+    assert response.status_code == 200
+
+    # Compressed bodies get weak ETags, which still revalidate
+    response = client.get(f'/api/word-graph/{graph_id}', headers={'Accept-Encoding': 'gzip'})
+    if response.headers.get('Content-Encoding'):
+        assert response.headers['ETag'].startswith('W/')
+    response = client.get(f'/api/word-graph/{graph_id}', headers={'If-None-Match': f'W/"{graph_id}"'})
+    assert response.status_code == 304
+
+
+def test_unknown_graph_is_404(client):
+    assert client.get('/api/word-graph/0123456789abcdef').status_code == 404
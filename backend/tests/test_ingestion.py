@@ -0,0 +1,107 @@
+import io
+
+import pytest
+
+from src.backend import ingestion
+from src.backend.timing import request_timings, start_request_timing
+
+
+def partition_file_0_2_3(file, *, aryn_api_key=None, aryn_config=None, threshold=None, text_mode=None,
+                         use_ocr=None, summarize_images=False, ocr_language=None, extract_table_structure=False,
+                         text_extraction_options=None, table_extraction_options=None, extract_images=False,
+                         extract_image_format=None, selected_pages=None, chunking_options=None, aps_url=None,
+                         docparse_url=None, ssl_verify=True, output_format=None, markdown_options=None,
+                         output_label_options=None, trace_id=None, extra_headers=None, cancel_flag=None,
+                         add_to_docset_id=None):
+    """The signature of partition_file in aryn-sdk 0.2.3, the version uv.lock pins"""
+    return {'elements': [{'text_representation': f"{file.name} {selected_pages}"}]}
+
+
+def test_partition_document_fits_the_locked_sdk(monkeypatch):
+    monkeypatch.setattr(ingestion, 'partition_file', partition_file_0_2_3)
+    elements = ingestion.partition_document(b'%PDF', 'pdf', 'auto', 'key')
+    assert elements == [{'text_representation': 'upload.pdf None'}]
+
+
+def pdf_with_pages(n):
+    """A PDF whose page i (from 1) is 100 + i points wide, so every page can be told apart"""
+    pypdf = pytest.importorskip('pypdf')
+    writer = pypdf.PdfWriter()
+    for i in range(1, n + 1):
+        writer.add_blank_page(width=100 + i, height=100)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def partition_pages(file, **kwargs):
+    """Fake partition_file that reports which pages of the original it was sent"""
+    import pypdf
+    assert 'selected_pages' not in kwargs
+    reader = pypdf.PdfReader(file)
+    return {'elements': [{'text_representation': int(page.mediabox.width) - 100} for page in reader.pages]}
+
+
+def test_long_pdf_is_uploaded_as_separate_page_ranges_in_order(monkeypatch):
+    n = ingestion.ARYN_PAGES_PER_CHUNK
+    data = pdf_with_pages(2 * n + 1)
+    sizes = []
+
+    def partition_file(file, **kwargs):
+        sizes.append(len(file.getvalue()))
+        return partition_pages(file, **kwargs)
+
+    monkeypatch.setattr(ingestion, 'partition_file', partition_file)
+    start_request_timing()
+    elements = ingestion.partition_document(data, 'pdf', 'auto', 'key')
+    assert [e['text_representation'] for e in elements] == list(range(1, 2 * n + 2))
+    # Each range gets its own pages, not another copy of the whole document
+    assert len(sizes) == 3 and sum(sizes) < 2 * len(data)
+    # Ranges partitioned on the executor still count towards the request
+    assert {'split', 'partition'} <= set(request_timings())
+
+
+def test_long_pdf_without_pypdf_is_partitioned_once(monkeypatch):
+    data = pdf_with_pages(2 * ingestion.ARYN_PAGES_PER_CHUNK + 1)
+    calls = []
+    monkeypatch.setattr(ingestion, 'partition_file', lambda file, **kwargs: calls.append(file) or {'elements': []})
+    monkeypatch.setattr(ingestion, 'pypdf', None)
+    ingestion.partition_document(data, 'pdf', 'auto', 'key')
+    assert len(calls) == 1 and calls[0].getvalue() == data
+
+
+def test_unreadable_pdf_is_partitioned_whole(monkeypatch):
+    pytest.importorskip('pypdf')
+    data = b'%%PDF << /Type /Pages /Count %d >>' % (2 * ingestion.ARYN_PAGES_PER_CHUNK + 1)
+    assert ingestion.split_pdf(data) is None
+
+
+class Sent(Exception):
+    pass
+
+
+def test_installed_sdk_uploads_the_file_name(monkeypatch):
+    httpx = pytest.importorskip('httpx')
+    pytest.importorskip('aryn_sdk')
+    sent = {}
+
+    def stream(method, url, files=None, **kwargs):
+        sent.update(files)
+        raise Sent()
+
+    monkeypatch.setattr(httpx, 'stream', stream)
+    monkeypatch.setattr(ingestion, 'partition_file', None)
+    with pytest.raises(Sent):
+        ingestion.partition_document(b'\x89PNG', 'png', 'auto', 'key')
+
+    # aryn-sdk 0.2.3 sends the file as 'pdf', later releases as 'file'
+    upload = sent.get('file', sent.get('pdf'))
+    name = upload[0] if isinstance(upload, tuple) else upload.name
+    assert name == 'upload.png'
+
+
+def test_read_upload_limits_size():
+    data, digest = ingestion.read_upload(io.BytesIO(b'abc'), max_bytes=3)
+    assert data == b'abc' and len(digest) == 64
+    with pytest.raises(ingestion.UploadTooLargeError):
+        ingestion.read_upload(io.BytesIO(b'abcd'), max_bytes=3)
@@ -0,0 +1,103 @@
+import io
+import threading
+import time
+
+import pytest
+
+from src.backend import word_graph
+from src.backend.jobs import FINISHED, JobQueue
+
+
+@pytest.fixture
+def extraction(monkeypatch):
+    def extract_chunks(data, file_ext, digest):
+        return [f'Paragraph {i} about thermodynamics and heat engines.' for i in range(5)], None
+    monkeypatch.setattr(word_graph, 'extract_chunks', extract_chunks)
+
+
+def upload_job(client, content):
+    return client.post('/api/word-graph/upload?job=1', content_type='multipart/form-data',
+                       data={'file': (io.BytesIO(content), 'notes.pdf'), 'topic': 'Thermodynamics'})
+
+
+def test_wsgi_jobs_are_polled_not_streamed(client, extraction):
+    response = upload_job(client, b'%PDF polled job')
+    assert response.status_code == 202
+    job = response.get_json()
+    assert 'eventsUrl' not in job
+    assert response.headers['Location'] == job['statusUrl']
+    # No progress stream holds a WSGI thread
+    assert client.get(f"/api/jobs/{job['jobId']}/events").status_code == 404
+
+    status_url = job['statusUrl']
+    deadline = time.monotonic() + 10
+    while True:
+        status = client.get(status_url)
+        assert status.status_code == 200
+        assert status.headers['Cache-Control'] == 'no-store'
+        job = status.get_json()
+        if job['status'] in ('done', 'failed') or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    assert job['status'] == 'done', job
+    graph = client.get(f"/api/word-graph/{job['result']['graphId']}")
+    assert graph.status_code == 200 and graph.get_json()['nodes']
+
+
+def test_unknown_job_is_404(client):
+    assert client.get('/api/jobs/nope').status_code == 404
+
+
+def test_asgi_jobs_stream_progress(extraction):
+    import asyncio
+    pytest.importorskip('quart')
+    from werkzeug.datastructures import FileStorage
+    from src.backend.asgi import create_app
+
+    async def run():
+        client = create_app(warm_up=False).test_client()
+        response = await client.post('/api/word-graph/upload?job=1', form={'topic': 'Thermodynamics'},
+                                     files={'file': FileStorage(io.BytesIO(b'%PDF streamed job'), 'notes.pdf')})
+        assert response.status_code == 202
+        job = await response.get_json()
+        events = await client.get(job['eventsUrl'])
+        assert events.status_code == 200
+        return (await events.get_data(as_text=True))
+
+    body = asyncio.run(run())
+    assert body.startswith('event: status')
+    assert 'event: done' in body and '"graphId"' in body
+
+
+def wait_for(queue, job_id):
+    deadline = time.monotonic() + 10
+    while queue.get(job_id)['status'] not in FINISHED and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+
+def test_spooled_input_waits_on_disk_and_is_removed(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), workers=1, spool_dir=str(tmp_path / 'spool'))
+    (tmp_path / 'spool').mkdir()
+    release = threading.Event()
+    seen = []
+
+    def read(path, suffix):
+        release.wait(5)
+        with open(path, 'rb') as file:
+            seen.append(path)
+            return file.read().decode() + suffix
+
+    def fail(path):
+        raise ValueError('bad upload')
+
+    first = queue.submit('test', read, '!', spool=b'first')
+    queued = queue.submit('test', fail, spool=b'second')
+    # Both inputs are on disk while the jobs wait, not in the job records
+    assert len(list((tmp_path / 'spool').iterdir())) == 2
+    release.set()
+
+    assert wait_for(queue, first['id'])['result'] == 'first!'
+    assert wait_for(queue, queued['id'])['error'] == 'bad upload'
+    assert seen[0].startswith(str(tmp_path / 'spool'))
+    assert list((tmp_path / 'spool').iterdir()) == []
@@ -0,0 +1,114 @@
+import itertools
+import random
+
+import numpy as np
+
+from src.backend.layout import (
+    NODE_SEP, RANK_SEP, _assign_layers, _count_crossings, _group_by, _insert_dummies, _minimize_crossings,
+    apply_layout, estimate_width, layout_graph,
+)
+
+
+def random_dag(rng, n, p):
+    return [(f"n{i}", f"n{j}") for i in range(n) for j in range(i + 1, n) if rng.random() < p]
+
+
+def layered(n, edges):
+    """Layers, dummy-split edges and per-layer-pair groups of a DAG over n{i} nodes"""
+    pairs = sorted({(int(s[1:]), int(t[1:])) for s, t in edges})
+    src, dst = (np.array(pairs, dtype=np.int64).T if pairs
+                else (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)))
+    layer = _assign_layers(n, src, dst)
+    layer, src, dst = _insert_dummies(n, layer, src, dst)
+    return layer, src, dst, _group_by(layer[src], int(layer.max()) + 1)
+
+
+def brute_force_crossings(order, src, dst, groups):
+    total = 0
+    for edge_ids in groups:
+        for e, f in itertools.combinations(edge_ids.tolist(), 2):
+            a, b, c, d = order[src[e]], order[dst[e]], order[src[f]], order[dst[f]]
+            total += (a - c) * (b - d) < 0
+    return total
+
+
+def test_edges_point_right_and_nodes_keep_apart():
+    rng = random.Random(3)
+    for n in (1, 2, 8, 30):
+        node_ids = [f"n{i}" for i in range(n)]
+        edges = random_dag(rng, n, 0.2)
+        positions = layout_graph(node_ids, edges)
+        assert set(positions) == set(node_ids)
+        for s, t in edges:
+            assert positions[t]['x'] - positions[s]['x'] >= RANK_SEP
+        columns = {}
+        for pos in positions.values():
+            columns.setdefault(pos['x'], []).append(pos['y'])
+        for ys in columns.values():
+            ys.sort()
+            assert all(b - a >= NODE_SEP - 0.1 for a, b in zip(ys, ys[1:]))
+
+
+def test_sources_sit_just_before_their_nearest_successor():
+    # 'side' only feeds the goal, so it belongs next to it rather than in layer 0
+    positions = layout_graph(['a', 'b', 'goal', 'side'], [('a', 'b'), ('b', 'goal'), ('side', 'goal')])
+    assert positions['side']['x'] == positions['b']['x']
+    assert positions['a']['x'] < positions['b']['x'] < positions['goal']['x']
+
+
+def test_cycles_self_loops_and_unknown_nodes():
+    positions = layout_graph(['a', 'b', 'c'], [('a', 'b'), ('b', 'c'), ('c', 'a'), ('a', 'a'), ('a', 'ghost')])
+    assert len({pos['x'] for pos in positions.values()}) == 3
+    assert layout_graph([], []) == {}
+
+
+def test_wide_labels_widen_their_layer():
+    narrow = layout_graph(['a', 'b'], [('a', 'b')], [100, 100])
+    wide = layout_graph(['a', 'b'], [('a', 'b')], [400, 100])
+    assert wide['b']['x'] - narrow['b']['x'] == 300
+
+
+def test_count_crossings_matches_brute_force():
+    rng = random.Random(7)
+    for trial in range(40):
+        n = rng.randint(2, 25)
+        layer, src, dst, groups = layered(n, random_dag(rng, n, rng.choice((0.1, 0.3, 0.6))))
+        order = np.zeros(layer.size, dtype=np.int64)
+        for nodes in _group_by(layer, int(layer.max()) + 1):
+            order[nodes] = rng.sample(range(nodes.size), nodes.size)
+        assert _count_crossings(order, src, dst, groups) == brute_force_crossings(order, src, dst, groups), trial
+
+
+def test_minimize_crossings_untangles_a_swap():
+    # a -> d and b -> c cross in input order; swapping c and d removes it
+    layer, src, dst, groups = layered(4, [('n0', 'n3'), ('n1', 'n2')])
+    identity = np.array([0, 1, 0, 1])
+    assert _count_crossings(identity, src, dst, groups) == 1
+    assert _count_crossings(_minimize_crossings(layer, src, dst), src, dst, groups) == 0
+
+
+def test_minimize_crossings_never_makes_it_worse():
+    rng = random.Random(11)
+    for _ in range(20):
+        n = rng.randint(5, 30)
+        layer, src, dst, groups = layered(n, random_dag(rng, n, 0.25))
+        initial = np.zeros(layer.size, dtype=np.int64)
+        for nodes in _group_by(layer, int(layer.max()) + 1):
+            initial[nodes] = np.arange(nodes.size)
+        order = _minimize_crossings(layer, src, dst)
+        for nodes in _group_by(layer, int(layer.max()) + 1):
+            assert sorted(order[nodes]) == list(range(nodes.size))
+        assert _count_crossings(order, src, dst, groups) <= _count_crossings(initial, src, dst, groups)
+
+
+def test_apply_layout_sets_positions_and_is_cached():
+    graph = {
+        'nodes': [{'id': 'a', 'data': {'label': 'Start'}}, {'id': 'b', 'data': {'label': 'A much longer label'}}],
+        'edges': [{'source': 'a', 'target': 'b'}],
+    }
+    apply_layout(graph)
+    assert graph['layout'] == 'layered'
+    assert graph['nodes'][0]['position']['x'] < graph['nodes'][1]['position']['x']
+    assert layout_graph(['a', 'b'], [('a', 'b')], [estimate_width('Start'), estimate_width('A much longer label')]) == {
+        node['id']: node['position'] for node in graph['nodes']
+    }
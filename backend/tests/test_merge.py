@@ -0,0 +1,124 @@
+import random
+
+import pytest
+
+from src.backend.merge import UnionFind, canonical_term, cluster_terms, merge_graphs, trigrams
+
+
+def groups(terms, threshold=0.8):
+    """The clusters of ``terms`` as sets of names"""
+    clusters = {}
+    for term, root in zip(terms, cluster_terms(terms, threshold)):
+        clusters.setdefault(root, set()).add(term)
+    return sorted(clusters.values(), key=lambda names: sorted(names))
+
+
+@pytest.mark.parametrize('threshold', [0.8, 1.0])
+def test_languages_are_not_merged(threshold):
+    terms = ['C', 'C++', 'C#', 'c', 'c++']
+    assert groups(terms, threshold) == [{'C', 'c'}, {'C#'}, {'C++', 'c++'}]
+
+
+@pytest.mark.parametrize('threshold', [0.8, 1.0])
+def test_names_that_differ_in_a_language_are_not_merged(threshold):
+    terms = ['Pointers in C', 'Pointers in C++', 'pointers in c', 'Pointers in C#']
+    assert groups(terms, threshold) == [{'Pointers in C', 'pointers in c'}, {'Pointers in C#'}, {'Pointers in C++'}]
+
+
+def test_markers_are_checked_when_canonical_keys_are_equal():
+    # Same key once spacing is ignored, but "10" is a separate number in one of them
+    assert cluster_terms(['Windows 10', 'Windows10'], 1.0) == [0, 1]
+
+
+def test_spellings_of_one_concept_are_merged():
+    terms = ['Neural Networks', 'neural network', 'The Neural-Network', 'Backpropagation', 'Back propagation',
+             'Probabilities', 'probability']
+    assert cluster_terms(terms) == [0, 0, 0, 3, 3, 5, 5]
+    assert canonical_term('The Neural-Networks') == canonical_term('neural network')
+
+
+@pytest.mark.parametrize('pair', [('World War I', 'World War II'), ('Python 2', 'Python 3'),
+                                  ('Vitamin C', 'Vitamin D'), ('Chemistry Concept 1', 'Chemistry Concept 2')])
+def test_markers_keep_similar_names_apart(pair):
+    assert cluster_terms(list(pair)) == [0, 1]
+
+
+def test_fuzzy_matches_are_transitive():
+    # The first and last names are only 0.55 alike, but both match the middle one
+    terms = ['electromagnetic inductance', 'electromagnetic induction', 'electromagnetc induction']
+    assert cluster_terms(terms, 0.65) == [0, 0, 0]
+    assert cluster_terms([terms[0], terms[2]], 0.65) == [0, 1]
+
+
+def brute_force_clusters(terms, threshold):
+    """cluster_terms by comparing every pair, for checking the candidate index"""
+    from src.backend.merge import canonical_words
+    from src.backend.terms import marker_words
+    words = [canonical_words(term) for term in terms]
+    keys = [''.join(w) for w in words]
+    found = UnionFind(len(terms))
+    for i in range(len(terms)):
+        for j in range(i):
+            if marker_words(words[i]) != marker_words(words[j]):
+                continue
+            a, b = trigrams(keys[i]), trigrams(keys[j])
+            shared = len(a & b)
+            if keys[i] == keys[j] or (threshold < 1 and shared >= threshold * (len(a) + len(b) - shared)):
+                found.union(i, j)
+    return [found.find(i) for i in range(len(terms))]
+
+
+@pytest.mark.parametrize('threshold', [0.5, 0.7, 0.8, 0.9, 1.0])
+def test_candidate_index_finds_every_pair_above_the_threshold(threshold):
+    rng = random.Random(7)
+    base = ['photosynthesis', 'cellular respiration', 'krebs cycle', 'glycolysis', 'enzyme kinetics',
+            'protein folding 2', 'dna replication']
+
+    def mutate(word):
+        chars = list(word)
+        k = rng.randrange(len(chars))
+        op = rng.randrange(3)
+        if op == 0:
+            chars[k] = rng.choice('abcdefghij')
+        elif op == 1:
+            del chars[k]
+        else:
+            chars.insert(k, rng.choice('aeiou '))
+        return ''.join(chars)
+
+    for _ in range(30):
+        terms = [mutate(mutate(rng.choice(base))) if rng.random() < 0.7 else rng.choice(base) for _ in range(40)]
+        assert cluster_terms(terms, threshold) == brute_force_clusters(terms, threshold)
+
+
+def node(i, label, **data):
+    return {'id': f'node-{i}', 'data': {'label': label, **data}}
+
+
+def edge(source, target):
+    return {'id': f'edge-{source}-{target}', 'source': f'node-{source}', 'target': f'node-{target}', 'data': {}}
+
+
+def test_merge_graphs_unions_nodes_and_drops_cycle_edges():
+    first = {'nodes': [node(0, 'Algebra', examples=['x']), node(1, 'Calculus', summary='calc')],
+             'edges': [edge(0, 1)]}
+    second = {'nodes': [node(0, 'calculus', summary='C', examples=['y']), node(1, 'algebra', examples=['x', 'z']),
+                        node(2, 'Physics')],
+              'edges': [edge(0, 1), edge(0, 2)]}
+    graph, repairs = merge_graphs([first, second])
+
+    labels = [n['data']['label'] for n in graph['nodes']]
+    assert labels == ['Algebra', 'Calculus', 'Physics']
+    assert graph['nodes'][0]['data']['examples'] == ['x', 'z']
+    assert graph['nodes'][1]['data']['summary'] == 'calc'
+    # calculus -> algebra contradicts algebra -> calculus and would close a cycle
+    assert [(e['source'], e['target']) for e in graph['edges']] == [('node-0', 'node-1'), ('node-1', 'node-2')]
+    assert repairs == {'merged_concepts': 2, 'removed_cycle_edges': 1}
+
+
+def test_merge_graphs_keeps_languages_apart():
+    first = {'nodes': [node(0, 'C'), node(1, 'Pointers in C')], 'edges': [edge(0, 1)]}
+    second = {'nodes': [node(0, 'C++'), node(1, 'Pointers in C++')], 'edges': [edge(0, 1)]}
+    graph, repairs = merge_graphs([first, second])
+    assert len(graph['nodes']) == 4 and len(graph['edges']) == 2
+    assert repairs == {}
@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+
+import pytest
+
+from src.backend.metrics import Registry
+
+
+def make_registry(path=None):
+    registry = Registry(path, flush_interval=60)
+    requests = registry.counter('test_requests_total', 'Requests', ['route'])
+    seconds = registry.histogram('test_seconds', 'Latency', buckets=(0.1, 1.0))
+    return registry, requests, seconds
+
+
+def sample(text, line):
+    return next(float(row.rsplit(' ', 1)[1]) for row in text.splitlines() if row.startswith(line + ' '))
+
+
+def test_single_process_render():
+    registry, requests, seconds = make_registry()
+    requests.inc('/a')
+    requests.inc('/a')
+    seconds.observe(0.5)
+    text = registry.render()
+    assert '# TYPE test_requests_total counter' in text
+    assert sample(text, 'test_requests_total{route="/a"}') == 2
+    assert sample(text, 'test_seconds_bucket{le="0.1"}') == 0
+    assert sample(text, 'test_seconds_bucket{le="1"}') == 1
+    assert sample(text, 'test_seconds_count') == 1
+
+
+@pytest.fixture
+def fork():
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        pytest.skip("needs fork, like gunicorn's workers")
+    return multiprocessing.get_context('fork')
+
+
+def run_worker(registry, requests, seconds):
+    registry.start_flushing()
+    requests.inc('/a', amount=3)
+    seconds.observe(2.0)
+    registry.flush()
+
+
+def test_render_adds_up_every_worker(tmp_path, fork):
+    registry, requests, seconds = make_registry(str(tmp_path))
+    worker = fork.Process(target=run_worker, args=(registry, requests, seconds))
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 0
+
+    registry.start_flushing()
+    requests.inc('/a')
+    text = registry.render()
+    assert sample(text, 'test_requests_total{route="/a"}') == 4
+    assert sample(text, 'test_seconds_bucket{le="+Inf"}') == 1
+    # Rendering doesn't change this process's own samples
+    assert requests.value('/a') == 1
+
+    # The exited worker's file is folded in, and its counts stay
+    registry.mark_process_dead(worker.pid)
+    assert not os.path.exists(tmp_path / f'metrics-{worker.pid}.json')
+    assert sorted(os.listdir(tmp_path)) == ['exited.json', f'metrics-{os.getpid()}.json']
+    text = registry.render()
+    assert sample(text, 'test_requests_total{route="/a"}') == 4
+    assert sample(text, 'test_seconds_sum') == 2
+
+    registry.clear()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,164 @@
+import asyncio
+import time
+
+import pytest
+
+from src.backend.providers import LLMProvider, ResilientProvider
+from src.backend.resilience import CircuitBreaker, CircuitOpenError, UpstreamError
+
+
+class Outage(RuntimeError):
+    transient = True
+
+
+class ScriptedProvider(LLMProvider):
+    """Answers 'ok', fails while ``failing`` is set, or hangs while ``hanging`` is set"""
+
+    name = 'scripted'
+
+    def __init__(self):
+        self.failing = False
+        self.hanging = False
+        self.calls = 0
+
+    def generate(self, prompt, schema=None):
+        self.calls += 1
+        if self.failing:
+            raise Outage("down")
+        return 'ok'
+
+    async def generate_async(self, prompt, schema=None):
+        self.calls += 1
+        if self.hanging:
+            await asyncio.Event().wait()
+        if self.failing:
+            raise Outage("down")
+        return 'ok'
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_threshold_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert 0 < breaker.retry_after() <= 60
+    assert breaker.stats() == {'state': 'open', 'consecutive_failures': 3, 'opens': 1}
+
+
+def test_breaker_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    open_breaker(breaker)
+    time.sleep(0.02)
+    assert breaker.state == 'half_open'
+    assert breaker.admit()
+    assert breaker.admit() is None
+
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.admit() == 0
+
+
+def test_failed_probe_opens_breaker_again():
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0.01)
+    open_breaker(breaker)
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.stats()['opens'] == 2
+
+
+def test_release_frees_only_its_own_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    closed_ticket = breaker.admit()
+    open_breaker(breaker)
+    time.sleep(0.02)
+    probe = breaker.admit()
+
+    # A call admitted while closed must not give away someone else's probe
+    breaker.release(closed_ticket)
+    assert not breaker.allow()
+    breaker.release(probe)
+    assert breaker.allow()
+
+
+def test_provider_opens_circuit_and_recovers():
+    inner = ScriptedProvider()
+    provider = ResilientProvider(inner, max_attempts=1, breaker_threshold=2, breaker_reset=0.01)
+    inner.failing = True
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            provider.generate('prompt')
+    calls = inner.calls
+    with pytest.raises(CircuitOpenError):
+        provider.generate('prompt')
+    assert inner.calls == calls
+
+    time.sleep(0.02)
+    inner.failing = False
+    assert provider.generate('prompt') == 'ok'
+    assert provider.breaker.state == 'closed'
+
+
+def test_cancelled_probe_does_not_wedge_breaker():
+    inner = ScriptedProvider()
+    provider = ResilientProvider(inner, breaker_threshold=1, breaker_reset=0.01)
+    open_breaker(provider.breaker)
+
+    async def run():
+        await asyncio.sleep(0.02)
+        inner.hanging = True
+        probe = asyncio.ensure_future(provider.generate_async('prompt'))
+        await asyncio.sleep(0.01)
+        assert provider.breaker.state == 'half_open'
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        inner.hanging = False
+        return await provider.generate_async('prompt')
+
+    assert asyncio.run(run()) == 'ok'
+    assert provider.breaker.state == 'closed'
+
+
+def test_cancelled_stream_probe_does_not_wedge_breaker():
+    inner = ScriptedProvider()
+    provider = ResilientProvider(inner, breaker_threshold=1, breaker_reset=0.01)
+    open_breaker(provider.breaker)
+
+    async def consume():
+        return ''.join([piece async for piece in provider.stream_async('prompt')])
+
+    async def run():
+        await asyncio.sleep(0.02)
+        inner.hanging = True
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(consume(), 0.01)
+
+        inner.hanging = False
+        return await consume()
+
+    assert asyncio.run(run()) == 'ok'
+
+
+def test_cors_exposes_resilience_headers(client):
+    response = client.get('/api/jobs/nope', headers={'Origin': 'http://localhost:3000'})
+    exposed = {h.strip().lower() for h in response.headers['Access-Control-Expose-Headers'].split(',')}
+    assert {'x-degraded', 'server-timing', 'retry-after', 'etag'} <= exposed
@@ -0,0 +1,111 @@
+import os
+import time
+
+import pytest
+
+from src.backend.semantic import HashingEmbedder, SemanticIndex, topic_markers
+
+
+def saved(index, path):
+    index.maybe_save(force=True)
+    # The first add saves in the background
+    deadline = time.monotonic() + 5
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def index():
+    return SemanticIndex(HashingEmbedder(), threshold=0.9)
+
+
+@pytest.mark.parametrize('cached, requested', [
+    ('C', 'C++'),
+    ('C', 'C#'),
+    ('C++', 'C#'),
+    ('Spanish', 'Spanish 101'),
+    ('World War I', 'World War II'),
+    ('Python 2', 'Python 3'),
+    ('Vitamin A', 'Vitamin'),
+])
+def test_topics_that_differ_in_a_marker_never_match(index, cached, requested):
+    index.add(cached, 5, 'cached')
+    assert index.search(requested, 5) is None
+    index.add(requested, 5, 'requested')
+    assert index.search(requested, 5).cache_key == 'requested'
+    assert index.search(cached, 5).cache_key == 'cached'
+
+
+@pytest.mark.parametrize('cached, requested', [
+    ('Introduction to Machine Learning', 'machine learning basics'),
+    ('C++', 'Intro to C++'),
+    ('Spanish 101', 'spanish 101 fundamentals'),
+])
+def test_rewordings_match(index, cached, requested):
+    index.add(cached, 5, 'cached')
+    match = index.search(requested, 5)
+    assert match is not None and match.cache_key == 'cached'
+    assert index.search(requested, 6) is None
+
+
+def test_a_closer_topic_with_other_markers_does_not_hide_a_match(index):
+    index.add('C++ programming', 5, 'c++')
+    index.add('C programming', 5, 'c')
+    assert index.search('Intro to C++ programming', 5).cache_key == 'c++'
+    assert index.search('C programming basics', 5).cache_key == 'c'
+
+
+def test_markers_survive_a_reload(tmp_path):
+    path = str(tmp_path / 'index.npz')
+    index = SemanticIndex(HashingEmbedder(), path, threshold=0.9)
+    index.add('C', 5, 'c')
+    saved(index, path)
+    reloaded = SemanticIndex(HashingEmbedder(), path, threshold=0.9)
+    assert reloaded.search('C#', 5) is None
+    assert reloaded.search('Intro to C', 5).cache_key == 'c'
+
+
+def test_topic_markers():
+    assert topic_markers('Intro to C++') == 'c++'
+    assert topic_markers('A Primer on World War II') == 'ii'
+    assert topic_markers('Machine Learning') == ''
+
+
+def test_generate_does_not_serve_another_languages_graph(client):
+    response = client.post('/api/word-graph/generate', json={'topic': 'C', 'num_words': 3})
+    assert response.status_code == 200
+    for topic in ('C++', 'C#'):
+        response = client.post('/api/word-graph/generate', json={'topic': topic, 'num_words': 3})
+        assert response.status_code == 200
+        assert response.headers['X-Cache'] == 'MISS'
+    response = client.post('/api/word-graph/generate', json={'topic': 'Intro to C#', 'num_words': 3})
+    assert response.headers.get('X-Cache-Tier') == 'semantic'
+
+
+def test_detail_levels(index, tmp_path):
+    index.add('Machine Learning', 5, 'skeleton', 'skeleton')
+    assert index.search('machine learning basics', 5) is None
+    assert index.search('machine learning basics', 5, 'skeleton').cache_key == 'skeleton'
+    index.add('Deep Learning', 5, 'full')
+    assert index.search('deep learning basics', 5, 'skeleton').cache_key == 'full'
+
+    path = str(tmp_path / 'index.npz')
+    skeletons = SemanticIndex(HashingEmbedder(), path, threshold=0.9)
+    skeletons.add('Machine Learning', 5, 'skeleton', 'skeleton')
+    saved(skeletons, path)
+    reloaded = SemanticIndex(HashingEmbedder(), path, threshold=0.9)
+    assert reloaded.search('Intro to Machine Learning', 5) is None
+    assert reloaded.search('Intro to Machine Learning', 5, 'skeleton').cache_key == 'skeleton'
+
+
+def test_skeleton_generate_is_reused_for_a_reworded_topic(client):
+    body = {'topic': 'Skeleton Thermodynamics', 'num_words': 4, 'detail': 'skeleton'}
+    response = client.post('/api/word-graph/generate', json=body)
+    assert response.headers['X-Cache'] == 'MISS'
+    response = client.post('/api/word-graph/generate', json=dict(body, topic='intro to skeleton thermodynamics'))
+    assert response.headers.get('X-Cache-Tier') == 'semantic'
+    assert all(node['data']['detailsLoaded'] is False for node in response.get_json()['nodes'])
+    # A full request never gets the skeleton
+    response = client.post('/api/word-graph/generate',
+                           json=dict(body, detail='full', topic='skeleton thermodynamics basics'))
+    assert response.headers['X-Cache'] == 'MISS'
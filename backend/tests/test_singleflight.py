@@ -0,0 +1,46 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.backend.metrics import coalesced_total
+from src.backend.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_joining_callers_are_counted_by_flight():
+    flight = SingleFlight('test-sync')
+    before = coalesced_total.value('test-sync')
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+        return 'graph'
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        leader = executor.submit(flight.do, 'key', work)
+        assert started.wait(5)
+        followers = [executor.submit(flight.do, 'key', work) for _ in range(2)]
+        while flight.stats()['coalesced'] < 2:
+            threading.Event().wait(0.01)
+        release.set()
+        assert leader.result() == ('graph', False)
+        assert [follower.result() for follower in followers] == [('graph', True)] * 2
+
+    assert coalesced_total.value('test-sync') - before == 2
+    assert flight.do('key', lambda: 'again') == ('again', False)
+    assert coalesced_total.value('test-sync') - before == 2
+
+
+def test_async_joining_callers_are_counted_by_flight():
+    flight = AsyncSingleFlight('test-async')
+    before = coalesced_total.value('test-async')
+
+    async def work():
+        await asyncio.sleep(0.01)
+        return 'graph'
+
+    async def main():
+        return await asyncio.gather(*(flight.do('key', work) for _ in range(3)))
+
+    assert asyncio.run(main()) == [('graph', False), ('graph', True), ('graph', True)]
+    assert coalesced_total.value('test-async') - before == 2
@@ -0,0 +1,72 @@
+import json
+
+from src.backend.providers import sample_words
+from src.backend.streaming import WordStreamParser, sse_event
+
+WORDS = [
+    {"term": "Braces {in} [strings]", "summary": 'A "quoted" } and \\ backslash', "related_concepts": []},
+    {"term": "Nested", "examples": [{"text": "inner {}"}, ["x", "]"]], "related_concepts": ["Last"]},
+    {"term": "Last", "summary": "Unicode: café → done"},
+]
+RESPONSE = json.dumps({"words": WORDS}, ensure_ascii=False)
+
+
+def feed_all(parser, pieces):
+    return [word for piece in pieces for word in parser.feed(piece)]
+
+
+def test_whole_response():
+    parser = WordStreamParser()
+    assert feed_all(parser, [RESPONSE]) == WORDS
+    assert parser.words_found == 3
+    assert parser.complete
+
+
+def test_any_split_gives_the_same_words():
+    for split in range(1, len(RESPONSE)):
+        parser = WordStreamParser()
+        assert feed_all(parser, [RESPONSE[:split], RESPONSE[split:]]) == WORDS, split
+
+
+def test_one_character_at_a_time():
+    parser = WordStreamParser()
+    assert feed_all(parser, RESPONSE) == WORDS
+    assert parser.buffer == RESPONSE
+
+
+def test_words_arrive_before_the_document_ends():
+    parser = WordStreamParser()
+    first_end = RESPONSE.index('"Nested"')
+    assert [word['term'] for word in parser.feed(RESPONSE[:first_end])] == [WORDS[0]['term']]
+    assert not parser.complete
+    assert [word['term'] for word in parser.feed(RESPONSE[first_end:])] == ['Nested', 'Last']
+
+
+def test_code_fence_and_trailing_text_are_ignored():
+    parser = WordStreamParser()
+    pieces = ['```json\n', RESPONSE[:40], RESPONSE[40:], '\n```\n{"words": [{"term": "After"}]}']
+    assert feed_all(parser, pieces) == WORDS
+
+
+def test_only_the_top_level_words_array_is_read():
+    response = json.dumps({
+        "topic": "words",
+        "meta": {"words": [{"term": "Nested words key"}]},
+        "words": [{"term": "Real"}, {"no_term": True}, {"term": "Also real", "words": [{"term": "Inner"}]}],
+        "extra": [{"term": "Other array"}],
+    })
+    parser = WordStreamParser()
+    assert [word['term'] for word in feed_all(parser, response)] == ['Real', 'Also real']
+    assert parser.words_found == 2
+
+
+def test_matches_sample_graph():
+    words = sample_words('Streaming', num_words=6)
+    response = json.dumps({"words": words}, indent=2)
+    parser = WordStreamParser()
+    pieces = [response[i:i + 7] for i in range(0, len(response), 7)]
+    assert feed_all(parser, pieces) == words
+
+
+def test_sse_event():
+    assert sse_event('node', {'id': 'node-0'}) == 'event: node\ndata: {"id": "node-0"}\n\n'
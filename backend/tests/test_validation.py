@@ -0,0 +1,125 @@
+import random
+
+from src.backend.validation import find_back_edges, parse_model_json, repair_words
+
+
+def is_dag(adjacency):
+    indegree = [0] * len(adjacency)
+    for targets in adjacency:
+        for w in targets:
+            indegree[w] += 1
+    ready = [v for v, d in enumerate(indegree) if d == 0]
+    seen = 0
+    while ready:
+        v = ready.pop()
+        seen += 1
+        for w in adjacency[v]:
+            indegree[w] -= 1
+            if indegree[w] == 0:
+                ready.append(w)
+    return seen == len(adjacency)
+
+
+def word(term, *related):
+    return {'term': term, 'related_concepts': list(related)}
+
+
+def edges_of(words):
+    return {(entry['term'], target) for entry in words for target in entry['related_concepts']}
+
+
+def check_repaired(words, single_goal=True):
+    """The repaired graph is a weakly connected DAG whose edges name its nodes"""
+    index = {entry['term']: i for i, entry in enumerate(words)}
+    adjacency = [[index[target] for target in entry['related_concepts']] for entry in words]
+    assert is_dag(adjacency)
+    sinks = [v for v, targets in enumerate(adjacency) if not targets]
+    if single_goal:
+        assert len(sinks) == 1
+    neighbours = [set() for _ in words]
+    for v, targets in enumerate(adjacency):
+        for w in targets:
+            neighbours[v].add(w)
+            neighbours[w].add(v)
+    reached, stack = {0}, [0]
+    while stack:
+        for w in neighbours[stack.pop()] - reached:
+            reached.add(w)
+            stack.append(w)
+    assert len(reached) == len(words)
+
+
+def test_find_back_edges_leaves_a_dag():
+    rng = random.Random(5)
+    for _ in range(50):
+        n = rng.randint(1, 30)
+        adjacency = [[w for w in range(n) if w != v and rng.random() < 0.15] for v in range(n)]
+        back_edges = find_back_edges(adjacency)
+        assert back_edges <= {(v, w) for v in range(n) for w in adjacency[v]}
+        assert is_dag([[w for w in adjacency[v] if (v, w) not in back_edges] for v in range(n)])
+
+
+def test_find_back_edges_of_a_dag_is_empty():
+    assert find_back_edges([[1, 2], [2], []]) == set()
+    assert find_back_edges([]) == set()
+
+
+def test_cycle_edge_back_into_the_path_is_removed():
+    words, repairs = repair_words([word('A', 'B'), word('B', 'C'), word('C', 'A', 'D'), word('D')])
+    assert edges_of(words) == {('A', 'B'), ('B', 'C'), ('C', 'D')}
+    assert repairs == {'removed_cycle_edges': 1}
+
+
+def test_entries_are_cleaned_and_merged():
+    words, repairs = repair_words([
+        word('Alpha', 'beta', 'Nowhere', 'alpha'),
+        {'summary': 'no term'},
+        'not a dict',
+        word('Beta', 'Gamma'),
+        word(' ALPHA ', 'Gamma'),
+        {'term': 'Gamma', 'related_concepts': 'Gamma', 'examples': 'one example'},
+    ])
+    assert [entry['term'] for entry in words] == ['Alpha', 'Beta', 'Gamma']
+    assert words[0]['related_concepts'] == ['Beta', 'Gamma']
+    assert words[2]['examples'] == ['one example']
+    assert words[2]['summary'] == ''
+    assert repairs == {'invalid_entries': 2, 'merged_duplicates': 1, 'dangling_references': 1,
+                       'self_references': 2}
+
+
+def test_sinks_and_components_are_linked_to_one_goal():
+    words, repairs = repair_words([word('A', 'B'), word('B'), word('C'), word('D', 'E'), word('E')])
+    check_repaired(words)
+    assert repairs == {'disconnected_components': 2, 'linked_to_goal': 2}
+
+    words, repairs = repair_words([word('A', 'B'), word('B'), word('C', 'B'), word('D', 'E'), word('E')],
+                                  single_goal=False)
+    check_repaired(words, single_goal=False)
+    assert edges_of(words) == {('A', 'B'), ('C', 'B'), ('D', 'E'), ('E', 'B')}
+
+
+def test_given_goal_becomes_the_only_sink():
+    words, repairs = repair_words([word('A', 'B'), word('B', 'A'), word('C')], goal='a')
+    check_repaired(words)
+    assert words[0]['related_concepts'] == []
+    assert repairs['goal_edges_removed'] == 1
+
+
+def test_random_model_output_is_repaired():
+    rng = random.Random(9)
+    for _ in range(100):
+        n = rng.randint(1, 25)
+        terms = [f"Term {i}" for i in range(n)]
+        candidates = terms + ['Missing']
+        raw = [word(rng.choice(terms), *rng.sample(candidates, rng.randint(0, min(4, n + 1)))) for _ in range(n)]
+        single_goal = rng.random() < 0.5
+        words, _ = repair_words(raw, single_goal=single_goal)
+        check_repaired(words, single_goal)
+        # Deterministic: the same input always gets the same graph
+        assert repair_words(raw, single_goal=single_goal)[0] == words
+
+
+def test_parse_model_json_tolerates_fences_commas_and_truncation():
+    assert parse_model_json('Sure!\n```json\n{"words": [{"term": "A"},],}\n```') == {'words': [{'term': 'A'}]}
+    truncated = '{"topic": "Caf\\u00e9", "words": [{"term": "A"}, {"term": "B", "summary": "cut o'
+    assert parse_model_json(truncated) == {'words': [{'term': 'A'}], 'topic': 'Café'}
@@ -0,0 +1,154 @@
+import io
+import json
+
+import pytest
+
+from src.backend import word_graph
+from src.backend.api import GENERATE_MAX_WORDS, PROMPT_VERSION
+from src.backend.cache import make_cache_key, normalize_topic
+from src.backend.expansion import EXPAND_MAX_WORDS
+
+
+@pytest.fixture
+def no_model(monkeypatch):
+    def get_provider():
+        raise AssertionError("the model must not be called")
+    monkeypatch.setattr(word_graph, 'get_provider', get_provider)
+
+
+@pytest.mark.parametrize('num_words', [None, 'abc', 0, -3, 2.5, True, [5], GENERATE_MAX_WORDS + 1])
+def test_invalid_num_words_is_rejected_before_the_cache(client, no_model, num_words):
+    topic = f"Invalid num_words {num_words!r}"
+    for _ in range(2):
+        response = client.post('/api/word-graph/generate', json={'topic': topic, 'num_words': num_words})
+        assert response.status_code == 400
+        assert 'num_words' in response.get_json()['error']
+    key = make_cache_key(normalize_topic(topic), num_words, PROMPT_VERSION)
+    assert word_graph.graph_cache.get(key) is None
+
+    response = client.post('/api/word-graph/generate/stream', json={'topic': topic, 'num_words': num_words})
+    assert response.status_code == 400
+    response = client.post('/api/word-graph/batch', json={'topics': [topic], 'num_words': num_words})
+    assert response.status_code == 400
+
+
+def test_numeric_string_num_words_is_accepted(client):
+    response = client.post('/api/word-graph/generate', json={'topic': 'String num_words', 'num_words': '4'})
+    assert response.status_code == 200
+    assert response.headers['X-Cache'] == 'MISS'
+    response = client.post('/api/word-graph/generate', json={'topic': 'String num_words', 'num_words': 4})
+    assert response.headers['X-Cache'] == 'HIT'
+
+
+def test_invalid_topic_is_rejected(client, no_model):
+    response = client.post('/api/word-graph/generate', json={'topic': 42})
+    assert response.status_code == 400
+
+
+def test_async_app_rejects_invalid_num_words(monkeypatch):
+    import asyncio
+    pytest.importorskip('quart')
+    from src.backend import async_word_graph
+    from src.backend.asgi import create_app
+
+    def get_provider():
+        raise AssertionError("the model must not be called")
+    monkeypatch.setattr(async_word_graph, 'get_provider', get_provider)
+
+    async def post(path, body):
+        response = await create_app(warm_up=False).test_client().post(path, json=body)
+        return response.status_code
+
+    for path in ('/api/word-graph/generate', '/api/word-graph/generate/stream'):
+        assert asyncio.run(post(path, {'topic': 'Async num_words', 'num_words': None})) == 400
+
+
+@pytest.mark.parametrize('num_words', [True, None, 0, '11x', EXPAND_MAX_WORDS + 1])
+def test_invalid_expand_num_words_is_rejected(client, num_words):
+    response = client.post('/api/word-graph/generate', json={'topic': 'Expand num_words'})
+    graph = response.get_json()
+    response = client.post(f"/api/word-graph/{graph['graphId']}/expand",
+                           json={'node_id': graph['nodes'][0]['id'], 'num_words': num_words})
+    assert response.status_code == 400
+    assert str(EXPAND_MAX_WORDS) in response.get_json()['error']
+
+
+def test_upload_prompt_asks_for_num_words_from_the_whole_document(client, monkeypatch):
+    content = ' '.join(f"Paragraph {i} about heat engines." for i in range(400))
+    assert len(content) > 4000
+    monkeypatch.setattr(word_graph, 'extract_chunks', lambda data, file_ext, digest: ([content], None))
+    prompts = []
+    build_upload_prompt = word_graph.build_upload_prompt
+    monkeypatch.setattr(word_graph, 'build_upload_prompt',
+                        lambda *args: prompts.append(build_upload_prompt(*args)) or prompts[-1])
+
+    response = client.post('/api/word-graph/upload', content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(b'%PDF prompt'), 'notes.pdf'), 'topic': 'Heat engines',
+                                 'num_words': '7'})
+    assert response.status_code == 200
+    assert 'generate 7 key concepts' in prompts[0]
+    assert content in prompts[0]
+
+
+class CyclicProvider:
+    """Streams a response with a cycle, which the stored graph must not keep"""
+
+    response = json.dumps({'words': [
+        {'term': 'Alpha', 'related_concepts': ['Beta']},
+        {'term': 'Beta', 'related_concepts': ['Gamma']},
+        {'term': 'Gamma', 'related_concepts': ['Alpha']},
+    ]})
+
+    def stream(self, prompt, schema=None):
+        yield from (self.response[i:i + 16] for i in range(0, len(self.response), 16))
+
+    async def stream_async(self, prompt, schema=None):
+        for piece in self.stream(prompt, schema):
+            yield piece
+
+
+def sse_events(text):
+    events = []
+    for block in text.strip().split('\n\n'):
+        name, data = block.split('\n', 1)
+        events.append((name[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+def check_stream(events, stored):
+    names = [name for name, _ in events]
+    assert names.count('node') == 3 and names[-2:] == ['layout', 'done']
+    layout, done = events[-2][1], events[-1][1]
+    assert done['repairs'] == {'removed_cycle_edges': 1}
+    assert done['edges'] == 2 and done['analytics']['acyclic']
+    assert layout == {node['id']: node['position'] for node in stored['nodes']}
+    assert len(stored['edges']) == 2
+
+
+def test_stream_stores_the_repaired_graph(client, monkeypatch):
+    monkeypatch.setattr(word_graph, 'get_provider', CyclicProvider)
+    response = client.post('/api/word-graph/generate/stream', json={'topic': 'Stored stream'})
+    assert 'cache;' in response.headers['Server-Timing']
+    events = sse_events(response.get_data(as_text=True))
+    stored = client.get(f"/api/word-graph/{events[-1][1]['graphId']}")
+    assert stored.status_code == 200
+    check_stream(events, stored.get_json())
+
+
+def test_async_stream_stores_the_repaired_graph(monkeypatch):
+    import asyncio
+    pytest.importorskip('quart')
+    from src.backend import async_word_graph
+    from src.backend.asgi import create_app
+
+    monkeypatch.setattr(async_word_graph, 'get_provider', CyclicProvider)
+
+    async def stream():
+        client = create_app(warm_up=False).test_client()
+        response = await client.post('/api/word-graph/generate/stream', json={'topic': 'Async stored stream'})
+        events = sse_events(await response.get_data(as_text=True))
+        stored = await client.get(f"/api/word-graph/{events[-1][1]['graphId']}")
+        assert stored.status_code == 200
+        return events, await stored.get_json()
+
+    check_stream(*asyncio.run(stream()))
@@ -108,6 +108,19 @@ const getLayoutedElements = (nodes: Node[], edges: Edge[], direction = 'LR') =>
   return { layoutedNodes, layoutedEdges: edges };
 };
 
+// Helper function to use positions the backend already computed
+const getServerLayoutedElements = (nodes: Node[], edges: Edge[]) => {
+  const layoutedNodes = nodes.map((node) => ({
+    ...node,
+    type: "WordNode",
+    targetPosition: Position.Left,
+    sourcePosition: Position.Right,
+    width: Math.max(estimateTextWidth(node.data?.label || ''), 100),
+  }));
+
+  return { layoutedNodes, layoutedEdges: edges };
+};
+
 // Custom node component
 // const ExpandedNode = ({ data }: { data: { label: string; summary: string; description: string; relatedTopics: string[]; examples: string[] } }) => {
 //   return (
@@ -167,7 +180,7 @@ const WordNode = ({ data, selected }: { data: { label: string; summary: string }
         <div className="font-medium text-base tracking-wide text-center whitespace-nowrap" style={{ color: selected ? '#fff' : COLORS.text }}>
           {data.label}
         </div>
-        {isHovered && (
+        {isHovered && data.summary && (
           <div 
             className="text-xs mt-2 leading-relaxed transition-opacity duration-300 opacity-100"
             style={{ 
@@ -314,7 +327,9 @@ const DetailPanel = ({ node, onClose }: { node: Node | null; onClose: () => void
             </svg>
             Description
           </h3>
-          <p className="text-sm leading-relaxed" style={{ lineHeight: '1.6' }}>{node.data.description}</p>
+          <p className="text-sm leading-relaxed" style={{ lineHeight: '1.6' }}>
+            {node.data.detailsLoaded === false ? 'Loading details...' : node.data.description}
+          </p>
         </div>
         
         <div>
@@ -375,14 +390,145 @@ const edgeTypes = {
   'relationship': RelationshipEdge,
 };
 
+// Response of the node details endpoint, for nodes of skeleton graphs
+interface NodeDetailsResponse {
+  nodeId: string;
+  summary: string;
+  description: string;
+  examples: string[];
+  detailsLoaded: boolean;
+}
+
+// Result of a finished upload job; the graph itself is fetched from the graph store
+interface UploadJobResult {
+  graphId: string;
+  topic?: string;
+}
+
+// 202 response of an upload job; only the async backend sends eventsUrl
+interface UploadJob {
+  jobId: string;
+  statusUrl: string;
+  eventsUrl?: string;
+}
+
+// How often a job's status is polled, and how many failed polls in a row are tolerated
+const JOB_POLL_MS = 1000;
+const JOB_POLL_MAX_FAILURES = 5;
+
+// What the backend is doing while an upload job runs, by job stage
+const JOB_STAGE_LABELS: {[stage: string]: string} = {
+  extract: 'Reading your document',
+  partition: 'Reading your document',
+  prompt: 'Finding the key concepts',
+  llm: 'Finding the key concepts',
+  parse: 'Building your map',
+  validate: 'Building your map',
+  edges: 'Building your map',
+  layout: 'Building your map',
+  analytics: 'Building your map',
+  store: 'Building your map',
+};
+
+// Poll an upload job's status until it finishes
+const pollJob = async (statusUrl: string, onStage: (stage: string) => void): Promise<UploadJobResult> => {
+  let failures = 0;
+  for (;;) {
+    try {
+      const response = await fetch(`${BACKEND_HOST}${statusUrl}`);
+      if (response.status === 404) {
+        throw new Error('Lost track of the upload');
+      }
+      if (response.ok) {
+        failures = 0;
+        const job = await response.json();
+        if (job.stage) {
+          onStage(job.stage);
+        }
+        if (job.status === 'done') {
+          return job.result;
+        }
+        if (job.status === 'failed') {
+          throw new Error(job.error || 'Processing the document failed');
+        }
+      } else if (++failures >= JOB_POLL_MAX_FAILURES) {
+        throw new Error('Lost track of the upload');
+      }
+    } catch (err) {
+      // fetch rejects on network errors; ride out a few of them
+      if (!(err instanceof TypeError) || ++failures >= JOB_POLL_MAX_FAILURES) {
+        throw err;
+      }
+    }
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_MS));
+  }
+};
+
+// Follow an upload job until it finishes: through its progress events when
+// the backend serves them, otherwise by polling its status
+const waitForJob = (job: UploadJob, onStage: (stage: string) => void): Promise<UploadJobResult> => {
+  if (!job.eventsUrl) {
+    return pollJob(job.statusUrl, onStage);
+  }
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${BACKEND_HOST}${job.eventsUrl}`);
+    source.addEventListener('status', (event) => {
+      const status = JSON.parse((event as MessageEvent).data);
+      if (status.stage) {
+        onStage(status.stage);
+      }
+    });
+    source.addEventListener('done', (event) => {
+      source.close();
+      resolve(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('error', (event) => {
+      const data = (event as MessageEvent).data;
+      if (data) {
+        // The job failed: an error event sent by the backend
+        source.close();
+        reject(new Error(JSON.parse(data).error));
+      } else if (source.readyState === EventSource.CLOSED) {
+        // The browser gave up on the stream; the status endpoint still knows
+        pollJob(job.statusUrl, onStage).then(resolve, reject);
+      }
+      // Otherwise the connection dropped and EventSource is reconnecting
+    });
+  });
+};
+
+// Learning paths the backend computes for every graph
+interface GraphAnalytics {
+  order: string[];
+  levels: {[nodeId: string]: number};
+  sources: string[];
+  goal: string | null;
+  criticalPath: string[];
+  // Hex bitmask per node; bit i is nodes[i]
+  prerequisites: {[nodeId: string]: string};
+  acyclic: boolean;
+}
+
+// Response of the generate, upload and stored-graph endpoints
+interface GraphResponse {
+  nodes: Node[];
+  edges: Edge[];
+  layout?: string;
+  topic?: string;
+  graphId?: string;
+  analytics?: GraphAnalytics;
+}
+
 const WordGraph = () => {
   const [nodes, setNodes, onNodesChange] = useNodesState([]);
   const [edges, setEdges, onEdgesChange] = useEdgesState([]);
   const [selectedNode, setSelectedNode] = useState<Node | null>(null);
   const [loading, setLoading] = useState(false);
+  const [progress, setProgress] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
   const [topic, setTopic] = useState('');
   const [uploadedFile, setUploadedFile] = useState<File | null>(null);
+  const [graphId, setGraphId] = useState<string | null>(null);
 
   const handleFileUpload = (e: React.ChangeEvent<HTMLInputElement>) => {
     if (e.target.files && e.target.files.length > 0) {
@@ -399,6 +545,85 @@ const WordGraph = () => {
     }
   };
 
+  const showGraph = (data: GraphResponse) => {
+    // Uploads without a topic come back with the one the backend inferred
+    if (!topic && data.topic) {
+      setTopic(data.topic);
+    }
+    
+    // Debug the edges data coming from backend
+    console.log("Received edges from backend:", data.edges);
+    
+    // Process the edges to add the custom type
+    const processedEdges = data.edges.map((edge: Edge) => ({
+      ...edge,
+      //type: 'relationship', // Always use our custom relationship type
+      // Remove any existing type property that might conflict
+      animated: true,
+      markerEnd: {
+        type: MarkerType.ArrowClosed,
+        width: 14,
+        height: 14, 
+        color: COLORS.accent,
+      },
+      style: {
+        strokeWidth: 5, 
+        stroke: COLORS.accent,
+        opacity: 0.85,
+        strokeDasharray: '8,8',
+      },
+      // Adjust how edges connect to nodes
+      targetHandle: 'target',
+      sourceHandle: 'source',
+      // Ensure there's space at the end for the arrow
+      targetDistance: 10,
+    }));
+    
+    console.log("Processed edges:", processedEdges);
+    
+    // The backend lays out the graph itself; fall back to dagre otherwise
+    const result = data.layout === 'layered'
+      ? getServerLayoutedElements(data.nodes, processedEdges)
+      : getLayoutedElements(
+          data.nodes,
+          processedEdges,
+          'LR' // Left to right direction
+        );
+    
+    console.log("Final edges after layout:", result.layoutedEdges);
+    
+    setNodes(result.layoutedNodes);
+    setEdges(result.layoutedEdges);
+
+    setGraphId(data.graphId || null);
+
+    // Put the graph's ID in the URL so a reload or shared link reopens the stored graph
+    if (data.graphId) {
+      window.history.replaceState(null, '', `?graph=${encodeURIComponent(data.graphId)}`);
+    }
+  };
+
+  // Reopen a stored graph; the browser revalidates its cached copy with If-None-Match
+  useEffect(() => {
+    const graphId = new URLSearchParams(window.location.search).get('graph');
+    if (!graphId) {
+      return;
+    }
+    setLoading(true);
+    fetch(`${BACKEND_HOST}/api/word-graph/${encodeURIComponent(graphId)}`)
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error('Could not load the saved graph');
+        }
+        return response.json();
+      })
+      .then(showGraph)
+      .catch((err) => setError(err instanceof Error ? err.message : 'An error occurred'))
+      .finally(() => setLoading(false));
+    // Only on first load
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, []);
+
   const generateGraph = async () => {
     try {
       setLoading(true);
@@ -414,11 +639,19 @@ const WordGraph = () => {
           formData.append('topic', topic);
         }
 
-        // Send file to the file upload endpoint
-        response = await fetch(`${BACKEND_HOST}/api/word-graph/upload`, {
+        // Send file to the file upload endpoint as a background job, so
+        // the request returns right away; then follow the job's progress
+        response = await fetch(`${BACKEND_HOST}/api/word-graph/upload?job=1`, {
           method: 'POST',
           body: formData,
         });
+        if (response.status === 202) {
+          const job: UploadJob = await response.json();
+          const result = await waitForJob(job, setProgress);
+          response = await fetch(`${BACKEND_HOST}/api/word-graph/${encodeURIComponent(result.graphId)}`);
+        } else if (response.status === 503) {
+          throw new Error('The server is busy processing other documents. Please try again in a moment.');
+        }
       } else {
         // Text-based topic query
         response = await fetch(`${BACKEND_HOST}/api/word-graph/generate`, {
@@ -426,9 +659,11 @@ const WordGraph = () => {
           headers: {
             'Content-Type': 'application/json',
           },
+          // Terms and edges only, so the graph renders sooner; details load per node on click
           body: JSON.stringify({
             topic,
             num_words: 5,
+            detail: 'skeleton',
           }),
         });
       }
@@ -437,59 +672,42 @@ const WordGraph = () => {
         throw new Error('Failed to generate word graph');
       }
 
-      const data = await response.json();
-      
-      // Debug the edges data coming from backend
-      console.log("Received edges from backend:", data.edges);
-      
-      // Process the edges to add the custom type
-      const processedEdges = data.edges.map((edge: Edge) => ({
-        ...edge,
-        //type: 'relationship', // Always use our custom relationship type
-        // Remove any existing type property that might conflict
-        animated: true,
-        markerEnd: {
-          type: MarkerType.ArrowClosed,
-          width: 14,
-          height: 14, 
-          color: COLORS.accent,
-        },
-        style: {
-          strokeWidth: 5, 
-          stroke: COLORS.accent,
-          opacity: 0.85,
-          strokeDasharray: '8,8',
-        },
-        // Adjust how edges connect to nodes
-        targetHandle: 'target',
-        sourceHandle: 'source',
-        // Ensure there's space at the end for the arrow
-        targetDistance: 10,
-      }));
-      
-      console.log("Processed edges:", processedEdges);
-      
-      // Apply dagre layout instead of circular layout
-      const result = getLayoutedElements(
-        data.nodes,
-        processedEdges,
-        'LR' // Left to right direction
-      );
-      
-      console.log("Final edges after layout:", result.layoutedEdges);
-      
-      setNodes(result.layoutedNodes);
-      setEdges(result.layoutedEdges);
+      showGraph(await response.json());
     } catch (err) {
       setError(err instanceof Error ? err.message : 'An error occurred');
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
   const onNodeClick = useCallback((_: React.MouseEvent, node: Node) => {
     setSelectedNode(node);
-  }, []);
+    if (node.data.detailsLoaded !== false || !graphId) {
+      return;
+    }
+
+    // Skeleton node: fetch its description and examples the first time it's opened
+    fetch(`${BACKEND_HOST}/api/word-graph/${encodeURIComponent(graphId)}/nodes/${encodeURIComponent(node.id)}/details`)
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error('Could not load the details of this concept');
+        }
+        return response.json();
+      })
+      .then((details: NodeDetailsResponse) => {
+        const data = {
+          ...node.data,
+          summary: details.summary,
+          description: details.description,
+          examples: details.examples,
+          detailsLoaded: true,
+        };
+        setNodes((current) => current.map((n) => (n.id === node.id ? { ...n, data } : n)));
+        setSelectedNode((current) => (current && current.id === node.id ? { ...current, data } : current));
+      })
+      .catch((err) => setError(err instanceof Error ? err.message : 'An error occurred'));
+  }, [graphId, setNodes]);
 
   const onBackgroundClick = useCallback(() => {
     setSelectedNode(null);
@@ -639,7 +857,7 @@ const WordGraph = () => {
                 <circle className="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" strokeWidth="4"></circle>
                 <path className="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"></path>
               </svg>
-              Creating your journey...
+              {progress ? `${JOB_STAGE_LABELS[progress] || 'Creating your journey'}...` : 'Creating your journey...'}
             </div>
           ) : 'Generate Knowledge Map'}
         </button>